@@ -4,13 +4,23 @@ from typing import Any
 
 class _BaseDefineMeta(EnumMeta):
 
+    def __new__(metacls, cls, bases, classdict, **kwds):
+        enum_class = super().__new__(metacls, cls, bases, classdict, **kwds)
+        # members are fixed once the class exists: resolve names and values here, not per lookup
+        enum_class._names = tuple(m.name for m in enum_class)
+        enum_class._name2value = {name: m.value for name, m in enum_class._member_map_.items()}
+        return enum_class
+
     def __contains__(cls, item):
         if isinstance(item, str):
-            return item in cls.__members__
+            return item in cls._name2value
         return super().__contains__(item)
 
     def __getitem__(cls, name):
-        return super().__getitem__(name).value
+        try:
+            return cls._name2value[name]
+        except KeyError:
+            raise KeyError(name) from None
 
 
 class BaseDefine(Enum, metaclass=_BaseDefineMeta):
@@ -20,14 +30,12 @@ class BaseDefine(Enum, metaclass=_BaseDefineMeta):
 
     @classmethod
     def keys(cls) -> list[str]:
-        return [m.name for m in cls]
+        return list(cls._names)
 
     @classmethod
     def items(cls) -> list[tuple[str, Any]]:
-        return [(m.name, m.value) for m in cls]
+        return [(name, cls._name2value[name]) for name in cls._names]
 
     @classmethod
     def get(cls, name: str, default: Any = None):
-        if name in cls.__members__:
-            return cls[name]
-        return default
+        return cls._name2value.get(name, default)
@@ -1,8 +1,15 @@
 import datetime
-from typing import Any, Callable, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional
 
 import ciso8601
 
+try:
+    import numpy as np
+except ImportError:  # fmstr_many(..., array=True) needs NumPy
+    np = None
+
 from sqlalchemy import (
     # --- Column ---
     Column, ForeignKey, text,
@@ -77,6 +84,11 @@ _SQL_TO_PY = {
     ENUM:             str,
 }
 
+
+def _parse_date(x):
+    return ciso8601.parse_datetime(x).date()
+
+
 _AUTO_TOSTR = {
     str:                str,
     int:                str,
@@ -92,11 +104,49 @@ _AUTO_FMSTR = {
     int:                int,
     float:              float,
     bool:               lambda x: x != '0',
-    datetime.date:      lambda x: ciso8601.parse_datetime(x).date(),
+    datetime.date:      _parse_date,
     datetime.time:      lambda x: datetime.time.fromisoformat(x),
     datetime.datetime:  ciso8601.parse_datetime,
 }
 
+
+def _dedup(conv: Callable) -> Callable:
+    """Batch form of conv that converts each distinct value once; for immutable results only."""
+    def many(values):
+        values = values if isinstance(values, list) else list(values)
+        memo = {v: conv(v) for v in set(values)}
+        return list(map(memo.__getitem__, values))
+    return many
+
+
+# whole-column forms of _AUTO_TOSTR / _AUTO_FMSTR: one C-level map per column instead of a
+# Python call per cell; date columns repeat few distinct days, so each is parsed once
+_AUTO_TOSTR_MANY = {
+    str:                lambda xs: list(map(str, xs)),
+    int:                lambda xs: list(map(str, xs)),
+    float:              lambda xs: list(map(str, xs)),
+    bool:               lambda xs: list(map(str, map(int, xs))),
+    datetime.date:      lambda xs: list(map(datetime.date.isoformat, xs)),
+    datetime.time:      lambda xs: list(map(datetime.time.isoformat, xs)),
+    datetime.datetime:  lambda xs: list(map(datetime.datetime.isoformat, xs)),
+}
+
+_AUTO_FMSTR_MANY = {
+    str:                list,
+    int:                lambda xs: list(map(int, xs)),
+    float:              lambda xs: list(map(float, xs)),
+    bool:               lambda xs: list(map('0'.__ne__, xs)),
+    datetime.date:      _dedup(_parse_date),
+    datetime.time:      lambda xs: list(map(datetime.time.fromisoformat, xs)),
+    datetime.datetime:  lambda xs: list(map(ciso8601.parse_datetime, xs)),
+}
+
+# NumPy dtypes for fmstr_many(..., array=True); other columns become object arrays
+_NP_DTYPES = {
+    int:                'int64',
+    float:              'float64',
+}
+
 _PY_DEFAULTS = {
     str:                "",
     int:                0,
@@ -144,8 +194,31 @@ class Field:
         self.default: Any = default if default is not None else _PY_DEFAULTS.get(self.dtype)
         self.tostr: Optional[Callable] = tostr or _AUTO_TOSTR.get(self.dtype)
         self.fmstr: Optional[Callable] = fmstr or _AUTO_FMSTR.get(self.dtype)
+        self._tostr_many: Optional[Callable] = None if tostr else _AUTO_TOSTR_MANY.get(self.dtype)
+        self._fmstr_many: Optional[Callable] = None if fmstr else _AUTO_FMSTR_MANY.get(self.dtype)
         self.column: Optional[Column] = None
 
+    def tostr_many(self, values: Iterable) -> list[str]:
+        """tostr over a whole column."""
+        if self._tostr_many is not None:
+            return self._tostr_many(values)
+        return list(map(self.tostr, values))
+
+    def fmstr_many(self, strings: Iterable[str], array: bool = False):
+        """
+        fmstr over a whole column, as a list, or with array=True as a NumPy array
+        (int64 / float64 parsed by NumPy itself, bool, object for other dtypes).
+        """
+        if array:
+            if np is None:
+                raise ImportError("fmstr_many(..., array=True) requires numpy")
+            if self._fmstr_many is not None and self.dtype in _NP_DTYPES:
+                return np.array(strings if isinstance(strings, list) else list(strings), dtype=_NP_DTYPES[self.dtype])
+            return np.array(self.fmstr_many(strings), dtype=bool if self.dtype is bool else object)
+        if self._fmstr_many is not None:
+            return self._fmstr_many(strings)
+        return list(map(self.fmstr, strings))
+
     def get_column(self, name: str) -> Column:
         args = [name, self._sql_type]
         if self.foreign_key:
@@ -173,6 +246,40 @@ class Field:
         return f"Field(dtype={self.dtype.__name__}, default={self.default!r}, primary={self.primary})"
 
 
+# ===================== CompiledSchema =====================
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    """Column metadata of a TableDefine resolved once, as parallel tuples in column order."""
+    names: tuple[str, ...]
+    fields: tuple[Field, ...]
+    dtypes: tuple[type, ...]
+    tostrs: tuple[Optional[Callable], ...]
+    fmstrs: tuple[Optional[Callable], ...]
+    positions: Mapping[str, int]
+    name2dtype: Mapping[str, type]
+    primary_keys: tuple[str, ...]
+    index_keys: tuple[str, ...]
+
+    @classmethod
+    def build(cls, tabledefine) -> 'CompiledSchema':
+        names, fields = tuple(tabledefine.keys()), tuple(tabledefine[name] for name in tabledefine.keys())
+        return cls(
+            names=names,
+            fields=fields,
+            dtypes=tuple(f.dtype for f in fields),
+            tostrs=tuple(f.tostr for f in fields),
+            fmstrs=tuple(f.fmstr for f in fields),
+            positions=MappingProxyType({name: i for i, name in enumerate(names)}),
+            name2dtype=MappingProxyType({name: f.dtype for name, f in zip(names, fields)}),
+            primary_keys=tuple(name for name, f in zip(names, fields) if f.primary),
+            index_keys=tuple(name for name, f in zip(names, fields) if f.index),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
 # ===================== TableDefine =====================
 
 class TableDefine(BaseDefine):
@@ -184,9 +291,15 @@ class TableDefine(BaseDefine):
 
     # --- SQL helpers ---
 
+    @classmethod
+    def get_schema(cls) -> CompiledSchema:
+        if '_schema' not in cls.__dict__:
+            cls._schema = CompiledSchema.build(cls)
+        return cls._schema
+
     @classmethod
     def get_name2dtype(cls):
-        return {m.name: m.value.dtype for m in cls}
+        return dict(cls.get_schema().name2dtype)
 
     @classmethod
     def get_sql_table(cls) -> Table:
@@ -230,6 +343,7 @@ if __name__ == "__main__":
     print(f"  {UserTable.Name.value.nullable = }")
     print(f"  {UserTable.Score.value.tostr(9.5) = }")
     print(f"  {UserTable.Score.value.fmstr('9.5') = }")
+    print(f"  {UserTable.Score.value.fmstr_many(['9.5', '7']) = }")
     print()
 
     # lookup — [], get() return Field directly
@@ -245,6 +359,7 @@ if __name__ == "__main__":
     print(f"  {UserTable.items() = }")
     print(f"  {dict(UserTable) = }")
     print(f"  {UserTable.get_name2dtype() = }")
+    print(f"  {UserTable.get_schema().primary_keys = }")
     print(f"  {len(UserTable) = }")
     print()
 
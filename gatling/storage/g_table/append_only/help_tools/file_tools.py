@@ -1,4 +1,5 @@
 import io
+import struct
 from typing import BinaryIO
 
 
@@ -46,31 +47,60 @@ def readline_forward(file):
     return file.readline().rstrip(b'\n')
 
 
-def readline_backward(file, chunk_size=1024):
-    if get_pos(file) == 0:
-        return b''
-    goto_offset(file, -1)  # skip trailing \n
-    end_pos = get_pos(file)
-    if end_pos == 0:
-        return b''
+BLOCK_SIZE = 1 << 16
 
-    chunks = []
-    while True:
-        cur_chunk = read_backward(file, chunk_size)
-        if cur_chunk == b'':
-            break
 
-        idx = cur_chunk.rfind(b'\n')
+def iter_lines_backward(file, end=None, stop=0, block_size=BLOCK_SIZE):
+    """
+    Yield (start offset, line) for the newline-terminated lines in [stop, end), last line first.
+
+    The region is read in block_size-aligned blocks, one seek + read per block, and every
+    line in a block is yielded before the next read. end defaults to the end of the file.
+    """
+    if end is None:
+        goto_tail(file)
+        end = get_pos(file)
+    pos = end
+    buf = b''
+    hi = 0  # buf[:hi] is still unyielded and ends with a newline
+    while True:
+        idx = buf.rfind(b'\n', 0, hi - 1) if hi > 1 else -1
         if idx != -1:
-            cur_chunk = cur_chunk[idx + 1:]
-            chunks.append(cur_chunk)
-            # set pos to the \n (end of previous line)
-            set_pos(file, get_pos(file) + idx + 1)
-            break
+            yield pos + idx + 1, buf[idx + 1:hi - 1]
+            hi = idx + 1
+        elif pos > stop:
+            start = max(stop, (pos - 1) // block_size * block_size)
+            set_pos(file, start)
+            buf = file.read(pos - start) + buf[:hi]
+            hi = len(buf)
+            pos = start
         else:
-            chunks.append(cur_chunk)
+            if hi > 0:
+                yield pos, buf[:hi - 1]
+            return
+
+
+def tail_end(file, size, block_size=BLOCK_SIZE):
+    """Offset just past the last newline before size; bytes after it are a line still being written."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - block_size)
+        set_pos(file, start)
+        idx = file.read(pos - start).rfind(b'\n')
+        if idx != -1:
+            return start + idx + 1
+        pos = start
+    return 0
 
-    return b''.join(reversed(chunks))
+
+def readline_backward(file, chunk_size=1024):
+    """Read the line that ends at the current position and move to its start."""
+    pos = get_pos(file)
+    if pos == 0:
+        return b''
+    start, line = next(iter_lines_backward(file, end=pos, block_size=chunk_size))
+    set_pos(file, start)
+    return line
 
 
 def truncate(file):
@@ -84,6 +114,53 @@ def popout(file):
     return res
 
 
+# ===================== Length-prefixed records =====================
+# A record is <u32 len><payload><u32 len>; the trailing length makes it readable backward.
+
+_RECLEN = struct.Struct('<I')
+
+
+def pack_record(data: bytes) -> bytes:
+    n = _RECLEN.pack(len(data))
+    return n + data + n
+
+
+def append_record(file: BinaryIO, data: bytes):
+    file.write(pack_record(data))
+
+
+def extend_records(file: BinaryIO, datas: list[bytes]):
+    if len(datas) > 0:
+        file.write(b''.join(map(pack_record, datas)))
+
+
+def readrecord_forward(file):
+    head = file.read(_RECLEN.size)
+    if len(head) < _RECLEN.size:
+        return b''
+    n, = _RECLEN.unpack(head)
+    res = file.read(n)
+    goto_offset(file, _RECLEN.size)
+    return res
+
+
+def readrecord_backward(file):
+    tail = read_backward(file, _RECLEN.size)
+    if len(tail) < _RECLEN.size:
+        return b''
+    n, = _RECLEN.unpack(tail)
+    res = read_backward(file, n)
+    goto_offset(file, -_RECLEN.size)
+    return res
+
+
+def poprecord(file):
+    goto_tail(file)
+    res = readrecord_backward(file)
+    truncate(file)
+    return res
+
+
 if __name__ == '__main__':
     from gatling.utility.xprint import printi
 
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import defaultdict
+
+from gatling.storage.g_table.append_only.help_tools.file_tools import extend_lines, iter_lines_backward, goto_tail, get_pos, set_pos
+from gatling.storage.g_table.append_only.help_tools.meta_cache import FileMetaCache
+
+# An index file is an append-only log of b"<raw value>\t<row idx>\t<byte offset>" lines,
+# written in row order so pop/shrink only ever cut entries off its tail. Cutting replaces the
+# file, so a reader in another process sees a new inode instead of rewritten bytes.
+
+# (bytes parsed, last line parsed, {raw value: [(row idx, byte offset), ...]}) per index file
+# and inode; appends only extend it, a new inode or a changed last line drops it
+INDEX_CACHE = FileMetaCache()
+_INDEX_LOCK = threading.Lock()
+
+
+def index_fpath(fpath, key) -> str:
+    return f"{fpath}.{key}.idx"
+
+
+def _replace_index(fpath_idx, data: bytes):
+    fpath_temp = fpath_idx + '.tmp'
+    with open(fpath_temp, 'wb') as f:
+        f.write(data)
+    os.replace(fpath_temp, fpath_idx)
+    INDEX_CACHE.pop(fpath_idx)
+
+
+def create_index_file(fpath_idx):
+    _replace_index(fpath_idx, b'')
+
+
+def append_index(fpath_idx, entries: list[tuple[bytes, int, int]]):
+    if len(entries) == 0:
+        return
+    with open(fpath_idx, 'ab') as f:
+        extend_lines(f, [b'%s\t%d\t%d' % entry for entry in entries])
+
+
+def truncate_index(fpath_idx, next_idx: int):
+    """Drop every entry whose row idx is >= next_idx."""
+    with open(fpath_idx, 'rb') as f:
+        goto_tail(f)
+        end = cut_pos = get_pos(f)
+        for pos, line in iter_lines_backward(f, end=end):
+            if int(line.split(b'\t')[1]) < next_idx:
+                break
+            cut_pos = pos
+        if cut_pos == end:
+            return
+        set_pos(f, 0)
+        data = f.read(cut_pos)
+    _replace_index(fpath_idx, data)
+
+
+def load_index(fpath_idx) -> dict[bytes, list[tuple[int, int]]]:
+    """
+    {raw value: [(row idx, byte offset), ...]} of an index file. The parsed entries stay cached
+    with the number of bytes they cover and the last line among them, so a later call only
+    parses the lines appended since; a file that was replaced, or no longer holds that line at
+    the same place, is parsed again. The returned dict is extended in place.
+    """
+    with _INDEX_LOCK, open(fpath_idx, 'rb') as f:
+        st = os.fstat(f.fileno())
+        entry = INDEX_CACHE.get(fpath_idx, (st.st_ino,))
+        end, last, value2locs = entry if entry is not None and entry[0] <= st.st_size else (0, b'', defaultdict(list))
+        set_pos(f, end - len(last))
+        data = f.read()
+        if not data.startswith(last):
+            end, last, value2locs = 0, b'', defaultdict(list)
+            set_pos(f, 0)
+            data = f.read()
+        data = data[len(last):]
+        stop = data.rfind(b'\n') + 1  # a line still being written is left for the next call
+        if stop:
+            lines = data[:stop].splitlines()
+            for line in lines:
+                value, idx, offset = line.split(b'\t')
+                value2locs[value].append((int(idx), int(offset)))
+            end, last = end + stop, lines[-1] + b'\n'
+        INDEX_CACHE.put(fpath_idx, (st.st_ino,), (end, last, value2locs))
+    return value2locs
+
+
+def remove_index_file(fpath_idx):
+    if os.path.exists(fpath_idx):
+        os.remove(fpath_idx)
+    INDEX_CACHE.pop(fpath_idx)
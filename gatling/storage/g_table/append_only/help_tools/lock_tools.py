@@ -0,0 +1,19 @@
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writers are not serialized across processes
+    fcntl = None
+
+
+def try_lock_writer(file) -> bool:
+    """
+    Take a non-blocking exclusive advisory lock on an open file; False if another writer holds it.
+
+    Readers never lock, so they are never blocked. The lock is released when the file is closed.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
@@ -0,0 +1,55 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def stat_key(fpath) -> tuple[int, int, int]:
+    """(inode, size, mtime_ns) of a file; raises FileNotFoundError if it does not exist."""
+    st = os.stat(fpath)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class FileMetaCache:
+    """
+    Thread-safe LRU cache of per-file metadata, validated against the file's stat key.
+
+    An entry is only returned while the file still has the (inode, size, mtime) it had
+    when the entry was stored, so any append, truncate or replacement invalidates it.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[tuple, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fpath, key: tuple) -> Optional[Any]:
+        fpath = os.path.abspath(fpath)
+        with self._lock:
+            entry = self._data.get(fpath)
+            if entry is None:
+                return None
+            if entry[0] != key:
+                del self._data[fpath]
+                return None
+            self._data.move_to_end(fpath)
+            return entry[1]
+
+    def put(self, fpath, key: tuple, value: Any):
+        fpath = os.path.abspath(fpath)
+        with self._lock:
+            self._data[fpath] = (key, value)
+            self._data.move_to_end(fpath)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, fpath):
+        with self._lock:
+            self._data.pop(os.path.abspath(fpath), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,50 @@
+import os
+from typing import Callable, Iterable, Optional
+
+import multiprocess as mp
+
+
+def split_ranges(fpath, start: int, end: int, n: int) -> list[tuple[int, int]]:
+    """Split [start, end) of a line-oriented file into at most n newline-aligned byte ranges."""
+    bounds = [start]
+    with open(fpath, 'rb') as f:
+        for i in range(1, n):
+            guess = start + (end - start) * i // n
+            if guess <= bounds[-1]:
+                continue
+            f.seek(guess - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= end:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(end)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+def read_range(fpath, start: int, end: int) -> list[bytes]:
+    """Lines (without newline) stored in the byte range [start, end)."""
+    with open(fpath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if len(data) == 0:
+        return []
+    return data.rstrip(b'\n').split(b'\n')
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be >= 1, not {workers}")
+    return workers
+
+
+def map_ordered(fctn: Callable, tasks: Iterable, workers: int) -> list:
+    """fctn over tasks in a process pool (in-process for a single worker), results in task order."""
+    tasks = list(tasks)
+    if workers == 1 or len(tasks) <= 1:
+        return [fctn(task) for task in tasks]
+    with mp.Pool(min(workers, len(tasks))) as pool:
+        return pool.map(fctn, tasks, chunksize=1)
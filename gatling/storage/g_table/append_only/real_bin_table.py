@@ -0,0 +1,340 @@
+import datetime
+import os
+import struct
+from dataclasses import dataclass
+from typing import Optional, BinaryIO, Any, Literal
+
+from gatling.storage.g_table.append_only.base_apo_table import BaseAPOTable
+from gatling.storage.g_table.append_only.help_tools.file_tools import readline_forward, append_line, goto_head, goto_tail, get_pos, set_pos, truncate, \
+    append_record, extend_records, readrecord_forward, readrecord_backward, poprecord
+from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
+from gatling.storage.g_table.append_only.real_tsv_table import KEY_IDX, head2sent, sent2head, get_key2idx
+from gatling.utility.error_tools import FileAlreadyOpenedForWriteError, FileAlreadyOpenedError, FileNotOpenError
+from gatling.utility.io_fctns import remove_file
+
+# ===================== Row Codec =====================
+
+_US_PER_DAY = 86_400_000_000
+_DT0 = datetime.datetime.min
+
+
+def _time2us(t: datetime.time) -> int:
+    if t.tzinfo is not None:
+        raise ValueError(f"BINTable only stores naive time values, got {t!r}")
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond
+
+
+def _us2time(us: int) -> datetime.time:
+    s, us = divmod(us, 1_000_000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return datetime.time(h, m, s, us)
+
+
+def _datetime2us(dt: datetime.datetime) -> int:
+    if dt.tzinfo is not None:
+        raise ValueError(f"BINTable only stores naive datetime values, got {dt!r}")
+    return (dt.toordinal() - 1) * _US_PER_DAY + _time2us(dt.time())
+
+
+def _us2datetime(us: int) -> datetime.datetime:
+    return _DT0 + datetime.timedelta(microseconds=us)
+
+
+# dtype -> (struct code, encode, decode); str is stored as a u32 length plus tail bytes
+_FIXED_CODECS = {
+    int:               ('q', None, None),
+    float:             ('d', None, None),
+    bool:              ('?', None, None),
+    datetime.date:     ('i', datetime.date.toordinal, datetime.date.fromordinal),
+    datetime.time:     ('q', _time2us, _us2time),
+    datetime.datetime: ('q', _datetime2us, _us2datetime),
+}
+
+
+class BinRowCodec:
+    """
+    Packs a row into ``<fixed struct part><utf-8 str bytes...>``.
+
+    Every non-str column is one struct field; every str column contributes a u32 length
+    to the fixed part and its bytes to the tail, so decoding is a single ``unpack_from``.
+    """
+
+    def __init__(self, key2type: dict[str, Any]):
+        self.keys = list(key2type.keys())
+        self.dtypes = list(key2type.values())
+        codes = []
+        for kname, ktype in key2type.items():
+            if ktype is str:
+                codes.append('I')
+            elif ktype in _FIXED_CODECS:
+                codes.append(_FIXED_CODECS[ktype][0])
+            else:
+                raise TypeError(f"BINTable does not support column {kname!r} of type {ktype.__name__}")
+        self.fixed = struct.Struct('<' + ''.join(codes))
+        self.str_pos = [i for i, ktype in enumerate(self.dtypes) if ktype is str]
+        self.encoders = [None if ktype is str else _FIXED_CODECS[ktype][1] for ktype in self.dtypes]
+        self.decoders = [None if ktype is str else _FIXED_CODECS[ktype][2] for ktype in self.dtypes]
+
+    def encode(self, row: dict) -> bytes:
+        vals = []
+        tails = []
+        for kname, ktype, enc in zip(self.keys, self.dtypes, self.encoders):
+            val = row[kname]
+            if ktype is str:
+                data = val.encode()
+                tails.append(data)
+                vals.append(len(data))
+            else:
+                vals.append(enc(val) if enc is not None else val)
+        return self.fixed.pack(*vals) + b''.join(tails)
+
+    def decode(self, data: bytes, key2idx: Optional[dict[str, int]] = None) -> dict:
+        vals = list(self.fixed.unpack_from(data))
+        pos = self.fixed.size
+        for i in self.str_pos:
+            n = vals[i]
+            vals[i] = data[pos:pos + n]
+            pos += n
+        if key2idx is None:
+            key2idx = {kname: i for i, kname in enumerate(self.keys)}
+        res = {}
+        for kname, i in key2idx.items():
+            val = vals[i]
+            if self.dtypes[i] is str:
+                val = val.decode()
+            else:
+                dec = self.decoders[i]
+                if dec is not None:
+                    val = dec(val)
+            res[kname] = val
+        return res
+
+
+# ===================== Table =====================
+
+@dataclass
+class BINTableState:
+    file: Optional[BinaryIO] = None
+    key2type: Optional[dict[str, Any]] = None
+    codec: Optional[BinRowCodec] = None
+    head_end: Optional[int] = None
+    next_idx: Optional[int] = None
+
+
+def _as_cols(rows, keys):
+    if len(rows) == 0:
+        return {key: [] for key in keys}
+    return {key: [row[key] for row in rows] for key in keys}
+
+
+class BINTable(BaseAPOTable):
+    """
+    Append-only table with a binary row layout derived from the TableDefine schema.
+
+    The file starts with the same text header as TSVTable, followed by length-prefixed
+    records (see ``file_tools.append_record``) packed by ``BinRowCodec``. Values keep
+    their native types, so strings may contain tabs and newlines.
+    """
+
+    def __init__(self, fpath):
+        super().__init__()
+        self.fpath = fpath
+        self.state = BINTableState()
+
+    def get_key2type(self):
+        if self.state.file is not None:
+            raise FileAlreadyOpenedForWriteError(f'{self.fpath} is already opened with write permission.')
+        with open(self.fpath, 'rb') as f:
+            return sent2head(readline_forward(f).decode())
+
+    def create(self, tabledefine) -> 'BINTable':
+        if self.state.file is not None:
+            raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+        key2type = {KEY_IDX: int, **tabledefine.get_schema().name2dtype}
+        BinRowCodec(key2type)  # validate column types up front
+        with open(self.fpath, 'wb') as f:
+            append_line(f, head2sent(key2type).encode())
+        return self
+
+    def exists(self) -> bool:
+        return os.path.exists(self.fpath)
+
+    def drop(self) -> 'BINTable':
+        if self.state.file is not None:
+            raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+        remove_file(self.fpath)
+        return self
+
+    def truncate(self) -> 'BINTable':
+        if self.state.file is not None:
+            raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+        with open(self.fpath, 'rb+') as f:
+            goto_head(f)
+            readline_forward(f)
+            truncate(f)
+        return self
+
+    # ===================== State =====================
+
+    def _build_state(self, ori_state: Optional[BINTableState] = None, open_mode: Literal['rb', 'rb+'] = 'rb+') -> BINTableState:
+        if ori_state is not None and ori_state.file is not None:
+            raise FileAlreadyOpenedForWriteError(f'{self.fpath} is already opened with write permission.')
+
+        bts = BINTableState() if ori_state is None else ori_state
+        bts.file = open(self.fpath, open_mode)
+        bts.key2type = sent2head(readline_forward(bts.file).decode())
+        bts.codec = BinRowCodec(bts.key2type)
+        bts.head_end = get_pos(bts.file)
+        goto_tail(bts.file)
+        last = readrecord_backward(bts.file) if get_pos(bts.file) > bts.head_end else b''
+        bts.next_idx = bts.codec.decode(last, {KEY_IDX: 0})[KEY_IDX] + 1 if last else 0
+        return bts
+
+    def _clean_state(self, ori_state: BINTableState):
+        if ori_state.file is None:
+            raise FileNotOpenError(f'{self.fpath} is not opened.')
+        ori_state.file.close()
+        ori_state.file = None
+        ori_state.key2type = None
+        ori_state.codec = None
+        ori_state.head_end = None
+        ori_state.next_idx = None
+
+    def __enter__(self):
+        self.state = self._build_state(self.state)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._clean_state(self.state)
+
+    def _run(self, fctn, open_mode):
+        if self.state.file is None:
+            temp_state = self._build_state(open_mode=open_mode)
+            try:
+                return fctn(temp_state)
+            finally:
+                self._clean_state(temp_state)
+        else:
+            cur_pos = get_pos(self.state.file)
+            try:
+                return fctn(self.state)
+            finally:
+                set_pos(self.state.file, cur_pos)
+
+    # ===================== Write =====================
+
+    def append(self, row) -> 'BINTable':
+        def _append(state):
+            goto_tail(state.file)
+            append_record(state.file, state.codec.encode({KEY_IDX: state.next_idx, **row}))
+            state.next_idx += 1
+
+        self._run(_append, 'rb+')
+        return self
+
+    def extend(self, rows) -> 'BINTable':
+        def _extend(state):
+            if len(rows) == 0:
+                return
+            goto_tail(state.file)
+            start_idx = state.next_idx
+            extend_records(state.file, [state.codec.encode({KEY_IDX: start_idx + i, **row}) for i, row in enumerate(rows)])
+            state.next_idx += len(rows)
+
+        self._run(_extend, 'rb+')
+        return self
+
+    def pop(self) -> dict:
+        def _pop(state):
+            if state.next_idx == 0:
+                return {}
+            item = state.codec.decode(poprecord(state.file))
+            state.next_idx -= 1
+            return item
+
+        return self._run(_pop, 'rb+')
+
+    def shrink(self, n: int) -> list:
+        def _shrink(state):
+            goto_tail(state.file)
+            datas = []
+            while len(datas) < n and get_pos(state.file) > state.head_end:
+                datas.append(readrecord_backward(state.file))
+            truncate(state.file)
+            state.next_idx -= len(datas)
+            return [state.codec.decode(data) for data in datas]
+
+        return self._run(_shrink, 'rb+')
+
+    # ===================== Read =====================
+
+    def _fetch(self, state: BINTableState, idxs, keys, flat):
+        N = state.next_idx
+        key2idx = get_key2idx(keys, state.key2type)
+        decode = state.codec.decode
+        if isinstance(idxs, int):
+            if idxs >= N or idxs < -N:
+                raise IndexError(f"Index {idxs=} out of range for table with {N=} rows")
+            if idxs >= 0:
+                set_pos(state.file, state.head_end)
+                for _ in range(idxs + 1):
+                    data = readrecord_forward(state.file)
+            else:
+                goto_tail(state.file)
+                for _ in range(-idxs):
+                    data = readrecord_backward(state.file)
+            return decode(data, key2idx)
+        elif isinstance(idxs, slice):
+            targets = range(*idxs.indices(N))
+            rows = []
+            if len(targets) > 0:
+                if targets.step > 0:
+                    set_pos(state.file, state.head_end)
+                    read, cur, step = readrecord_forward, 0, 1
+                else:
+                    goto_tail(state.file)
+                    read, cur, step = readrecord_backward, N - 1, -1
+                for target in targets:
+                    while cur != target:
+                        read(state.file)
+                        cur += step
+                    rows.append(decode(read(state.file), key2idx))
+                    cur += step
+            return _as_cols(rows, list(key2idx.keys())) if flat else rows
+        else:
+            raise TypeError(f"Index must be int or slice, not {type(idxs)}")
+
+    def __getitem__(self, args):
+        if isinstance(args, tuple):
+            idxs = args[0]
+            keys = args[1] if len(args) > 1 else None
+            flat = args[2] if len(args) > 2 else False
+        else:
+            idxs, keys, flat = args, None, False
+        return self._run(lambda state: self._fetch(state, idxs, keys, flat), 'rb')
+
+    def rows(self, idxs=Slice[::], keys=None):
+        return self[idxs, keys]
+
+    def cols(self, keys=None, idxs=Slice[::]):
+        return self[idxs, keys, True]
+
+    def keys(self) -> list:
+        return self._run(lambda state: list(state.key2type.keys()), 'rb')
+
+    def __len__(self):
+        return self._run(lambda state: state.next_idx, 'rb')
+
+
+if __name__ == '__main__':
+    pass
+
+    from gatling.utility.xprint import xprint_rows
+    from a_const_debug import fpath_temp_tsv, ConstSchema, rows
+
+    ft = BINTable(fpath_temp_tsv + '.bin')
+    ft.drop()
+    ft.create(tabledefine=ConstSchema)
+    ft.extend(rows)
+    xprint_rows(ft[::-1])
@@ -0,0 +1,357 @@
+import os
+import shutil
+import threading
+from typing import Optional, Any
+
+from gatling.define.tabledefine import TableDefine, Field
+from gatling.storage.g_table.append_only.base_apo_table import BaseAPOTable
+from gatling.storage.g_table.append_only.help_tools.meta_cache import stat_key
+from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX, head2sent, sent2head, sent2row, sent2flat, rows2sents
+from gatling.storage.g_table.append_only.real_zst_table import ZSTTable
+from gatling.utility.io_fctns import read_json, save_json, remove_file
+
+MANIFEST_NAME = "manifest.json"
+
+
+def key2type2define(key2type) -> TableDefine:
+    return TableDefine('SegmentSchema', {k: Field(t) for k, t in key2type.items() if k != KEY_IDX})
+
+
+def split_runs(idxs: list[int], starts: list[int]) -> list[tuple[int, list[int]]]:
+    """Group monotonic global indices into (segment, global indices) runs."""
+    runs = []
+    si = None
+    for i in idxs:
+        if si is None or not (starts[si] <= i < (starts[si + 1] if si + 1 < len(starts) else float('inf'))):
+            si = max(j for j, s in enumerate(starts) if s <= i)
+            runs.append((si, []))
+        runs[-1][1].append(i)
+    return runs
+
+
+class SegmentedTSVTable(BaseAPOTable):
+    """
+    Append-only table split into rolling segment files inside one directory.
+
+    Rows go to the hot (last) TSV segment until it holds ``max_rows`` rows or
+    ``max_bytes`` bytes, then a new segment is started. ``manifest.json`` lists the
+    segments in order with the global index of their first row, so a global index maps
+    onto a segment plus a local offset. Sealed segments can be recompressed into
+    ZSTTable files with ``archive()``, or in a background thread after every roll when
+    ``auto_archive`` is set, while appends continue on the hot segment.
+
+    Row indices ('*') are global; each segment file numbers its own rows from 0.
+    """
+
+    def __init__(self, dpath, max_rows: int = 1_000_000, max_bytes: int = 256 << 20,
+                 auto_archive: bool = False, block_rows: int = 1024, level: int = 3):
+        super().__init__()
+        if max_rows <= 0 or max_bytes <= 0:
+            raise ValueError(f"max_rows and max_bytes must be positive, got {max_rows=} {max_bytes=}")
+        self.dpath = dpath
+        self.fpath_manifest = os.path.join(dpath, MANIFEST_NAME)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.auto_archive = auto_archive
+        self.block_rows = block_rows
+        self.level = level
+
+        self._lock = threading.RLock()
+        self._manifest: Optional[dict] = None
+        self._archive_thread: Optional[threading.Thread] = None
+
+    # ===================== Manifest =====================
+
+    def _load(self) -> dict:
+        if self._manifest is None:
+            if not os.path.exists(self.fpath_manifest):
+                raise FileNotFoundError(self.fpath_manifest)
+            self._manifest = read_json(self.fpath_manifest)
+        return self._manifest
+
+    def _save(self):
+        fpath_temp = self.fpath_manifest + '.tmp'
+        save_json(self._manifest, fpath_temp)
+        os.replace(fpath_temp, self.fpath_manifest)
+
+    def _segs(self) -> list[dict]:
+        return self._load()['segments']
+
+    def _seg_fpath(self, seg) -> str:
+        return os.path.join(self.dpath, seg['name'])
+
+    def _seg_table(self, seg):
+        if seg['kind'] == 'zst':
+            return ZSTTable(self._seg_fpath(seg), block_rows=self.block_rows, level=self.level)
+        return TSVTable(self._seg_fpath(seg))
+
+    def _key2type(self) -> dict[str, Any]:
+        return sent2head(self._load()['head'])
+
+    def _seg_len(self, i: int) -> int:
+        segs = self._segs()
+        if i + 1 < len(segs):
+            return segs[i + 1]['start'] - segs[i]['start']
+        return len(self._seg_table(segs[i]))
+
+    def _new_segment(self, start: int) -> dict:
+        manifest = self._load()
+        seg = {'name': f"{manifest['next_seg']:06d}.tsv", 'kind': 'tsv', 'start': start}
+        TSVTable(self._seg_fpath(seg)).create(tabledefine=key2type2define(self._key2type()))
+        manifest['next_seg'] += 1
+        manifest['segments'].append(seg)
+        self._save()
+        return seg
+
+    def _remove_segment(self, seg):
+        if seg['kind'] == 'zst':
+            self._seg_table(seg).drop()
+        else:
+            remove_file(self._seg_fpath(seg))
+
+    def segments(self) -> list[dict]:
+        """[{name, kind, start, nrows}] for every segment, oldest first."""
+        with self._lock:
+            return [{**seg, 'nrows': self._seg_len(i)} for i, seg in enumerate(self._segs())]
+
+    # ===================== Lifecycle =====================
+
+    def create(self, tabledefine) -> 'SegmentedTSVTable':
+        key2type = {KEY_IDX: int, **tabledefine.get_schema().name2dtype}
+        self.wait_archive()
+        with self._lock:
+            if os.path.exists(self.dpath):
+                shutil.rmtree(self.dpath)
+            os.makedirs(self.dpath)
+            self._manifest = {'head': head2sent(key2type), 'next_seg': 0, 'segments': []}
+            self._new_segment(0)
+        return self
+
+    def exists(self) -> bool:
+        return os.path.exists(self.fpath_manifest)
+
+    def drop(self) -> 'SegmentedTSVTable':
+        self.wait_archive()
+        with self._lock:
+            if os.path.exists(self.dpath):
+                shutil.rmtree(self.dpath)
+            self._manifest = None
+        return self
+
+    def truncate(self) -> 'SegmentedTSVTable':
+        self.wait_archive()
+        with self._lock:
+            for seg in self._segs():
+                self._remove_segment(seg)
+            self._manifest['segments'] = []
+            self._new_segment(0)
+        return self
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._lock.release()
+
+    # ===================== Write =====================
+
+    def _hot(self) -> tuple[TSVTable, int, int]:
+        """Hot segment table, its row count and size, rolling to a new segment when it is full or archived."""
+        segs = self._segs()
+        seg = segs[-1]
+        n = self._seg_len(len(segs) - 1)
+        size = os.path.getsize(self._seg_fpath(seg))
+        if seg['kind'] != 'tsv' or n >= self.max_rows or size >= self.max_bytes:
+            if n == 0:
+                self._remove_segment(segs.pop())
+                seg = self._new_segment(seg['start'])
+            else:
+                seg = self._new_segment(seg['start'] + n)
+                if self.auto_archive:
+                    self._start_archive()
+            n = 0
+            size = os.path.getsize(self._seg_fpath(seg))
+        return TSVTable(self._seg_fpath(seg)), n, size
+
+    def append(self, row) -> 'SegmentedTSVTable':
+        return self.extend([row])
+
+    def extend(self, rows) -> 'SegmentedTSVTable':
+        with self._lock:
+            self._load()
+            # every column but the leading '*' is encoded once; the local row number is prefixed per segment
+            key2type = {k: t for k, t in self._key2type().items() if k != KEY_IDX}
+            bodies = [sent.encode() for sent in rows2sents(rows, key2type, 0)] if rows else []
+            i = 0
+            while i < len(rows):
+                hot, n, size = self._hot()
+                # like appending one row at a time: a row starting below max_bytes still goes in
+                j = i
+                while j < len(rows) and j - i < self.max_rows - n and (j == i or size < self.max_bytes):
+                    size += len(str(n + j - i)) + len(bodies[j]) + 2
+                    j += 1
+                chunk = bodies[i:j]
+                hot._extend_lines(len(chunk), lambda start_idx, _: [b'%d\t%s' % (start_idx + k, body) for k, body in enumerate(chunk)])
+                i = j
+        return self
+
+    def pop(self) -> dict:
+        rows = self.shrink(1)
+        return rows[0] if rows else {}
+
+    def shrink(self, n: int) -> list:
+        with self._lock:
+            segs = self._segs()
+            rows = []
+            while len(rows) < n:
+                seg = segs[-1]
+                remain = self._seg_len(len(segs) - 1)
+                got = self._seg_table(seg).shrink(n - len(rows))
+                rows.extend({**row, KEY_IDX: row[KEY_IDX] + seg['start']} for row in got)
+                if len(got) < remain or len(segs) == 1:
+                    break
+                # emptied segment: drop it so the previous one becomes the tail
+                self._remove_segment(segs.pop())
+                self._save()
+            return rows
+
+    # ===================== Archive =====================
+
+    def _archive_one(self, seg) -> dict:
+        """Copy a sealed TSV segment into a ZSTTable file; returns the new manifest entry."""
+        src = TSVTable(self._seg_fpath(seg))
+        dst_seg = {**seg, 'name': seg['name'] + '.zst', 'kind': 'zst'}
+        dst = self._seg_table(dst_seg).create(tabledefine=key2type2define(self._key2type()))
+        try:
+            n = len(src)
+            chunk = self.block_rows * 64
+            for i in range(0, n, chunk):
+                dst.extend(src[i:min(i + chunk, n)])
+        except BaseException:
+            dst.drop()
+            raise
+        return dst_seg
+
+    def archive(self) -> int:
+        """
+        Compress every sealed TSV segment now; returns how many segments were archived.
+        A failed copy is re-raised unless a concurrent shrink took the segment meanwhile.
+        """
+        with self._lock:
+            todo = [seg for seg in self._segs()[:-1] if seg['kind'] == 'tsv']
+        count = 0
+        for seg in todo:
+            # the copy runs unlocked; it is discarded if a shrink reached into the segment meanwhile
+            src_stat = stat_key(self._seg_fpath(seg))
+            error, dst_seg = None, None
+            try:
+                dst_seg = self._archive_one(seg)
+            except (OSError, IndexError) as e:
+                error = e
+            with self._lock:
+                segs = self._segs()
+                sealed = seg in segs[:-1] and os.path.exists(self._seg_fpath(seg)) and stat_key(self._seg_fpath(seg)) == src_stat
+                if error is not None and sealed:
+                    raise error
+                if dst_seg is None or not sealed:
+                    if dst_seg is not None:
+                        self._remove_segment(dst_seg)
+                    continue
+                segs[segs.index(seg)] = dst_seg
+                self._save()
+                self._remove_segment(seg)
+            count += 1
+        return count
+
+    def _start_archive(self):
+        if self._archive_thread is not None and self._archive_thread.is_alive():
+            return
+        self._archive_thread = threading.Thread(target=self.archive, daemon=True)
+        self._archive_thread.start()
+
+    def wait_archive(self):
+        """Block until a running background archive has finished."""
+        thread = self._archive_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._archive_thread = None
+
+    # ===================== Read =====================
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._key2type().keys())
+
+    def __len__(self):
+        with self._lock:
+            segs = self._segs()
+            return segs[-1]['start'] + self._seg_len(len(segs) - 1)
+
+    def _fetch(self, idxs, keys, sent2x):
+        segs = self._segs()
+        N = segs[-1]['start'] + self._seg_len(len(segs) - 1)
+        local_keys = keys
+        if keys is not None:
+            local_keys = [keys] if isinstance(keys, str) else list(keys)
+
+        if isinstance(idxs, int):
+            if idxs >= N or idxs < -N:
+                raise IndexError(f"Index {idxs=} out of range for table with {N=} rows")
+            idxs = idxs % N
+            (si, _), = split_runs([idxs], [seg['start'] for seg in segs])
+            row = self._seg_table(segs[si])[idxs - segs[si]['start'], local_keys]
+            if KEY_IDX in row:
+                row[KEY_IDX] += segs[si]['start']
+            return row
+        elif isinstance(idxs, slice):
+            rows = []
+            for si, run in split_runs(list(range(*idxs.indices(N))), [seg['start'] for seg in segs]):
+                start = segs[si]['start']
+                lo, hi = run[0] - start, run[-1] - start
+                step = idxs.step or 1
+                local = slice(lo, hi + 1, step) if step > 0 else slice(lo, hi - 1 if hi > 0 else None, step)
+                part = self._seg_table(segs[si])[local, local_keys]
+                for row in part:
+                    if KEY_IDX in row:
+                        row[KEY_IDX] += start
+                rows.extend(part)
+            if sent2x is sent2flat:
+                key_list = list(rows[0].keys()) if rows else [k for k in (local_keys or self._key2type()) if local_keys or k != KEY_IDX]
+                return {key: [row[key] for row in rows] for key in key_list}
+            return rows
+        else:
+            raise TypeError(f"Index must be int or slice, not {type(idxs)}")
+
+    def __getitem__(self, args):
+        if isinstance(args, tuple):
+            idxs = args[0]
+            keys = args[1] if len(args) > 1 else None
+            sent2x = args[2] if len(args) > 2 else sent2row
+        else:
+            idxs = args
+            keys = None
+            sent2x = sent2row
+        with self._lock:
+            return self._fetch(idxs, keys, sent2x)
+
+    def rows(self, idxs=Slice[::], keys=None):
+        return self[idxs, keys]
+
+    def cols(self, keys=None, idxs=Slice[::]):
+        return self[idxs, keys, sent2flat]
+
+
+if __name__ == '__main__':
+    pass
+
+    from gatling.utility.xprint import xprint_rows
+    from a_const_debug import fpath_temp_tsv, ConstSchema, rows
+
+    ft = SegmentedTSVTable(fpath_temp_tsv + '.d', max_rows=2)
+    ft.create(tabledefine=ConstSchema)
+    ft.extend(rows)
+    print(ft.archive())
+    xprint_rows(ft[::-1])
+    print(ft.segments())
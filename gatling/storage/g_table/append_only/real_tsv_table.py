@@ -1,13 +1,19 @@
 import datetime
+import operator
 import os
 import traceback
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Optional, IO, Any, BinaryIO, Literal
+from typing import Optional, IO, Any, BinaryIO, Literal, Callable, Iterator
 
 from gatling.define.tabledefine import TableDefine, Field
 
 from gatling.storage.g_table.append_only.base_apo_table import BaseAPOTable
-from gatling.storage.g_table.append_only.help_tools.file_tools import readline_forward, append_line, extend_lines, readline_backward, goto_tail, get_pos, set_pos, goto_head, truncate, popout
+from gatling.storage.g_table.append_only.help_tools.file_tools import readline_forward, append_line, extend_lines, iter_lines_backward, tail_end, goto_tail, get_pos, set_pos, goto_head, truncate, popout
+from gatling.storage.g_table.append_only.help_tools.index_tools import index_fpath, create_index_file, append_index, truncate_index, load_index, remove_index_file
+from gatling.storage.g_table.append_only.help_tools.lock_tools import try_lock_writer
+from gatling.storage.g_table.append_only.help_tools.meta_cache import FileMetaCache, stat_key
+from gatling.storage.g_table.append_only.help_tools.parallel_tools import split_ranges, read_range, resolve_workers, map_ordered
 from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
 from gatling.utility.error_tools import FileAlreadyOpenedForWriteError, FileAlreadyOpenedError, FileAlreadyOpenedForReadError, FileNotOpenError
 from gatling.utility.io_fctns import remove_file
@@ -28,14 +34,27 @@ class KeyType(TableDefine):
     datetime = Field(datetime.datetime)
 
 
+# KeyType resolved once: header type name -> dtype, and dtype -> its tostr / fmstr
+_KEYTYPE_SCHEMA = KeyType.get_schema()
+_NAME2DTYPE = dict(_KEYTYPE_SCHEMA.name2dtype)
+_TOSTR = dict(zip(_KEYTYPE_SCHEMA.dtypes, _KEYTYPE_SCHEMA.tostrs))
+_FMSTR = dict(zip(_KEYTYPE_SCHEMA.dtypes, _KEYTYPE_SCHEMA.fmstrs))
+_TOSTR_MANY = {f.dtype: f.tostr_many for f in _KEYTYPE_SCHEMA.fields}
+_FMSTR_MANY = {f.dtype: f.fmstr_many for f in _KEYTYPE_SCHEMA.fields}
+
 KEY_IDX = "*"
 
+# (key2type, next_idx, end_pos) per file, valid while the file keeps its (inode, size, mtime);
+# end_pos is the end of the last complete line, so a row still being appended is never counted
+TSV_META_CACHE = FileMetaCache()
+
 
 @dataclass
 class FileTableAOState:
     file: Optional[BinaryIO] = None
     key2type: Optional[dict[str, Any]] = None
     next_idx: Optional[int] = None
+    end_pos: Optional[int] = None  # pinned data end of a read snapshot; None for writers (file tail)
 
 
 def head2sent(key2type):
@@ -44,7 +63,7 @@ def head2sent(key2type):
 
 def sent2head(sent):
     try:
-        return {k: KeyType[v].dtype for k, v in (item.rsplit('.', 1) for item in sent.split('\t'))}
+        return {k: _NAME2DTYPE[v] for k, v in (item.rsplit('.', 1) for item in sent.split('\t'))}
     except ValueError as e:
         print(f"{e} error parsing (rsplit failed): {sent!r}")
 
@@ -57,17 +76,17 @@ def sent2head(sent):
 
 
 def row2sent(row, key2type):
-    return '\t'.join(KeyType[ktype.__name__].tostr(row[kname]) for kname, ktype in key2type.items())
+    return '\t'.join(_TOSTR[ktype](row[kname]) for kname, ktype in key2type.items())
 
 
 def sent2row(sent, key2type, key2idx=None):
     values = sent.split('\t')
     if key2idx is None:
-        return {kname: KeyType[ktype.__name__].fmstr(val) for (kname, ktype), val in zip(key2type.items(), values)}
+        return {kname: _FMSTR[ktype](val) for (kname, ktype), val in zip(key2type.items(), values)}
     else:
 
         return {
-            key: KeyType[key2type[key].__name__].fmstr(values[idx])
+            key: _FMSTR[key2type[key]](values[idx])
             for key, idx in key2idx.items()
         }
 
@@ -75,9 +94,25 @@ def sent2row(sent, key2type, key2idx=None):
 def sent2flat(sent, key2type, key2idx=None):
     values = sent.split('\t')
     if key2idx is None:
-        return [KeyType[ktype.__name__].fmstr(val) for (kname, ktype), val in zip(key2type.items(), values)]
+        return [_FMSTR[ktype](val) for (kname, ktype), val in zip(key2type.items(), values)]
     else:
-        return [KeyType[key2type[key].__name__].fmstr(values[idx]) for key, idx in key2idx.items()]
+        return [_FMSTR[key2type[key]](values[idx]) for key, idx in key2idx.items()]
+
+
+def rows2sents(rows, key2type, start_idx):
+    """Lines for rows numbered from start_idx, converted one column at a time."""
+    cols = [
+        list(map(str, range(start_idx, start_idx + len(rows)))) if kname == KEY_IDX
+        else _TOSTR_MANY[ktype]([row[kname] for row in rows])
+        for kname, ktype in key2type.items()
+    ]
+    return ['\t'.join(vals) for vals in zip(*cols)]
+
+
+def sents2cols(sents, key2type, key2idx):
+    """{key: values} for lines, each projected column converted in one batch."""
+    splits = [sent.split('\t') for sent in sents]
+    return {key: _FMSTR_MANY[key2type[key]](list(map(operator.itemgetter(idx), splits))) for key, idx in key2idx.items()}
 
 
 def get_key2idx(keys, key2type):
@@ -116,10 +151,9 @@ def fetch_data(idxs, temp_state, keys, sent2x):
             if idxs < -N:
                 raise IndexError(f"Index {idxs=} out of range for table with {N=} rows")
 
-            goto_tail(temp_state.file)
-            sent = readline_backward(temp_state.file)
-            for i in range(-idxs - 1):
-                sent = readline_backward(temp_state.file)
+            for i, (_, sent) in enumerate(iter_lines_backward(temp_state.file, end=temp_state.end_pos)):
+                if i == -idxs - 1:
+                    break
 
             row = sent2x(sent.decode(), temp_state.key2type, key2idx=key2idx)
 
@@ -139,6 +173,11 @@ def fetch_data(idxs, temp_state, keys, sent2x):
         target_iter = iter(range(start, stop, step))
         next_target = next(target_iter, None)
 
+        if sent2x is sent2flat:  # columns are decoded in one batch each once all lines are read
+            decode = bytes.decode
+        else:
+            decode = lambda sent: sent2x(sent.decode(), temp_state.key2type, key2idx=key2idx)
+
         rows = []
         if step > 0:
             goto_head(temp_state.file)
@@ -147,16 +186,14 @@ def fetch_data(idxs, temp_state, keys, sent2x):
                 sent = readline_forward(temp_state.file)
 
                 if current_idx == next_target:
-                    rows.append(sent2x(sent.decode(), temp_state.key2type, key2idx=key2idx))
+                    rows.append(decode(sent))
                     next_target = next(target_iter, None)
                     if next_target is None:
                         break
         elif step < 0:
-            goto_tail(temp_state.file)
-            for current_idx in range(N - 1, -1, -1):
-                sent = readline_backward(temp_state.file)
+            for current_idx, (_, sent) in zip(range(N - 1, -1, -1), iter_lines_backward(temp_state.file, end=temp_state.end_pos)):
                 if current_idx == next_target:
-                    rows.append(sent2x(sent.decode(), temp_state.key2type, key2idx=key2idx))
+                    rows.append(decode(sent))
                     next_target = next(target_iter, None)
                     if next_target is None:
                         break
@@ -164,18 +201,109 @@ def fetch_data(idxs, temp_state, keys, sent2x):
         if sent2x is sent2row:
             return rows
         elif sent2x is sent2flat:
-            keys = list(key2idx.keys())
-            if len(rows) == 0:
-                return {key: [] for key in keys}
-            else:
-                k2vs = {key: list(vals) for key, vals in zip(keys, zip(*rows))}
-                return k2vs
+            return sents2cols(rows, temp_state.key2type, key2idx)
         else:
             raise ValueError(f"sent2x must be sent2row or sent2flat, not {sent2x}")
     else:
         raise TypeError(f"Index must be int or slice, not {type(idxs)}")
 
 
+def compile_decoder(key2type, key2idx):
+    """(key, field position, fmstr) per projected column, resolved once instead of per field."""
+    return [(key, idx, _FMSTR[key2type[key]]) for key, idx in key2idx.items()]
+
+
+def scan_range(task):
+    """Decode one newline-aligned byte range; runs inside a worker process."""
+    fpath, start, end, key2type, key2idx, fctn, flat = task
+    lines = read_range(fpath, start, end)
+    if flat:
+        return list(sents2cols([line.decode() for line in lines], key2type, key2idx).values())
+    decoder = compile_decoder(key2type, key2idx)
+    rows = [{key: fmstr(values[idx]) for key, idx, fmstr in decoder} for values in (line.decode().split('\t') for line in lines)]
+    return fctn(rows)
+
+
+_RANGE_OPS = {'$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le}
+_NO_MATCH = object()
+
+
+def _coerce(value, dtype):
+    """
+    An equality operand as a value of the column's dtype, so it encodes like the stored values:
+    5 finds 5.0 in a float column, True finds 1 in an int column. _NO_MATCH for a number no
+    value of a numeric column can equal (5.5 in an int column); unconvertible operands as is.
+    """
+    if type(value) is dtype:
+        return value
+    try:
+        coerced = dtype(value)
+    except (TypeError, ValueError):
+        return value
+    if dtype in (int, float, bool) and isinstance(value, (int, float)) and coerced != value:
+        return _NO_MATCH
+    return coerced
+
+
+
+def compile_op(op, value, dtype) -> Callable[[bytes], bool]:
+    """
+    Test on one raw (still encoded) field. Equality and membership compare bytes of the
+    operand converted to the column's dtype (see _coerce); ranges compare bytes for str
+    columns (UTF-8 keeps code point order) and decode only this field otherwise.
+    """
+    tostr, fmstr = _TOSTR[dtype], _FMSTR[dtype]
+
+    def enc(v):
+        return tostr(v).encode()
+
+    def encs(vs):
+        return frozenset(enc(c) for c in (_coerce(v, dtype) for v in vs) if c is not _NO_MATCH)
+
+    if op in ('$eq', '$ne'):
+        coerced = _coerce(value, dtype)
+        if coerced is _NO_MATCH:
+            return (lambda f: False) if op == '$eq' else (lambda f: True)
+        raw = enc(coerced)
+        return (lambda f: f == raw) if op == '$eq' else (lambda f: f != raw)
+    elif op == '$in':
+        raws = encs(value)
+        return lambda f: f in raws
+    elif op == '$nin':
+        raws = encs(value)
+        return lambda f: f not in raws
+
+    if dtype is str:
+        conv, bound = (lambda f: f), enc
+    else:
+        conv, bound = (lambda f: fmstr(f.decode())), (lambda v: v)
+    if op in _RANGE_OPS:
+        cmp, b = _RANGE_OPS[op], bound(value)
+        return lambda f: cmp(conv(f), b)
+    elif op == '$between':
+        lo, hi = bound(value[0]), bound(value[1])
+        return lambda f: lo <= conv(f) <= hi
+    else:
+        raise ValueError(f"unknown operator {op!r}")
+
+
+def compile_where(where, key2type) -> list[tuple[int, Callable[[bytes], bool]]]:
+    """
+    (field position, test) pairs for a where dict, all ANDed:
+    ``{'name': 'bob', 'level': {'$gte': 3, '$lt': 9}, 'city': {'$in': [...]}}``.
+    """
+    positions = {key: i for i, key in enumerate(key2type)}
+    tests = []
+    for key, cond in (where or {}).items():
+        if key not in positions:
+            raise KeyError(f"{key!r} is not a column")
+        if not isinstance(cond, dict):
+            cond = {'$eq': cond}
+        for op, value in cond.items():
+            tests.append((positions[key], compile_op(op, value, key2type[key])))
+    return tests
+
+
 # def row2sent_with_idx(idx, row, key2type):
 #     """
 #     Convert a row to a tab-separated string with index.
@@ -200,6 +328,20 @@ def fetch_data(idxs, temp_state, keys, sent2x):
 #     return '\t'.join(parts)
 
 
+class TSVSnapshot:
+    """Context returned by TSVTable.snapshot(): opens the table read-only, yields the table."""
+
+    def __init__(self, table: 'TSVTable'):
+        self.table = table
+
+    def __enter__(self) -> 'TSVTable':
+        self.table.state = self.table._build_state(self.table.state, open_mode='rb')
+        return self.table
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.table._clean_state(self.table.state)
+
+
 class TSVTable(BaseAPOTable):
 
     def __init__(self, fpath):
@@ -231,15 +373,18 @@ class TSVTable(BaseAPOTable):
             else:
                 return sent2row(first_sent, key2type)
 
-    def get_last_row(self, key2type=None):
+    def get_last_row(self, key2type=None, end=None):
         target_file = self.state.file
         if target_file is not None and is_write_mode(target_file):
             raise FileAlreadyOpenedForWriteError(f'{self.fpath} is already opened with write permission.')
         if key2type is None:
             key2type = self.get_key2type()
         with open(self.fpath, 'rb') as f:
-            goto_tail(f)
-            last_sent = readline_backward(f).decode()
+            if end is None:
+                goto_tail(f)
+                end = tail_end(f, get_pos(f))
+            _, last_sent = next(iter_lines_backward(f, end=end))
+            last_sent = last_sent.decode()
             if last_sent[0] == KEY_IDX:
                 return {}
             else:
@@ -249,9 +394,17 @@ class TSVTable(BaseAPOTable):
         target_file = self.state.file
         if target_file is not None:
             raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
-        key2type = {KEY_IDX: int, **tabledefine.get_name2dtype()}
+        schema = tabledefine.get_schema()
+        key2type = {KEY_IDX: int, **schema.name2dtype}
         with open(self.fpath, 'wb') as f:
             append_line(f, head2sent(key2type).encode())
+        key = stat_key(self.fpath)
+        TSV_META_CACHE.put(self.fpath, key, (key2type, 0, key[1]))
+        for key in key2type:
+            if key in schema.index_keys:
+                create_index_file(index_fpath(self.fpath, key))
+            else:
+                remove_index_file(index_fpath(self.fpath, key))
         return self
 
     def _build_state(self, ori_state: Optional[FileTableAOState] = None, open_mode: Literal['rb', 'rb+', 'ab'] = 'rb+') -> FileTableAOState:
@@ -266,14 +419,152 @@ class TSVTable(BaseAPOTable):
                     raise FileAlreadyOpenedForReadError(f'{self.fpath} is already opened with read permission.')
 
         fts = FileTableAOState() if ori_state is None else ori_state
-        fts.key2type = self.get_key2type()
-        last_row = self.get_last_row(fts.key2type)
-        fts.next_idx = last_row[KEY_IDX] + 1 if last_row else 0
-        fts.file = open(self.fpath, open_mode)
+        key2type, next_idx, end_pos = self._load_meta()  # before open(), which would create a missing file in 'ab'
+        file = open(self.fpath, open_mode)
+        if is_write_mode(file):
+            if not try_lock_writer(file):
+                file.close()
+                raise FileAlreadyOpenedForWriteError(f'{self.fpath} is locked by another writer.')
+            key2type, next_idx, end_pos = self._load_meta()
+            if os.fstat(file.fileno()).st_size > end_pos:
+                os.ftruncate(file.fileno(), end_pos)  # drop a torn last line left by a crashed writer
+            end_pos = None
+        fts.file, fts.key2type, fts.next_idx, fts.end_pos = file, key2type, next_idx, end_pos
         return fts
 
+    def _load_meta(self) -> tuple[dict[str, Any], int, int]:
+        """(key2type, next_idx, end_pos) from the metadata cache, re-reading header and last row on a miss."""
+        key = stat_key(self.fpath)
+        meta = TSV_META_CACHE.get(self.fpath, key)
+        if meta is None:
+            key2type = self.get_key2type()
+            with open(self.fpath, 'rb') as f:
+                end_pos = tail_end(f, key[1])
+            last_row = self.get_last_row(key2type, end=end_pos)
+            meta = (key2type, last_row[KEY_IDX] + 1 if last_row else 0, end_pos)
+            TSV_META_CACHE.put(self.fpath, key, meta)
+        return meta
+
+    def snapshot(self) -> TSVSnapshot:
+        """
+        Read-only context pinned to the rows complete at entry: ``with ft.snapshot(): ft[-10:]``.
+
+        Takes no lock, so it never waits for (or blocks) a writer appending to the same file.
+        """
+        return TSVSnapshot(self)
+
+    # ===================== Index =====================
+
+    def index_keys(self) -> list[str]:
+        """
+        Columns that carry a secondary index (an index file next to the table), checked on
+        every call so indexes created or dropped through another TSVTable are seen.
+        """
+        key2type = self.state.key2type if self.state.file is not None else self._load_meta()[0]
+        return self._indexed(key2type)
+
+    def _indexed(self, key2type) -> list[str]:
+        return [key for key in key2type if os.path.exists(index_fpath(self.fpath, key))]
+
+    def _index_append(self, key2type, start_idx: int, pos: int, sents: list[bytes]):
+        """Record rows start_idx.. written at byte offset pos (sents without trailing newline)."""
+        index_keys = self._indexed(key2type)
+        if len(index_keys) == 0:
+            return
+        cols = [list(key2type).index(key) for key in index_keys]
+        key2entries = {key: [] for key in index_keys}
+        for i, sent in enumerate(sents):
+            values = sent.split(b'\t')
+            for key, col in zip(index_keys, cols):
+                key2entries[key].append((values[col], start_idx + i, pos))
+            pos += len(sent) + 1
+        for key, entries in key2entries.items():
+            append_index(index_fpath(self.fpath, key), entries)
+
+    def _index_truncate(self, key2type, next_idx: int):
+        for key in self._indexed(key2type):
+            truncate_index(index_fpath(self.fpath, key), next_idx)
+
+    def create_index(self, key) -> 'TSVTable':
+        """Build an index on an existing column from the rows already in the table."""
+        target_file = self.state.file
+        if target_file is not None:
+            raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+        key2type = self._load_meta()[0]
+        if key not in key2type or key == KEY_IDX:
+            raise KeyError(f"{key!r} is not a column of {self.fpath}")
+        col = list(key2type).index(key)
+        entries = []
+        temp_state = self._build_state(open_mode='rb+')  # holds the writer lock while backfilling
+        try:
+            goto_head(temp_state.file)
+            readline_forward(temp_state.file)
+            pos = get_pos(temp_state.file)
+            for line in temp_state.file:
+                entries.append((line.split(b'\t')[col].rstrip(b'\n'), int(line[:line.index(b'\t')]), pos))
+                pos += len(line)
+            fpath_idx = index_fpath(self.fpath, key)
+            create_index_file(fpath_idx)
+            append_index(fpath_idx, entries)
+        finally:
+            self._clean_state(temp_state)
+        return self
+
+    def drop_index(self, key) -> 'TSVTable':
+        remove_index_file(index_fpath(self.fpath, key))
+        return self
+
+    def find(self, where: Optional[dict[str, Any]] = None, keys=None, **kwargs) -> list[dict]:
+        """
+        Rows whose indexed columns equal the given values, in row order.
+
+        ``ft.find(name='bob')`` or ``ft.find({'name': 'bob', 'age': 3}, keys=['name'])``;
+        every column in the condition must be indexed.
+        """
+        where = {**(where or {}), **kwargs}
+        if len(where) == 0:
+            raise ValueError("find() needs at least one column=value condition")
+        index_keys = self.index_keys()
+        for key in where:
+            if key not in index_keys:
+                raise KeyError(f"{key!r} is not indexed in {self.fpath}")
+
+        if self.state.file is None:
+            temp_state = self._build_state(open_mode='rb')
+            try:
+                return self._find(temp_state, where, keys)
+            finally:
+                self._clean_state(temp_state)
+        else:
+            cur_state = self.state
+            cur_pos = get_pos(cur_state.file)
+            try:
+                return self._find(cur_state, where, keys)
+            finally:
+                set_pos(cur_state.file, cur_pos)
+
+    def _find(self, state, where, keys) -> list[dict]:
+        key2type = state.key2type
+        locs = None
+        for key, value in where.items():
+            value = _coerce(value, key2type[key])
+            if value is _NO_MATCH:
+                return []
+            raw = _TOSTR[key2type[key]](value).encode()
+            found = {loc for loc in load_index(index_fpath(self.fpath, key)).get(raw, ()) if loc[0] < state.next_idx}
+            locs = found if locs is None else locs & found
+            if not locs:
+                return []
+
+        key2idx = get_key2idx(keys, key2type)
+        rows = []
+        for _, offset in sorted(locs):
+            set_pos(state.file, offset)
+            rows.append(sent2row(readline_forward(state.file).decode(), key2type, key2idx=key2idx))
+        return rows
+
     def __enter__(self):
-        self.state = self._build_state(self.state)
+        self.state = self._build_state(self.state, open_mode='rb+')
         return self
 
     def _clean_state(self, ori_state: Optional[FileTableAOState]):
@@ -281,9 +572,13 @@ class TSVTable(BaseAPOTable):
         if target_file is None:
             raise FileNotOpenError(f'{self.fpath} is not opened.')
         ori_state.file.close()
+        if is_write_mode(target_file):
+            key = stat_key(self.fpath)
+            TSV_META_CACHE.put(self.fpath, key, (ori_state.key2type, ori_state.next_idx, key[1]))
         ori_state.file = None
         ori_state.key2type = None
         ori_state.next_idx = None
+        ori_state.end_pos = None
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._clean_state(self.state)
@@ -333,7 +628,11 @@ class TSVTable(BaseAPOTable):
         target_file = self.state.file
         if target_file is not None:
             raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+        if os.path.exists(self.fpath):
+            for key in self.index_keys():
+                remove_index_file(index_fpath(self.fpath, key))
         remove_file(self.fpath)
+        TSV_META_CACHE.pop(self.fpath)
         return self
 
     def truncate(self) -> 'TSVTable':
@@ -342,79 +641,92 @@ class TSVTable(BaseAPOTable):
             raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
 
         with open(self.fpath, 'rb+') as f:
+            if not try_lock_writer(f):
+                raise FileAlreadyOpenedForWriteError(f'{self.fpath} is locked by another writer.')
             goto_head(f)
             readline_forward(f)
             truncate(f)
+        TSV_META_CACHE.pop(self.fpath)
+        for key in self.index_keys():
+            create_index_file(index_fpath(self.fpath, key))
         return self
 
     def append(self, row) -> 'TSVTable':
         if self.state.file is None:
             temp_state = self._build_state(open_mode='ab')
             try:
-                append_line(temp_state.file, row2sent({KEY_IDX: temp_state.next_idx, **row}, temp_state.key2type).encode())
+                pos = get_pos(temp_state.file)
+                sent = row2sent({KEY_IDX: temp_state.next_idx, **row}, temp_state.key2type).encode()
+                append_line(temp_state.file, sent)
                 # self._write_row(temp_state, row)
+                self._index_append(temp_state.key2type, temp_state.next_idx, pos, [sent])
+                temp_state.next_idx += 1
             finally:
                 self._clean_state(temp_state)
         else:
             cur_state = self.state
             cur_pos = get_pos(cur_state.file)
             goto_tail(cur_state.file)
-            append_line(cur_state.file, row2sent({KEY_IDX: cur_state.next_idx, **row}, cur_state.key2type).encode())
+            pos = get_pos(cur_state.file)
+            sent = row2sent({KEY_IDX: cur_state.next_idx, **row}, cur_state.key2type).encode()
+            append_line(cur_state.file, sent)
             # self._write_row(cur_state, row)
+            self._index_append(cur_state.key2type, cur_state.next_idx, pos, [sent])
             cur_state.next_idx += 1
             set_pos(cur_state.file, cur_pos)
         return self
 
     def extend(self, rows) -> 'TSVTable':
+        return self._extend_lines(len(rows), lambda start_idx, key2type: [sent.encode() for sent in rows2sents(rows, key2type, start_idx)])
+
+    def _extend_lines(self, n: int, encode) -> 'TSVTable':
+        """Append n rows given as ``encode(start_idx, key2type)``, which returns their encoded lines."""
         if self.state.file is None:
             temp_state = self._build_state(open_mode='ab')
             try:
-                if len(rows) == 0:
+                if n == 0:
                     return self
                 start_idx = temp_state.next_idx
-                extend_lines(temp_state.file, [
-                    row2sent({KEY_IDX: start_idx + i, **row}, temp_state.key2type).encode()
-                    for i, row in enumerate(rows)
-                ])
+                pos = get_pos(temp_state.file)
+                sents = encode(start_idx, temp_state.key2type)
+                extend_lines(temp_state.file, sents)
                 # self._write_rows(temp_state, rows)
+                self._index_append(temp_state.key2type, start_idx, pos, sents)
+                temp_state.next_idx += n
             finally:
                 self._clean_state(temp_state)
         else:
             cur_state = self.state
-            if len(rows) == 0:
+            if n == 0:
                 return self
 
             cur_pos = get_pos(cur_state.file)
             goto_tail(cur_state.file)
             start_idx = cur_state.next_idx
-            extend_lines(cur_state.file, [
-                row2sent({KEY_IDX: start_idx + i, **row}, cur_state.key2type).encode()
-                for i, row in enumerate(rows)
-            ])
+            pos = get_pos(cur_state.file)
+            sents = encode(start_idx, cur_state.key2type)
+            extend_lines(cur_state.file, sents)
             # self._write_rows(cur_state, rows)
-            cur_state.next_idx += len(rows)
+            self._index_append(cur_state.key2type, start_idx, pos, sents)
+            cur_state.next_idx += n
             set_pos(cur_state.file, cur_pos)
         return self
 
+    def writer(self, max_rows: int = 1000, max_bytes: int = 1 << 20, max_delay: Optional[float] = 1.0, durability: str = 'buffer'):
+        """Buffered group-commit writer for high-rate appends, see TSVTableWriter."""
+        from gatling.storage.g_table.append_only.tsv_table_writer import TSVTableWriter
+        return TSVTableWriter(self, max_rows=max_rows, max_bytes=max_bytes, max_delay=max_delay, durability=durability)
+
     def keys(self) -> list:
         if self.state.file is None:
-            temp_state = self._build_state(open_mode='rb')
-            try:
-                return list(temp_state.key2type.keys())
-            finally:
-                self._clean_state(temp_state)
-
+            key2type = self._load_meta()[0]
+            return list(key2type.keys())
         else:
             return list(self.state.key2type.keys())
 
     def __len__(self):
         if self.state.file is None:
-            temp_state = self._build_state(open_mode='rb')
-            res_len = temp_state.next_idx
-            try:
-                return res_len
-            finally:
-                self._clean_state(temp_state)
+            return self._load_meta()[1]
         else:
             return self.state.next_idx
 
@@ -453,9 +765,167 @@ class TSVTable(BaseAPOTable):
     def rows(self, idxs=Slice[::], keys=None):
         return self[idxs, keys]
 
-    def cols(self, keys=None, idxs=Slice[::]):
+    def cols(self, keys=None, idxs=Slice[::], workers: Optional[int] = None):
+        """Columns as {key: values}; with workers set, a full-table read is parsed in a process pool."""
+        if workers is not None and isinstance(idxs, slice) and idxs.indices(len(self)) == (0, len(self), 1):
+            key2idx, col_parts = self._parallel(keys, None, True, workers)
+            return {key: [val for part in col_parts for val in part[i]] for i, key in enumerate(key2idx)}
         return self[idxs, keys, sent2flat]
 
+    def select(self, where: Optional[dict[str, Any]] = None, keys=None, limit: Optional[int] = None) -> list[dict]:
+        """
+        Rows matching ``where`` in row order, projected to ``keys``.
+
+        Predicates are evaluated on the raw fields of each line, and only the projected
+        columns of matching rows are decoded. Operators: plain value (equality), $eq, $ne,
+        $gt, $gte, $lt, $lte, $in, $nin, $between (inclusive pair).
+        """
+        if self.state.file is None:
+            temp_state = self._build_state(open_mode='rb')
+            try:
+                return self._select(temp_state, where, keys, limit)
+            finally:
+                self._clean_state(temp_state)
+        else:
+            cur_state = self.state
+            cur_pos = get_pos(cur_state.file)
+            try:
+                return self._select(cur_state, where, keys, limit)
+            finally:
+                set_pos(cur_state.file, cur_pos)
+
+    def _select(self, state, where, keys, limit) -> list[dict]:
+        key2type = state.key2type
+        tests = compile_where(where, key2type)
+        decoder = compile_decoder(key2type, get_key2idx(keys, key2type))
+        maxsplit = max([pos for pos, _ in tests] + [idx for _, idx, _ in decoder] + [0]) + 1
+
+        rows = []
+        if limit is not None and limit <= 0:
+            return rows
+        goto_head(state.file)
+        readline_forward(state.file)
+        for _ in range(state.next_idx):
+            fields = readline_forward(state.file).split(b'\t', maxsplit)
+            if all(test(fields[pos]) for pos, test in tests):
+                rows.append({key: fmstr(fields[idx].decode()) for key, idx, fmstr in decoder})
+                if limit is not None and len(rows) >= limit:
+                    break
+        return rows
+
+    def scan(self, fctn, workers: Optional[int] = None, keys=None) -> list:
+        """
+        Split the file into newline-aligned byte ranges, decode each range in a process pool
+        and return ``fctn(rows_of_range)`` for every range, in file order.
+
+        fctn runs in the worker, so it should filter or aggregate, e.g.
+        ``sum(ft.scan(lambda rows: sum(r['price'] for r in rows), workers=8))``.
+        """
+        _, results = self._parallel(keys, fctn, False, workers)
+        return results
+
+    def _parallel(self, keys, fctn, flat, workers):
+        workers = resolve_workers(workers)
+        if self.state.file is None:
+            temp_state = self._build_state(open_mode='rb')
+            try:
+                return self._parallel_state(temp_state, keys, fctn, flat, workers)
+            finally:
+                self._clean_state(temp_state)
+        else:
+            if is_write_mode(self.state.file):
+                self.state.file.flush()
+            return self._parallel_state(self.state, keys, fctn, flat, workers)
+
+    def _parallel_state(self, state, keys, fctn, flat, workers):
+        key2idx = get_key2idx(keys, state.key2type)
+        with open(self.fpath, 'rb') as f:
+            head_end = len(f.readline())
+        end = state.end_pos if state.end_pos is not None else os.fstat(state.file.fileno()).st_size
+        tasks = [
+            (self.fpath, start, stop, state.key2type, key2idx, fctn, flat)
+            for start, stop in split_ranges(self.fpath, head_end, end, workers * 4)
+        ]
+        return key2idx, map_ordered(scan_range, tasks, workers)
+
+    # ===================== Bulk Copy =====================
+
+    def _iter_lines(self, batch_size: int) -> Iterator[tuple[dict[str, Any], list[bytes]]]:
+        """(key2type, raw lines) per batch in file order; only one batch is held in memory."""
+        owned = self.state.file is None
+        state = self._build_state(open_mode='rb') if owned else self.state
+        try:
+            remain = state.next_idx
+            pos = None
+            while remain > 0:
+                cur_pos = get_pos(state.file)
+                if pos is None:
+                    goto_head(state.file)
+                    readline_forward(state.file)
+                else:
+                    set_pos(state.file, pos)
+                lines = [readline_forward(state.file) for _ in range(min(batch_size, remain))]
+                pos = get_pos(state.file)
+                set_pos(state.file, cur_pos)
+                remain -= len(lines)
+                yield state.key2type, lines
+        finally:
+            if owned:
+                self._clean_state(state)
+
+    def iter_batches(self, batch_size: int = 1000, keys=None) -> Iterator[list[dict]]:
+        """Rows in file order as lists of at most batch_size rows."""
+        decoder = None
+        for key2type, lines in self._iter_lines(batch_size):
+            if decoder is None:
+                decoder = compile_decoder(key2type, get_key2idx(keys, key2type))
+            yield [{key: fmstr(values[idx]) for key, idx, fmstr in decoder} for values in (line.decode().split('\t') for line in lines)]
+
+    def copy_to(self, sql_table, keys=None, batch_size: int = 10000) -> int:
+        """
+        Stream rows into a SQL table and return how many were copied.
+
+        Tables with ``copy_in_lines`` (PGSQLTable) get the raw lines through COPY FROM STDIN
+        without decoding them; others get batched inserts in one transaction.
+        """
+        if keys is None:
+            keys = [k for k in self.keys() if k != KEY_IDX]
+        count = 0
+
+        if hasattr(sql_table, 'copy_in_lines'):
+            def blocks():
+                nonlocal count
+                positions = None
+                for key2type, lines in self._iter_lines(batch_size):
+                    if positions is None:
+                        positions = [list(key2type).index(k) for k in keys]
+                    if positions == list(range(1, len(key2type))):
+                        fields = [line.partition(b'\t')[2] for line in lines]
+                    else:
+                        fields = [b'\t'.join(vals[p] for p in positions) for vals in (line.split(b'\t') for line in lines)]
+                    # COPY text format treats backslash as an escape character
+                    yield b''.join(f.replace(b'\\', b'\\\\') + b'\n' for f in fields)
+                    count += len(lines)
+
+            sql_table.copy_in_lines(keys, blocks())
+            return count
+
+        with sql_table if sql_table._conn is None else nullcontext():
+            for rows in self.iter_batches(batch_size, keys):
+                sql_table.insert(*rows, batch_size=batch_size)
+                count += len(rows)
+        return count
+
+    def copy_from(self, sql_table, where: Optional[dict] = None, order_by: Optional[dict[str, bool]] = None, batch_size: int = 10000) -> int:
+        """Append the rows of a SQL table, fetched batch by batch, and return how many were copied."""
+        keys = [k for k in self.keys() if k != KEY_IDX]
+        count = 0
+        with self if self.state.file is None else nullcontext():
+            for rows in sql_table.iter_fetch(where=where, keys=keys, order_by=order_by, chunk_size=batch_size):
+                self.extend(rows)
+                count += len(rows)
+        return count
+
     def pop(self) -> dict:
         if self.state.file is None:
             temp_state = self._build_state(open_mode='rb+')
@@ -465,6 +935,8 @@ class TSVTable(BaseAPOTable):
                 else:
                     sent = popout(temp_state.file)
                     item = sent2row(sent.decode(), temp_state.key2type, key2idx=None)
+                    temp_state.next_idx -= 1
+                    self._index_truncate(temp_state.key2type, temp_state.next_idx)
 
                     return item
 
@@ -479,6 +951,8 @@ class TSVTable(BaseAPOTable):
                 else:
                     sent = popout(cur_state.file)
                     item = sent2row(sent.decode(), cur_state.key2type, key2idx=None)
+                    cur_state.next_idx -= 1
+                    self._index_truncate(cur_state.key2type, cur_state.next_idx)
                     return item
 
             finally:
@@ -492,18 +966,18 @@ class TSVTable(BaseAPOTable):
                     return []
                 else:
                     sents = []
-                    cur_idx = temp_state.next_idx
                     goto_tail(temp_state.file)
-                    for i in range(n):
-                        if cur_idx == 0:
-                            break
-                        else:
-                            sent = readline_backward(temp_state.file)
+                    cut_pos = get_pos(temp_state.file)
+                    if n > 0:
+                        for cut_pos, sent in iter_lines_backward(temp_state.file, end=cut_pos):
                             sents.append(sent)
-                            cur_idx -= 1
+                            if len(sents) == min(n, temp_state.next_idx):
+                                break
                     items = [sent2row(sent.decode(), temp_state.key2type, key2idx=None) for sent in sents]
+                    set_pos(temp_state.file, cut_pos)
                     truncate(temp_state.file)
-                    temp_state.next_idx = n
+                    temp_state.next_idx -= len(sents)
+                    self._index_truncate(temp_state.key2type, temp_state.next_idx)
                     return items
 
             finally:
@@ -516,18 +990,18 @@ class TSVTable(BaseAPOTable):
                     return []
                 else:
                     sents = []
-                    cur_idx = cur_state.next_idx
                     goto_tail(cur_state.file)
-                    for i in range(n):
-                        if cur_idx == 0:
-                            break
-                        else:
-                            sent = readline_backward(cur_state.file)
+                    cut_pos = get_pos(cur_state.file)
+                    if n > 0:
+                        for cut_pos, sent in iter_lines_backward(cur_state.file, end=cut_pos):
                             sents.append(sent)
-                            cur_idx -= 1
+                            if len(sents) == min(n, cur_state.next_idx):
+                                break
                     items = [sent2row(sent.decode(), cur_state.key2type, key2idx=None) for sent in sents]
+                    set_pos(cur_state.file, cut_pos)
                     truncate(cur_state.file)
-                    cur_state.next_idx = n
+                    cur_state.next_idx -= len(sents)
+                    self._index_truncate(cur_state.key2type, cur_state.next_idx)
                     return items
 
             finally:
@@ -0,0 +1,398 @@
+import os
+import struct
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Optional, BinaryIO, Any, Literal
+
+import zstandard as zstd
+
+from gatling.storage.g_table.append_only.base_apo_table import BaseAPOTable
+from gatling.storage.g_table.append_only.help_tools.file_tools import readline_forward, append_line, extend_lines, goto_head, goto_tail, get_pos, set_pos, truncate
+from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
+from gatling.storage.g_table.append_only.real_tsv_table import KEY_IDX, head2sent, sent2head, row2sent, rows2sents, sent2row, sent2flat, sents2cols, get_key2idx
+from gatling.utility.error_tools import FileAlreadyOpenedForWriteError, FileAlreadyOpenedError, FileNotOpenError
+from gatling.utility.io_fctns import remove_file
+
+# One block index entry: (frame offset in data file, frame length, number of rows in frame)
+_BLOCK = struct.Struct('<QII')
+
+
+@dataclass
+class ZSTTableState:
+    file: Optional[BinaryIO] = None
+    idx_file: Optional[BinaryIO] = None
+    tail_file: Optional[BinaryIO] = None
+    key2type: Optional[dict[str, Any]] = None
+    next_idx: Optional[int] = None
+    head_end: Optional[int] = None
+    blocks: list[tuple[int, int, int]] = field(default_factory=list)
+    starts: list[int] = field(default_factory=list)
+    sealed: int = 0
+    tail: list[bytes] = field(default_factory=list)
+
+
+def read_blocks(idx_file) -> list[tuple[int, int, int]]:
+    goto_head(idx_file)
+    data = idx_file.read()
+    n = len(data) // _BLOCK.size
+    return [_BLOCK.unpack_from(data, i * _BLOCK.size) for i in range(n)]
+
+
+def read_tail(tail_file, sealed: int) -> list[bytes]:
+    """Lines of the open tail block, without a torn last line or rows a crash left already sealed."""
+    if tail_file is None:
+        return []
+    goto_head(tail_file)
+    lines = tail_file.read().split(b'\n')[:-1]
+    return [line for line in lines if int(line.split(b'\t', 1)[0]) >= sealed]
+
+
+def blocks2starts(blocks) -> list[int]:
+    starts = []
+    acc = 0
+    for _, _, nrows in blocks:
+        starts.append(acc)
+        acc += nrows
+    return starts
+
+
+class ZSTTable(BaseAPOTable):
+    """
+    Append-only table stored as independently compressed zstd frames.
+
+    The data file holds the TSV header line followed by one zstd frame per block of
+    ``block_rows`` rows. A fixed-width sidecar index (``<fpath>.bidx``) records
+    (offset, length, nrows) for every frame, so random access only decompresses the
+    blocks it touches. Rows of the last, not yet full block are appended uncompressed to
+    ``<fpath>.tail`` and compressed once block_rows of them are there.
+
+    A block is written to the data file before its index entry, and the tail is replaced
+    by a rename after both, so opening for write after a crash drops data past the last
+    indexed frame and tail rows that were already sealed.
+    """
+
+    def __init__(self, fpath, block_rows: int = 1024, level: int = 3):
+        super().__init__()
+        if block_rows <= 0:
+            raise ValueError(f"block_rows must be positive, got {block_rows}")
+        self.fpath = fpath
+        self.fpath_idx = f"{fpath}.bidx"
+        self.fpath_tail = f"{fpath}.tail"
+        self.block_rows = block_rows
+        self.level = level
+        self.state = ZSTTableState()
+
+    def _check_closed(self):
+        if self.state.file is not None:
+            raise FileAlreadyOpenedError(f'{self.fpath} is already opened with read or write permission.')
+
+    def get_key2type(self):
+        if self.state.file is not None:
+            raise FileAlreadyOpenedForWriteError(f'{self.fpath} is already opened with write permission.')
+        with open(self.fpath, 'rb') as f:
+            return sent2head(readline_forward(f).decode())
+
+    def create(self, tabledefine) -> 'ZSTTable':
+        self._check_closed()
+        key2type = {KEY_IDX: int, **tabledefine.get_schema().name2dtype}
+        with open(self.fpath, 'wb') as f:
+            append_line(f, head2sent(key2type).encode())
+        for fpath in (self.fpath_idx, self.fpath_tail):
+            with open(fpath, 'wb'):
+                pass
+        return self
+
+    def exists(self) -> bool:
+        return os.path.exists(self.fpath)
+
+    def drop(self) -> 'ZSTTable':
+        self._check_closed()
+        remove_file(self.fpath)
+        remove_file(self.fpath_idx)
+        remove_file(self.fpath_tail)
+        return self
+
+    def truncate(self) -> 'ZSTTable':
+        self._check_closed()
+        with open(self.fpath, 'rb+') as f:
+            goto_head(f)
+            readline_forward(f)
+            truncate(f)
+        for fpath in (self.fpath_idx, self.fpath_tail):
+            with open(fpath, 'wb'):
+                pass
+        return self
+
+    # ===================== State =====================
+
+    def _build_state(self, ori_state: Optional[ZSTTableState] = None, open_mode: Literal['rb', 'rb+'] = 'rb+') -> ZSTTableState:
+        if ori_state is not None and ori_state.file is not None:
+            raise FileAlreadyOpenedForWriteError(f'{self.fpath} is already opened with write permission.')
+
+        fts = ZSTTableState() if ori_state is None else ori_state
+        files = []
+        try:
+            for fpath in (self.fpath, self.fpath_idx):
+                files.append(open(fpath, open_mode))
+            if open_mode == 'rb+' or os.path.exists(self.fpath_tail):
+                files.append(open(self.fpath_tail, 'ab+' if open_mode == 'rb+' else 'rb'))
+            else:  # written before the tail sidecar existed; nothing is buffered
+                files.append(None)
+        except BaseException:
+            for f in files:
+                if f is not None:
+                    f.close()
+            raise
+        fts.file, fts.idx_file, fts.tail_file = files
+        fts.key2type = sent2head(readline_forward(fts.file).decode())
+        fts.head_end = get_pos(fts.file)
+
+        blocks = read_blocks(fts.idx_file)
+        goto_tail(fts.file)
+        size = get_pos(fts.file)
+        while blocks and blocks[-1][0] + blocks[-1][1] > size:  # indexed, but the frame never landed
+            blocks.pop()
+        self._set_blocks(fts, blocks)
+        if open_mode == 'rb+':
+            # cut what an interrupted write left past the last indexed frame
+            set_pos(fts.idx_file, len(blocks) * _BLOCK.size)
+            truncate(fts.idx_file)
+            set_pos(fts.file, self._data_end(fts))
+            truncate(fts.file)
+        fts.tail = read_tail(fts.tail_file, fts.sealed)
+        if open_mode == 'rb+':
+            goto_head(fts.tail_file)
+            if fts.tail_file.read() != b''.join(line + b'\n' for line in fts.tail):
+                self._save_tail(fts)
+        fts.next_idx = fts.sealed + len(fts.tail)
+        return fts
+
+    def _clean_state(self, ori_state: ZSTTableState):
+        if ori_state.file is None:
+            raise FileNotOpenError(f'{self.fpath} is not opened.')
+        ori_state.file.close()
+        ori_state.idx_file.close()
+        if ori_state.tail_file is not None:
+            ori_state.tail_file.close()
+        ori_state.file = None
+        ori_state.idx_file = None
+        ori_state.tail_file = None
+        ori_state.key2type = None
+        ori_state.next_idx = None
+        ori_state.head_end = None
+        ori_state.blocks = []
+        ori_state.starts = []
+        ori_state.sealed = 0
+        ori_state.tail = []
+
+    def __enter__(self):
+        self.state = self._build_state(self.state)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._clean_state(self.state)
+
+    def _run(self, fctn, open_mode):
+        """Run fctn(state) on the open context state, or on a temporary one."""
+        if self.state.file is None:
+            temp_state = self._build_state(open_mode=open_mode)
+            try:
+                return fctn(temp_state)
+            finally:
+                self._clean_state(temp_state)
+        else:
+            return fctn(self.state)
+
+    # ===================== Block IO =====================
+
+    def _read_block(self, state: ZSTTableState, bi: int) -> list[bytes]:
+        offset, length, _ = state.blocks[bi]
+        set_pos(state.file, offset)
+        return zstd.ZstdDecompressor().decompress(state.file.read(length)).split(b'\n')
+
+    def _data_end(self, state: ZSTTableState) -> int:
+        if not state.blocks:
+            return state.head_end
+        offset, length, _ = state.blocks[-1]
+        return offset + length
+
+    @staticmethod
+    def _set_blocks(state: ZSTTableState, blocks: list[tuple[int, int, int]]):
+        state.blocks = blocks
+        state.starts = blocks2starts(blocks)
+        state.sealed = state.starts[-1] + blocks[-1][2] if blocks else 0
+
+    def _save_tail(self, state: ZSTTableState):
+        """Replace the tail sidecar with state.tail in one rename, so a crash leaves the old or the new one."""
+        fpath_temp = self.fpath_tail + '.tmp'
+        with open(fpath_temp, 'wb') as f:
+            extend_lines(f, state.tail)
+        state.tail_file.close()
+        os.replace(fpath_temp, self.fpath_tail)
+        state.tail_file = open(self.fpath_tail, 'ab+')
+
+    def _seal(self, state: ZSTTableState, sents: list[bytes]):
+        """Compress whole blocks of sents after the last frame: data first, then the index entries."""
+        pos = self._data_end(state)
+        set_pos(state.file, pos)
+        cctx = zstd.ZstdCompressor(level=self.level)
+        new_blocks = []
+        for i in range(0, len(sents), self.block_rows):
+            chunk = sents[i:i + self.block_rows]
+            frame = cctx.compress(b'\n'.join(chunk))
+            state.file.write(frame)
+            new_blocks.append((pos, len(frame), len(chunk)))
+            pos += len(frame)
+        truncate(state.file)
+        state.file.flush()
+
+        set_pos(state.idx_file, len(state.blocks) * _BLOCK.size)
+        state.idx_file.write(b''.join(_BLOCK.pack(*b) for b in new_blocks))
+        state.idx_file.flush()
+        self._set_blocks(state, state.blocks + new_blocks)
+
+    def _write_sents(self, state: ZSTTableState, sents: list[bytes]):
+        state.tail.extend(sents)
+        n_full = len(state.tail) // self.block_rows * self.block_rows
+        if n_full:
+            self._seal(state, state.tail[:n_full])
+            del state.tail[:n_full]
+            self._save_tail(state)
+        else:
+            extend_lines(state.tail_file, sents)
+            state.tail_file.flush()
+        state.next_idx = state.sealed + len(state.tail)
+
+    def _pop_sents(self, state: ZSTTableState, n: int) -> list[bytes]:
+        """Remove the last n rows, returning their raw lines newest first."""
+        keep = len(state.blocks)
+        tail = state.tail
+        while keep > 0 and len(tail) < n:
+            keep -= 1
+            tail = self._read_block(state, keep) + tail
+        take = min(n, len(tail))
+        popped = tail[len(tail) - take:][::-1]
+        state.tail = tail[:len(tail) - take]
+        # the tail goes first: until the index shrinks, its rows below the sealed count are ignored
+        self._save_tail(state)
+        if keep < len(state.blocks):
+            self._set_blocks(state, state.blocks[:keep])
+            set_pos(state.idx_file, keep * _BLOCK.size)
+            truncate(state.idx_file)
+            state.idx_file.flush()
+            set_pos(state.file, self._data_end(state))
+            truncate(state.file)
+            state.file.flush()
+        state.next_idx = state.sealed + len(state.tail)
+        return popped
+
+    # ===================== Write =====================
+
+    def append(self, row) -> 'ZSTTable':
+        def _append(state):
+            self._write_sents(state, [row2sent({KEY_IDX: state.next_idx, **row}, state.key2type).encode()])
+
+        self._run(_append, 'rb+')
+        return self
+
+    def extend(self, rows) -> 'ZSTTable':
+        if len(rows) == 0:
+            if self.state.file is None and not self.exists():
+                raise FileNotFoundError(self.fpath)
+            return self
+
+        def _extend(state):
+            start_idx = state.next_idx
+            self._write_sents(state, [sent.encode() for sent in rows2sents(rows, state.key2type, start_idx)])
+
+        self._run(_extend, 'rb+')
+        return self
+
+    def pop(self) -> dict:
+        def _pop(state):
+            if state.next_idx == 0:
+                return {}
+            sent = self._pop_sents(state, 1)[0]
+            return sent2row(sent.decode(), state.key2type)
+
+        return self._run(_pop, 'rb+')
+
+    def shrink(self, n: int) -> list:
+        def _shrink(state):
+            if state.next_idx == 0:
+                return []
+            sents = self._pop_sents(state, n)
+            return [sent2row(sent.decode(), state.key2type) for sent in sents]
+
+        return self._run(_shrink, 'rb+')
+
+    # ===================== Read =====================
+
+    def _fetch(self, state: ZSTTableState, idxs, keys, sent2x):
+        N = state.next_idx
+        key2idx = get_key2idx(keys, state.key2type)
+        cache = {}
+
+        def _line(i):
+            if i >= state.sealed:
+                return state.tail[i - state.sealed]
+            bi = bisect_right(state.starts, i) - 1
+            if bi not in cache:
+                cache.clear()
+                cache[bi] = self._read_block(state, bi)
+            return cache[bi][i - state.starts[bi]]
+
+        if isinstance(idxs, int):
+            if idxs >= N or idxs < -N:
+                raise IndexError(f"Index {idxs=} out of range for table with {N=} rows")
+            row = sent2x(_line(idxs % N).decode(), state.key2type, key2idx=key2idx)
+            if sent2x is sent2flat:
+                return {key: val for key, val in zip(key2idx.keys(), row)}
+            return row
+        elif isinstance(idxs, slice):
+            if sent2x is sent2flat:
+                return sents2cols([_line(i).decode() for i in range(*idxs.indices(N))], state.key2type, key2idx)
+            return [sent2x(_line(i).decode(), state.key2type, key2idx=key2idx) for i in range(*idxs.indices(N))]
+        else:
+            raise TypeError(f"Index must be int or slice, not {type(idxs)}")
+
+    def __getitem__(self, args):
+        if isinstance(args, tuple):
+            idxs = args[0]
+            keys = args[1] if len(args) > 1 else None
+            sent2x = args[2] if len(args) > 2 else sent2row
+        else:
+            idxs = args
+            keys = None
+            sent2x = sent2row
+        return self._run(lambda state: self._fetch(state, idxs, keys, sent2x), 'rb')
+
+    def rows(self, idxs=Slice[::], keys=None):
+        return self[idxs, keys]
+
+    def cols(self, keys=None, idxs=Slice[::]):
+        return self[idxs, keys, sent2flat]
+
+    def keys(self) -> list:
+        return self._run(lambda state: list(state.key2type.keys()), 'rb')
+
+    def __len__(self):
+        return self._run(lambda state: state.next_idx, 'rb')
+
+    def nblocks(self) -> int:
+        """Number of compressed blocks; the rows of the open tail block are not counted."""
+        return self._run(lambda state: len(state.blocks), 'rb')
+
+
+if __name__ == '__main__':
+    pass
+
+    from gatling.utility.xprint import xprint_rows
+    from a_const_debug import fpath_temp_tsv, ConstSchema, rows
+
+    ft = ZSTTable(fpath_temp_tsv + '.zst', block_rows=2)
+    ft.drop()
+    ft.create(tabledefine=ConstSchema)
+    ft.extend(rows)
+    xprint_rows(ft[::-1])
+    print(ft.nblocks())
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from typing import Literal, Optional
+
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, FileTableAOState, rows2sents
+from gatling.utility.error_tools import FileAlreadyOpenedError, FileNotOpenError
+
+Durability = Literal['buffer', 'fsync', 'async']
+
+
+class TSVTableWriter:
+    """
+    Group-commit writer for a TSVTable.
+
+    Rows are encoded and numbered on ``append``/``extend`` but kept in memory until
+    ``max_rows`` rows or ``max_bytes`` bytes are pending, or the oldest pending row is
+    ``max_delay`` seconds old. Each flush writes to a file kept open in append mode; a write
+    that fails part way is cut off again, so its retry leaves no duplicate or torn line.
+
+    durability:
+        - 'buffer': hand flushed data to the OS only
+        - 'fsync':  fsync after every flush before returning
+        - 'async':  fsync on the background thread after every flush
+
+    An ``extend`` whose rows cannot all be encoded adds none of them. An error of the
+    background thread (a flush or fsync) is raised from the next ``append``/``extend``/
+    ``flush``/``close``; the thread waits for that before trying again. ``close`` writes
+    what is pending before raising it, and stays open if that write fails.
+
+    All methods are thread-safe; rows keep the order in which appenders took the lock.
+    """
+
+    def __init__(self, table: TSVTable, max_rows: int = 1000, max_bytes: int = 1 << 20,
+                 max_delay: Optional[float] = 1.0, durability: Durability = 'buffer'):
+        if durability not in ('buffer', 'fsync', 'async'):
+            raise ValueError(f"durability must be 'buffer', 'fsync' or 'async', not {durability!r}")
+        self.table = table
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.durability = durability
+
+        self.state: Optional[FileTableAOState] = None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending: list[bytes] = []
+        self._pending_idx = 0
+        self._pending_bytes = 0
+        self._pending_since: Optional[float] = None
+        self._end = 0  # file size after the last complete flush
+        self._need_sync = False
+        self._error: Optional[BaseException] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    # ===================== Lifecycle =====================
+
+    def open(self) -> 'TSVTableWriter':
+        if self.state is not None:
+            raise FileAlreadyOpenedError(f'{self.table.fpath} writer is already opened.')
+        if self.table.state.file is not None:
+            raise FileAlreadyOpenedError(f'{self.table.fpath} is already opened with read or write permission.')
+        self.state = self.table._build_state(open_mode='ab')
+        self._end = os.fstat(self.state.file.fileno()).st_size
+        if self.max_delay is not None or self.durability == 'async':
+            self._running = True
+            self._thread = threading.Thread(target=self._background, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        if self.state is None:
+            raise FileNotOpenError(f'{self.table.fpath} writer is not opened.')
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            # write what is pending first; on failure the writer stays open (with the rows) for another close()
+            try:
+                self._flush_locked()
+            except BaseException:
+                self._error = None  # superseded by this attempt at the same rows
+                raise
+            error, self._error = self._error, None
+        if self.durability != 'buffer':
+            os.fsync(self.state.file.fileno())
+        self.table._clean_state(self.state)
+        self.state = None
+        if error is not None:
+            raise error
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ===================== Write =====================
+
+    def append(self, row) -> 'TSVTableWriter':
+        return self.extend([row])
+
+    def extend(self, rows) -> 'TSVTableWriter':
+        with self._cond:
+            self._check_locked()
+            state = self.state
+            if len(rows) == 0:
+                return self
+            # encode everything before touching the pending rows, so a bad row adds none
+            sents = [sent.encode() + b'\n' for sent in rows2sents(rows, state.key2type, state.next_idx)]
+            if not self._pending:
+                self._pending_idx = state.next_idx
+            self._pending.extend(sents)
+            self._pending_bytes += sum(map(len, sents))
+            state.next_idx += len(rows)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                self._cond.notify_all()
+            if len(self._pending) >= self.max_rows or self._pending_bytes >= self.max_bytes:
+                self._flush_locked()
+        return self
+
+    def flush(self) -> 'TSVTableWriter':
+        with self._cond:
+            self._check_locked()
+            self._flush_locked()
+        return self
+
+    def _check_locked(self):
+        if self.state is None:
+            raise FileNotOpenError(f'{self.table.fpath} writer is not opened.')
+        if self._error is not None:
+            error, self._error = self._error, None
+            self._cond.notify_all()
+            raise error
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        file = self.state.file
+        fd, pos = file.fileno(), self._end
+        if os.fstat(fd).st_size != pos:  # a failed write that could not be cut off below
+            os.ftruncate(fd, pos)
+        data = memoryview(b''.join(self._pending))
+        try:
+            # unbuffered, so a failed write leaves no bytes behind in a buffer to go out later
+            written = 0
+            while written < len(data):
+                written += file.raw.write(data[written:])
+        except BaseException:
+            os.ftruncate(fd, pos)
+            raise
+        self._end = pos + len(data)
+        self.table._index_append(self.state.key2type, self._pending_idx, pos, [sent[:-1] for sent in self._pending])
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._pending_since = None
+        if self.durability == 'fsync':
+            os.fsync(file.fileno())
+        elif self.durability == 'async':
+            self._need_sync = True
+            self._cond.notify_all()
+
+    def _background(self):
+        with self._cond:
+            while self._running:
+                if self._error is not None:  # wait until the caller has seen it
+                    self._cond.wait()
+                    continue
+                try:
+                    if self._need_sync:
+                        self._need_sync = False
+                        fd = self.state.file.fileno()
+                        self._cond.release()
+                        try:
+                            os.fsync(fd)
+                        finally:
+                            self._cond.acquire()
+                        continue
+
+                    timeout = None
+                    if self._pending_since is not None and self.max_delay is not None:
+                        timeout = self._pending_since + self.max_delay - time.monotonic()
+                        if timeout <= 0:
+                            self._flush_locked()
+                            continue
+                except Exception as e:  # surfaced by the next append/extend/flush/close
+                    self._error = e
+                    continue
+                self._cond.wait(timeout)
+
+    # ===================== Meta =====================
+
+    def __len__(self):
+        """Number of rows in the table, including rows still pending in memory."""
+        with self._lock:
+            if self.state is None:
+                raise FileNotOpenError(f'{self.table.fpath} writer is not opened.')
+            return self.state.next_idx
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.table.fpath!r}, durability={self.durability!r})>"
+
+
+if __name__ == '__main__':
+    pass
+
+    from a_const_debug import fpath_temp_tsv, ConstSchema, rows
+
+    ft = TSVTable(fpath_temp_tsv).drop().create(tabledefine=ConstSchema)
+    with ft.writer(max_rows=2, durability='async') as w:
+        for row in rows:
+            w.append(row)
+    print(len(ft))
@@ -1,15 +1,245 @@
-from psycopg_pool import ConnectionPool
+import bisect
+import threading
+import time
+from typing import Callable
+
+import psycopg
+from psycopg_pool import ConnectionPool, AsyncConnectionPool, PoolTimeout
 from sqlalchemy.dialects import postgresql as pg_dialect
 
 from gatling.storage.g_table.sql.base_sql_table import compile_stmt as _compile_stmt
 
 _PG_DIALECT = pg_dialect.dialect()
+_PG_POSITIONAL_DIALECT = pg_dialect.dialect(paramstyle='format')
+
+# bind parameters per statement allowed by the wire protocol (16-bit count)
+PG_MAX_PARAMS = 65535
+
+
+# ===================== Pool Instrumentation =====================
+
+# upper bounds (ms) of the checkout wait histogram buckets; the last one catches the rest
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, float('inf'))
+
+
+class PoolMetrics:
+    """Checkout waits, connections in use, timeouts and slow queries of one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait_counts = [0] * len(WAIT_BUCKETS_MS)
+        self.wait_seconds = 0.0
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.timeouts = 0
+        self.slow_queries = 0
+
+    def checkout(self, wait: float):
+        with self._lock:
+            self.wait_counts[bisect.bisect_left(WAIT_BUCKETS_MS, wait * 1000)] += 1
+            self.wait_seconds += wait
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'timeouts': self.timeouts,
+                'slow_queries': self.slow_queries,
+                'mean_wait_seconds': self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+                'wait_histogram_ms': dict(zip(WAIT_BUCKETS_MS, self.wait_counts)),
+            }
+
+
+class _TimedCursor(psycopg.Cursor):
+    """Reports statements slower than the connection's ``_gatling_slow`` threshold."""
+
+    def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            self.connection._gatling_slow(query, time.perf_counter() - start)
+
+    def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            self.connection._gatling_slow(query, time.perf_counter() - start)
+
+
+class _AsyncTimedCursor(psycopg.AsyncCursor):
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            self.connection._gatling_slow(query, time.perf_counter() - start)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            self.connection._gatling_slow(query, time.perf_counter() - start)
+
+
+def _slow_query_hook(metrics: PoolMetrics, threshold: float, logfctn: Callable):
+    def on_query(query, seconds: float):
+        if seconds >= threshold:
+            metrics.slow_query()
+            text = query.decode() if isinstance(query, bytes) else str(query)
+            logfctn(f"slow query {seconds:.3f}s: {' '.join(text.split())[:500]}")
+    return on_query
+
+
+class InstrumentedPool(ConnectionPool):
+    """ConnectionPool that records PoolMetrics; see create_pool."""
+
+    def __init__(self, *args, slow_query_seconds: float = None, slow_logfctn: Callable = print, **kwargs):
+        self.pool_metrics = PoolMetrics()
+        if slow_query_seconds is not None:
+            on_query = _slow_query_hook(self.pool_metrics, slow_query_seconds, slow_logfctn)
+            configure = kwargs.pop('configure', None)
+
+            def configure_timed(conn):
+                conn.cursor_factory = _TimedCursor
+                conn._gatling_slow = on_query
+                if configure is not None:
+                    configure(conn)
+
+            kwargs['configure'] = configure_timed
+        super().__init__(*args, **kwargs)
+
+    def getconn(self, timeout: float = None):
+        start = time.perf_counter()
+        try:
+            conn = super().getconn(timeout)
+        except PoolTimeout:
+            self.pool_metrics.timeout()
+            raise
+        self.pool_metrics.checkout(time.perf_counter() - start)
+        return conn
+
+    def putconn(self, conn):
+        try:
+            super().putconn(conn)
+        finally:
+            self.pool_metrics.checkin()
+
+    def metrics(self) -> dict:
+        """psycopg's get_stats() plus PoolMetrics.snapshot()."""
+        return {**self.get_stats(), **self.pool_metrics.snapshot()}
+
+
+class AsyncInstrumentedPool(AsyncConnectionPool):
+    """InstrumentedPool for AsyncConnectionPool."""
+
+    def __init__(self, *args, slow_query_seconds: float = None, slow_logfctn: Callable = print, **kwargs):
+        self.pool_metrics = PoolMetrics()
+        if slow_query_seconds is not None:
+            on_query = _slow_query_hook(self.pool_metrics, slow_query_seconds, slow_logfctn)
+            configure = kwargs.pop('configure', None)
+
+            async def configure_timed(conn):
+                conn.cursor_factory = _AsyncTimedCursor
+                conn._gatling_slow = on_query
+                if configure is not None:
+                    await configure(conn)
+
+            kwargs['configure'] = configure_timed
+        super().__init__(*args, **kwargs)
+
+    async def getconn(self, timeout: float = None):
+        start = time.perf_counter()
+        try:
+            conn = await super().getconn(timeout)
+        except PoolTimeout:
+            self.pool_metrics.timeout()
+            raise
+        self.pool_metrics.checkout(time.perf_counter() - start)
+        return conn
+
+    async def putconn(self, conn):
+        try:
+            await super().putconn(conn)
+        finally:
+            self.pool_metrics.checkin()
+
+    def metrics(self) -> dict:
+        return {**self.get_stats(), **self.pool_metrics.snapshot()}
+
+
+def pool_stats(pool) -> dict:
+    """Instrumented pools report metrics(), plain psycopg pools get_stats()."""
+    return pool.metrics() if hasattr(pool, 'metrics') else pool.get_stats()
+
+
+def pool_size_for(tfm, per_worker: int = 1, spare: int = 1) -> dict:
+    """
+    ``min_size`` / ``max_size`` for a pool shared by the thread and coroutine stages of a
+    TaskFlowManager: one connection per worker (per_worker each), plus spare. Process stages
+    are left out, since every process needs a pool of its own.
+    Use as ``create_pool(conninfo, **pool_size_for(tfm))`` after the stages are registered.
+    """
+    from gatling.runtime.task_manager.runtime_task_manager_process_function import RuntimeTaskManagerProcessFunction
+    from gatling.runtime.task_manager.runtime_task_manager_process_iterator import RuntimeTaskManagerProcessIterator
+
+    workers = sum(rtm.worker for rtm in tfm.runtime_task_manager_s
+                  if not isinstance(rtm, (RuntimeTaskManagerProcessFunction, RuntimeTaskManagerProcessIterator)))
+    max_size = max(1, workers * per_worker + spare)
+    return {'min_size': max(1, max_size // 2), 'max_size': max_size}
 
 
 # ===================== Pool =====================
 
-def create_pool(conninfo: str, max_size: int = 10, **kwargs) -> ConnectionPool:
-    pool = ConnectionPool(conninfo=conninfo, max_size=max_size, open=True, **kwargs)
+def create_pool(conninfo: str, max_size: int = 10, prepare_threshold: int | None = 5,
+                slow_query_seconds: float = None, slow_logfctn: Callable = print, **kwargs) -> InstrumentedPool:
+    """
+    Open a pool. SQL tables cache their compiled statements, so the SQL text of a hot shape
+    repeats exactly, and psycopg prepares it server-side on a connection after
+    ``prepare_threshold`` executions (0: prepare at once, None: never).
+
+    The pool records checkout waits, connections in use and timeouts (``pool.metrics()``);
+    with ``slow_query_seconds``, statements at least that slow are counted and passed to
+    ``slow_logfctn``. ``min_size`` defaults to psycopg's 4, capped at max_size; see
+    pool_size_for.
+    """
+    conn_kwargs = {'prepare_threshold': prepare_threshold, **kwargs.pop('kwargs', {})}
+    kwargs.setdefault('min_size', min(4, max_size))
+    pool = InstrumentedPool(conninfo=conninfo, max_size=max_size, open=True, kwargs=conn_kwargs,
+                            slow_query_seconds=slow_query_seconds, slow_logfctn=slow_logfctn, **kwargs)
+    return pool
+
+
+async def create_async_pool(conninfo: str, max_size: int = 10, prepare_threshold: int | None = 5,
+                            slow_query_seconds: float = None, slow_logfctn: Callable = print,
+                            **kwargs) -> AsyncInstrumentedPool:
+    """create_pool for AsyncPGSQLTable; must be awaited inside the event loop that uses it."""
+    conn_kwargs = {'prepare_threshold': prepare_threshold, **kwargs.pop('kwargs', {})}
+    kwargs.setdefault('min_size', min(4, max_size))
+    pool = AsyncInstrumentedPool(conninfo=conninfo, max_size=max_size, open=False, kwargs=conn_kwargs,
+                                 slow_query_seconds=slow_query_seconds, slow_logfctn=slow_logfctn, **kwargs)
+    await pool.open()
     return pool
 
 
@@ -20,6 +250,11 @@ def compile_stmt(stmt) -> tuple[str, dict]:
     return _compile_stmt(stmt, _PG_DIALECT)
 
 
+def compile_positional(stmt) -> tuple[str, dict]:
+    """Like compile_stmt, but with ``%s`` placeholders taking a sequence of arguments."""
+    return _compile_stmt(stmt, _PG_POSITIONAL_DIALECT)
+
+
 # ===================== Table Ops =====================
 
 def exist_table(pool: ConnectionPool, table_name: str, schema: str = None) -> bool:
@@ -0,0 +1,258 @@
+from typing import Iterator, Iterable
+
+from sqlalchemy import (
+    MetaData,
+    select, update as sa_update, delete as sa_delete,
+    func, bindparam, any_,
+)
+from sqlalchemy.schema import CreateTable, DropTable
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY, JSONB, JSON
+from psycopg.types.json import Jsonb
+
+from gatling.storage.g_table.sql.base_sql_table import (
+    SQLRowsMixin, StmtCache, build_where, build_select, select_shape, where_shape, bind_params,
+    build_aggregate, aggregate_shape,
+    build_values_insert, values_params, values_widths, build_pk_in, pk_params,
+)
+from gatling.storage.g_table.sql.a_pgsql_base import (
+    compile_stmt, compile_positional, pool_stats, _PG_DIALECT, PG_MAX_PARAMS,
+)
+
+
+def _parse_table_name(table_name: str) -> tuple[str | None, str]:
+    """Parse 'schema.table' into (schema, table). Plain 'table' returns (None, table)."""
+    if '.' in table_name:
+        schema, table = table_name.split('.', 1)
+        return schema, table
+    return None, table_name
+
+
+class PGStatementsMixin(SQLRowsMixin):
+    """
+    Statement building shared by PGSQLTable and AsyncPGSQLTable.
+
+    Every ``_*_stmt`` method returns compiled SQL with its parameters (``_*_stmts`` a list of
+    them, one per statement to run), cached by shape in ``_stmt_cache``; the tables only
+    differ in how they execute them.
+    """
+
+    def _init_pg(self, table_name: str, pool):
+        self.table_name = table_name
+        self._schema, self._bare_table = _parse_table_name(table_name)
+        self.pool = pool
+        self.tabledefine = None
+        self._table = None
+        self._all_keys = None
+        self._primary_keys = None
+        self._json_cols = set()
+        self._stmt_cache = StmtCache()
+
+    # ===================== Schema =====================
+
+    def _define(self, tabledefine) -> list[str]:
+        """Bind the table to tabledefine; returns the DDL that creates it."""
+        self.tabledefine = tabledefine
+        schema = tabledefine.get_schema()
+        self._all_keys = list(schema.names)
+        self._primary_keys = list(schema.primary_keys)
+        src = tabledefine.get_sql_table()
+        meta = MetaData(schema=self._schema) if self._schema else MetaData()
+        self._table = src.to_metadata(meta, name=self._bare_table)
+        self._json_cols = {c.name for c in self._table.columns if isinstance(c.type, (JSONB, JSON))}
+        self._stmt_cache.clear()
+        ddl = [f'CREATE SCHEMA IF NOT EXISTS "{self._schema}"'] if self._schema else []
+        ddl.append(str(CreateTable(self._table, if_not_exists=True).compile(dialect=_PG_DIALECT)))
+        return ddl
+
+    def _qualified(self) -> str:
+        return f'"{self._schema}"."{self._bare_table}"' if self._schema else f'"{self._bare_table}"'
+
+    def _drop_sql(self) -> str:
+        if self._table is not None:
+            return str(DropTable(self._table, if_exists=True).compile(dialect=_PG_DIALECT))
+        return f'DROP TABLE IF EXISTS {self._qualified()}'
+
+    def _adapt_json(self, row: dict) -> dict:
+        if not self._json_cols:
+            return row
+        out = {}
+        for k, v in row.items():
+            if k in self._json_cols and isinstance(v, (dict, list)):
+                out[k] = Jsonb(v)
+            else:
+                out[k] = v
+        return out
+
+    # ===================== Insert =====================
+
+    def _on_conflict(self, stmt, keys: list[str]):
+        non_pk = [k for k in keys if k not in self._primary_keys]
+        if non_pk and self._primary_keys:
+            return stmt.on_conflict_do_update(
+                index_elements=self._primary_keys,
+                set_={k: stmt.excluded[k] for k in non_pk},
+            )
+        # without a primary key there is nothing to update; skip rows hitting any unique constraint
+        return stmt.on_conflict_do_nothing(index_elements=self._primary_keys or None)
+
+    def _insert_stmts(self, rows: tuple[dict, ...], replace: bool, batch_size: int) -> list[tuple[str, list]]:
+        """
+        Multi-row ``INSERT ... VALUES`` statements of up to batch_size rows, fewer when the
+        columns would exceed PG_MAX_PARAMS. The columns are those of all rows together; a row
+        without one of them gets its Field default. With replace, a later row wins over an
+        earlier one with the same primary key (one statement cannot update a row twice).
+        """
+        keys, rows = self._insert_rows(rows)
+        if replace and self._primary_keys:
+            rows = list({tuple(r[k] for k in self._primary_keys): r for r in rows}.values())
+        width = max(1, min(batch_size, PG_MAX_PARAMS // max(1, len(keys))))
+
+        def build(n):
+            stmt = build_values_insert(pg_insert, self._table, keys, n)
+            return compile_positional(self._on_conflict(stmt, keys) if replace else stmt)
+
+        adapted = [self._adapt_json(r) for r in rows]
+        stmts, i = [], 0
+        for n in values_widths(len(adapted), width):
+            sql, _ = self._stmt_cache.get(('insert', n, tuple(keys), replace), lambda: build(n))
+            stmts.append((sql, values_params(adapted[i:i + n], keys)))
+            i += n
+        return stmts
+
+    # ===================== Select =====================
+
+    def _select_stmt(self, where: dict = None, keys: list[str] = None, order_by: dict[str, bool] = None,
+                     limit: int = None, offset: int = None, after: dict = None) -> tuple[str, dict | None]:
+        sql, fixed = self._stmt_cache.get(
+            select_shape(where, keys, order_by, limit, offset, after),
+            lambda: compile_stmt(build_select(self._table, where, keys, order_by, limit, offset, after, bind=True)),
+        )
+        return sql, {**fixed, **bind_params(where, after, limit, offset)} or None
+
+    def _count_stmt(self, where: dict = None) -> tuple[str, dict | None]:
+        def build():
+            stmt = select(func.count()).select_from(self._table)
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('count', where_shape(where)), build)
+        return sql, {**fixed, **bind_params(where)} or None
+
+    def _aggregate_stmt(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                        order_by: dict[str, bool] = None, limit: int = None) -> tuple[str, dict | None]:
+        sql, fixed = self._stmt_cache.get(
+            aggregate_shape(group_by, metrics, where, order_by, limit),
+            lambda: compile_stmt(build_aggregate(self._table, group_by, metrics, where, order_by, limit, bind=True)),
+        )
+        return sql, {**fixed, **bind_params(where, limit=limit)} or None
+
+    # ===================== Update & Delete =====================
+
+    def _update_stmt(self, updates: dict, where: dict) -> tuple[str, dict]:
+        def build():
+            stmt = sa_update(self._table).values({k: bindparam(f'u_{k}', type_=self._table.c[k].type) for k in updates})
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('update', tuple(updates), where_shape(where)), build)
+        return sql, {**fixed, **bind_params(where, updates=self._adapt_json(updates))}
+
+    def _delete_stmt(self, where: dict) -> tuple[str, dict]:
+        if not where:
+            raise ValueError("WHERE required for delete(). Use truncate() to clear all rows.")
+
+        def build():
+            stmt = sa_delete(self._table)
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('delete', where_shape(where)), build)
+        return sql, {**fixed, **bind_params(where)}
+
+    # ===================== By Primary Key =====================
+
+    def _pk_batches(self, ids: list, width: int) -> Iterator[tuple[int | None, list]]:
+        """
+        (shape, positional args) per statement: a single-column key goes out whole as one
+        ``= ANY(array)`` parameter, a composite one in ``IN`` lists of up to width keys.
+        """
+        if not ids:
+            return
+        if len(self._primary_keys) == 1:
+            yield None, [ids]
+            return
+        i = 0
+        for n in values_widths(len(ids), width):
+            yield n, pk_params(ids[i:i + n], True)
+            i += n
+
+    def _pk_cond(self, n: int | None):
+        if n is None:
+            col = self._table.c[self._primary_keys[0]]
+            return col == any_(bindparam('ids_', type_=ARRAY(col.type)))
+        return build_pk_in(self._table, self._primary_keys, n)
+
+    def _many_stmts(self, key: tuple, build, ids: list, width: int, args: list = ()) -> list[tuple[str, list]]:
+        stmts = []
+        for n, pk_args in self._pk_batches(ids, width):
+            sql, _ = self._stmt_cache.get((*key, n), lambda: build(n))
+            stmts.append((sql, [*args, *pk_args]))
+        return stmts
+
+    def _fetch_many_stmts(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> list[tuple[str, list]]:
+        """
+        Statements for fetch_many(): a single-column key is matched with one ``= ANY(%s)``
+        array parameter whatever the number of ids, a composite key with ``IN`` lists of up
+        to batch_size keys.
+        """
+        self._require_pk('fetch_many')
+        fetch_keys = self._fetch_keys(keys)
+        width = max(1, min(batch_size, PG_MAX_PARAMS // len(self._primary_keys)))
+
+        def build(n):
+            stmt = select(*[self._table.c[k] for k in fetch_keys]) if fetch_keys else select(self._table)
+            return compile_positional(stmt.where(self._pk_cond(n)))
+
+        return self._many_stmts(('fetch_many', tuple(fetch_keys or ())), build, self._unique_ids(ids), width)
+
+    def _update_many_stmts(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> list[tuple[str, list]]:
+        self._require_pk('update_many')
+        width = max(1, min(batch_size, (PG_MAX_PARAMS - len(updates)) // len(self._primary_keys)))
+
+        def build(n):
+            stmt = sa_update(self._table).ordered_values(
+                *[(self._table.c[k], bindparam(f'u_{k}', type_=self._table.c[k].type)) for k in updates]
+            )
+            return compile_positional(stmt.where(self._pk_cond(n)))
+
+        values = list(self._adapt_json(updates).values())
+        return self._many_stmts(('update_many', tuple(updates)), build, self._unique_ids(ids), width, values)
+
+    def _delete_many_stmts(self, ids: Iterable, batch_size: int = 1000) -> list[tuple[str, list]]:
+        self._require_pk('delete_many')
+        width = max(1, min(batch_size, PG_MAX_PARAMS // len(self._primary_keys)))
+
+        def build(n):
+            return compile_positional(sa_delete(self._table).where(self._pk_cond(n)))
+
+        return self._many_stmts(('delete_many',), build, self._unique_ids(ids), width)
+
+    # ===================== Meta =====================
+
+    def pool_stats(self) -> dict:
+        """Usage of the pool behind this table; see InstrumentedPool.metrics()."""
+        return pool_stats(self.pool)
+
+    def keys(self) -> list[str]:
+        if self._all_keys:
+            return list(self._all_keys)
+        return [c.name for c in self._table.columns]
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}(table={self.table_name!r})>"
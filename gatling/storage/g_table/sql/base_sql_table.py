@@ -1,6 +1,9 @@
+import threading
 from abc import abstractmethod
+from collections import OrderedDict
+from typing import Iterator, Iterable, Callable, Hashable
 
-from sqlalchemy import Table, and_
+from sqlalchemy import Table, Float, and_, or_, true, false, func, cast, distinct, select, tuple_, bindparam, table as sa_table, column as sa_column
 
 
 # ===================== Shared Utilities =====================
@@ -11,21 +14,380 @@ def compile_stmt(stmt, dialect) -> tuple[str, dict]:
     return str(compiled), dict(compiled.params)
 
 
-def build_where(table: Table, where: dict):
+# ===================== Statement Cache =====================
+
+class StmtCache:
+    """
+    Thread-safe LRU of compiled SQL keyed on statement shape.
+
+    A shape is everything that changes the SQL text (operation, columns, null-ness,
+    order, presence of limit/offset) but not the bound values, so one compiled statement
+    serves every call of that shape.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], tuple[str, dict]]) -> tuple[str, dict]:
+        """
+        (sql, constant params) for a shape; build() compiles it on a miss and returns compile_stmt's
+        (sql, params). Unset bindparams are dropped from params, leaving only the constants the
+        compiler added itself (e.g. SQLite's ``LIMIT -1``).
+        """
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit
+        sql, params = build()
+        hit = (sql, {k: v for k, v in params.items() if v is not None})
+        with self._lock:
+            self.misses += 1
+            self._data[key] = hit
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return hit
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ===================== Where Expressions =====================
+#
+# A where dict ANDs its items. An item is ``col: value`` (equality, ``IS NULL`` for None),
+# ``col: {op: operand, ...}`` with the operators below (the same ones TSVTable.select takes),
+# or ``'$or' / '$and': [where, ...]`` for a group of nested where dicts:
+#
+#     {'group': 'a', 'score': {'$gte': 5, '$lt': 9}, '$or': [{'name': {'$like': 'a%'}}, {'id': {'$in': [1, 2]}}]}
+
+_COMPARE_OPS = {
+    '$eq': lambda c, v: c == v,
+    '$ne': lambda c, v: c != v,
+    '$gt': lambda c, v: c > v,
+    '$gte': lambda c, v: c >= v,
+    '$lt': lambda c, v: c < v,
+    '$lte': lambda c, v: c <= v,
+    '$like': lambda c, v: c.like(v),
+    '$ilike': lambda c, v: c.ilike(v),
+}
+_LIST_OPS = {
+    # an empty list would compile to a placeholder only expanded at execution time
+    '$in': lambda c, vs: c.in_(vs) if vs else false(),
+    '$nin': lambda c, vs: c.not_in(vs) if vs else true(),
+    '$between': lambda c, vs: c.between(*vs),
+}
+_GROUP_OPS = {'$or': or_, '$and': and_}
+
+
+def _where_items(where: dict, prefix: str = 'w_') -> Iterator[tuple]:
+    """
+    Flatten a where dict into (kind, ...) records in a fixed order, naming each bound value by
+    its position (so two clauses on the same column and operator never share a name):
+    ('group', key, [(prefix, sub), ...]) for $or/$and, ('op', col, op, name, value) otherwise.
+    """
+    n = 0
+    for key, cond in where.items():
+        if key in _GROUP_OPS:
+            yield 'group', key, [(f'{prefix}{n}_{i}_', sub) for i, sub in enumerate(cond)]
+            n += 1
+        elif isinstance(cond, dict):
+            for op, value in cond.items():
+                if op not in _COMPARE_OPS and op not in _LIST_OPS:
+                    raise ValueError(f"unknown operator {op!r}")
+                if value is None and op not in ('$eq', '$ne'):
+                    raise ValueError(f"operator {op!r} on {key!r} needs a value, got None")
+                yield 'op', key, op, f'{prefix}{n}', value
+                n += 1
+        else:
+            yield 'op', key, '$eq', f'{prefix}{n}', cond
+            n += 1
+
+
+def where_shape(where: dict, prefix: str = 'w_') -> tuple:
+    """Everything about a where dict that changes its SQL: columns, operators, None-ness, list lengths."""
+    if not where:
+        return ()
+    shape = []
+    for item in _where_items(where, prefix):
+        if item[0] == 'group':
+            shape.append((item[1], tuple(where_shape(sub, p) for p, sub in item[2])))
+        else:
+            _, col, op, _, value = item
+            if op == '$eq':
+                shape.append((col, value is None))
+            else:
+                shape.append((col, op, len(value) if op in _LIST_OPS else value is None))
+    return tuple(shape)
+
+
+def _where_params(where: dict, params: dict, prefix: str = 'w_'):
+    for item in _where_items(where, prefix):
+        if item[0] == 'group':
+            for p, sub in item[2]:
+                _where_params(sub, params, p)
+            continue
+        _, col, op, name, value = item
+        if op in _LIST_OPS:
+            for i, v in enumerate(value):
+                params[f'{name}_{i}'] = v
+        elif value is not None:
+            params[name] = value
+
+
+def bind_params(where: dict = None, after: dict = None, limit: int = None, offset: int = None,
+                updates: dict = None) -> dict:
+    """Values for the bindparams that build_where/build_select/build_update(bind=True) emit."""
+    params = {}
+    if where:
+        _where_params(where, params)
+    for col, val in (after or {}).items():
+        params[f'a_{col}'] = val
+    for col, val in (updates or {}).items():
+        params[f'u_{col}'] = val
+    if limit is not None:
+        params['limit_'] = limit
+    if offset is not None:
+        params['offset_'] = offset
+    return params
+
+
+# ===================== Statement Builders =====================
+
+def build_where(table: Table, where: dict, bind: bool = False, prefix: str = 'w_'):
+    """
+    Clause for a where dict (see Where Expressions above); with bind=True values become
+    named bindparams (see bind_params), so the SQL depends only on where_shape().
+    """
     if not where:
         return None
     conds = []
-    for col, val in where.items():
-        if val is None:
-            conds.append(table.c[col].is_(None))
+    for item in _where_items(where, prefix):
+        if item[0] == 'group':
+            subs = [c for c in (build_where(table, sub, bind, p) for p, sub in item[2]) if c is not None]
+            if not subs:
+                raise ValueError(f"{item[1]} needs at least one non-empty where dict")
+            conds.append(_GROUP_OPS[item[1]](*subs))
+            continue
+        _, col, op, name, value = item
+        c = table.c[col]
+        if op in _LIST_OPS:
+            values = [bindparam(f'{name}_{i}', type_=c.type) if bind else v for i, v in enumerate(value)]
+            conds.append(_LIST_OPS[op](c, values))
+        elif value is None and op in ('$eq', '$ne'):
+            conds.append(c.is_(None) if op == '$eq' else c.is_not(None))
         else:
-            conds.append(table.c[col] == val)
+            conds.append(_COMPARE_OPS[op](c, bindparam(name, type_=c.type) if bind else value))
     return and_(*conds) if len(conds) > 1 else conds[0]
 
 
+def values_widths(n: int, width: int) -> list[int]:
+    """
+    Row counts of the multi-row statements that insert n rows: full batches of ``width``,
+    then the remainder as powers of two, so at most log2(width) + 1 shapes get compiled.
+    """
+    widths = [width] * (n // width)
+    rem = n % width
+    widths.extend(1 << b for b in reversed(range(rem.bit_length())) if rem >> b & 1)
+    return widths
+
+
+def build_values_insert(insert_fn, table: Table, keys: list[str], width: int):
+    """
+    ``INSERT ... VALUES (...), (...)`` into just ``keys``, with ``width`` rows of bindparams
+    (see values_params). insert_fn is the dialect's insert, so upsert clauses can follow. The
+    target is a bare table clause, so columns with Python-side defaults are not added as
+    extra parameters.
+    """
+    target = sa_table(table.name, *[sa_column(k) for k in keys], schema=table.schema)
+    return insert_fn(target).values([
+        {k: bindparam(f'p{i}_{j}', type_=table.c[k].type) for j, k in enumerate(keys)}
+        for i in range(width)
+    ])
+
+
+def values_params(rows: list[dict], keys: list[str]) -> list:
+    """
+    Positional arguments for a build_values_insert statement compiled with a positional
+    paramstyle: row by row, column by column. Drivers resolve named parameters by name per
+    placeholder, which gets slow on statements with thousands of them.
+    """
+    return [row[k] for row in rows for k in keys]
+
+
+def build_pk_in(table: Table, primary_keys: list[str], width: int):
+    """
+    ``pk IN (...)`` over ``width`` keys, or ``(pk1, pk2) IN ((...), ...)`` for a composite
+    primary key, with bindparams meant for a positional paramstyle (see pk_params).
+    """
+    cols = [table.c[k] for k in primary_keys]
+    if len(cols) == 1:
+        return cols[0].in_([bindparam(f'k{i}', type_=cols[0].type) for i in range(width)])
+    return tuple_(*cols).in_([
+        tuple_(*[bindparam(f'k{i}_{j}', type_=c.type) for j, c in enumerate(cols)])
+        for i in range(width)
+    ])
+
+
+def pk_params(ids: list, composite: bool) -> list:
+    return [v for key in ids for v in key] if composite else list(ids)
+
+
+def build_keyset(table: Table, order_by: dict[str, bool], after: dict, bind: bool = False):
+    """
+    Seek condition for the rows strictly after ``after`` in ``order_by`` order. Uniform
+    directions use a row-value comparison ``(a, b) > (x, y)``; mixed ones expand to
+    ``a > x OR (a = x AND b < y)``. Keyset columns must not be NULL.
+    """
+    cols = [table.c[k] for k in order_by]
+    vals = [bindparam(f'a_{k}', type_=table.c[k].type) if bind else after[k] for k in order_by]
+    descs = set(order_by.values())
+    if len(descs) == 1:
+        lhs, rhs = (tuple_(*cols), tuple_(*vals)) if len(cols) > 1 else (cols[0], vals[0])
+        return lhs < rhs if descs.pop() else lhs > rhs
+    conds = []
+    for i, (c, v, desc) in enumerate(zip(cols, vals, order_by.values())):
+        conds.append(and_(*[cols[j] == vals[j] for j in range(i)], c < v if desc else c > v))
+    return or_(*conds)
+
+
+def build_select(table: Table, where: dict = None, keys: list[str] = None,
+                 order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+                 after: dict = None, bind: bool = False):
+    if keys:
+        stmt = select(*[table.c[k] for k in keys])
+    else:
+        stmt = select(table)
+    w = build_where(table, where, bind)
+    if w is not None:
+        stmt = stmt.where(w)
+    if after is not None:
+        if not order_by:
+            raise ValueError("after= needs an order_by to seek on")
+        stmt = stmt.where(build_keyset(table, order_by, after, bind))
+    if order_by:
+        for col, desc in order_by.items():
+            c = table.c[col]
+            stmt = stmt.order_by(c.desc() if desc else c.asc())
+    if limit is not None:
+        stmt = stmt.limit(bindparam('limit_') if bind else limit)
+    if offset is not None:
+        stmt = stmt.offset(bindparam('offset_') if bind else offset)
+    return stmt
+
+
+_AGG_FUNCS = {
+    'count': func.count,
+    'sum': func.sum,
+    'avg': lambda c: cast(func.avg(c), Float),  # PostgreSQL would return NUMERIC (Decimal) for integers
+    'min': func.min,
+    'max': func.max,
+    'count_distinct': lambda c: func.count(distinct(c)),
+}
+
+
+def _metric(table: Table, spec):
+    """``'count'`` (rows) or ``(function, column)`` with a function from _AGG_FUNCS."""
+    if spec == 'count':
+        return func.count()
+    fn, col = spec
+    if fn not in _AGG_FUNCS:
+        raise ValueError(f"unknown aggregate {fn!r}")
+    return _AGG_FUNCS[fn](table.c[col])
+
+
+def build_aggregate(table: Table, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                    order_by: dict[str, bool] = None, limit: int = None, bind: bool = False):
+    """
+    ``SELECT group_by..., metrics... GROUP BY group_by``; order_by may name group columns or
+    metrics.
+    """
+    group_by = list(group_by or ())
+    labeled = {k: table.c[k] for k in group_by}
+    for name, spec in (metrics or {'count': 'count'}).items():
+        if name in labeled:
+            raise ValueError(f"metric label {name!r} clashes with a group_by column")
+        labeled[name] = _metric(table, spec).label(name)
+    stmt = select(*labeled.values()).select_from(table)
+    w = build_where(table, where, bind)
+    if w is not None:
+        stmt = stmt.where(w)
+    if group_by:
+        stmt = stmt.group_by(*[table.c[k] for k in group_by])
+    for name, desc in (order_by or {}).items():
+        col = labeled[name]
+        stmt = stmt.order_by(col.desc() if desc else col.asc())
+    if limit is not None:
+        stmt = stmt.limit(bindparam('limit_') if bind else limit)
+    return stmt
+
+
+def aggregate_shape(group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                    order_by: dict[str, bool] = None, limit: int = None) -> tuple:
+    metrics = tuple((name, spec if isinstance(spec, str) else tuple(spec)) for name, spec in (metrics or {}).items())
+    return ('aggregate', tuple(group_by or ()), metrics, where_shape(where),
+            tuple((order_by or {}).items()), limit is not None)
+
+
+def select_shape(where: dict = None, keys: list[str] = None, order_by: dict[str, bool] = None,
+                 limit: int = None, offset: int = None, after: dict = None) -> tuple:
+    return ('fetch', where_shape(where), tuple(keys or ()), tuple((order_by or {}).items()),
+            limit is not None, offset is not None, tuple(after or ()))
+
+
 # ===================== Abstract Base =====================
 
-class BaseSQLTable:
+class SQLRowsMixin:
+    """Row and primary-key helpers of a table with ``tabledefine`` and ``_primary_keys``, sync or async."""
+
+    def _require_pk(self, op: str):
+        if not self._primary_keys:
+            raise ValueError(f"{op}() requires a primary key, {self!r} has none")
+
+    def _unique_ids(self, ids: Iterable) -> list:
+        """Primary key values without repeats; composite keys as tuples."""
+        if len(self._primary_keys) > 1:
+            return list(dict.fromkeys(tuple(key) for key in ids))
+        return list(dict.fromkeys(ids))
+
+    def _insert_rows(self, rows: tuple[dict, ...]) -> tuple[list[str], list[dict] | tuple[dict, ...]]:
+        """
+        Columns of an insert, the union over all rows in first-seen order, and the rows with any
+        column they leave out set to its Field default (None for primary keys), as one row
+        inserted on its own would get from the column default.
+        """
+        first = rows[0].keys()
+        if all(row.keys() == first for row in rows):
+            return list(first), rows
+        keys = list(dict.fromkeys(k for row in rows for k in row))
+        fields = {k: self.tabledefine.get(k) for k in keys}
+        defaults = {k: None if f is None or f.primary else f.default for k, f in fields.items()}
+        return keys, [row if len(row) == len(keys) else {**defaults, **row} for row in rows]
+
+    def _pk_of(self, row: dict):
+        if len(self._primary_keys) > 1:
+            return tuple(row[k] for k in self._primary_keys)
+        return row[self._primary_keys[0]]
+
+    def _fetch_keys(self, keys: list[str] = None) -> list[str] | None:
+        """keys plus the primary keys the result of fetch_many() is indexed by."""
+        return list(dict.fromkeys([*keys, *self._primary_keys])) if keys else None
+
+    def _index_by_pk(self, rows: list[dict], keys: list[str] = None) -> dict:
+        if keys and any(pk not in keys for pk in self._primary_keys):
+            return {self._pk_of(row): {k: row[k] for k in keys} for row in rows}
+        return {self._pk_of(row): row for row in rows}
+
+
+class BaseSQLTable(SQLRowsMixin):
 
     def __init__(self):
         super().__init__()
@@ -64,21 +426,67 @@ class BaseSQLTable:
 
     @abstractmethod
     def fetch(self, where: dict = None, keys: list[str] = None,
-              order_by: dict[str, bool] = None, limit: int = None, offset: int = None) -> list[dict]:
+              order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+              after: dict = None) -> list[dict]:
+        pass
+
+    @abstractmethod
+    def iter_fetch(self, where: dict = None, keys: list[str] = None,
+                   order_by: dict[str, bool] = None, chunk_size: int = 1000) -> Iterator[list[dict]]:
+        pass
+
+    def iter_pages(self, where: dict = None, keys: list[str] = None,
+                   order_by: dict[str, bool] = None, page_size: int = 1000) -> Iterator[list[dict]]:
+        """
+        Keyset pagination: every page is its own query that seeks past the last row of the
+        previous page (``fetch(after=...)``), so deep pages cost the same as the first one,
+        unlike ``offset=``. order_by is completed with the primary keys to make the order total.
+        """
+        order_by = dict(order_by or {})
+        for pk in self._primary_keys:
+            order_by.setdefault(pk, False)
+        fetch_keys = list(dict.fromkeys([*keys, *order_by])) if keys else None
+        after = None
+        while True:
+            page = self.fetch(where=where, keys=fetch_keys, order_by=order_by, limit=page_size, after=after)
+            if not page:
+                return
+            after = {k: page[-1][k] for k in order_by}
+            if fetch_keys is not None and len(fetch_keys) > len(keys):
+                page = [{k: row[k] for k in keys} for row in page]
+            yield page
+            if len(page) < page_size:
+                return
+
+    @abstractmethod
+    def fetch_many(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> dict:
         pass
 
     @abstractmethod
     def count(self, where: dict = None) -> int:
         pass
 
+    @abstractmethod
+    def aggregate(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                  order_by: dict[str, bool] = None, limit: int = None) -> list[dict]:
+        pass
+
     @abstractmethod
     def update(self, updates: dict, where: dict) -> int:
         pass
 
+    @abstractmethod
+    def update_many(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> int:
+        pass
+
     @abstractmethod
     def delete(self, where: dict) -> int:
         pass
 
+    @abstractmethod
+    def delete_many(self, ids: Iterable, batch_size: int = 1000) -> int:
+        pass
+
     # ===================== Meta =====================
 
     @abstractmethod
@@ -0,0 +1,170 @@
+import contextvars
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable
+
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool
+
+from gatling.storage.g_table.sql.a_pgsql_statements import PGStatementsMixin
+
+
+class AsyncPGSQLTable(PGStatementsMixin):
+    """
+    PGSQLTable for coroutines, on a psycopg AsyncConnectionPool.
+
+    Same CRUD surface with awaitable methods; ``async with ft:`` runs a transaction. The
+    transaction connection lives in a context variable, so any number of concurrent tasks can
+    share one table object (and a small pool): each task sees only its own transaction, and
+    calls outside a transaction borrow a pooled connection just for that statement.
+    """
+
+    def __init__(self, table_name: str, pool: AsyncConnectionPool):
+        self._init_pg(table_name, pool)
+        self._conn_var = contextvars.ContextVar(f'gatling_pg_conn_{id(self)}', default=None)
+
+    # ===================== Schema & Init =====================
+
+    async def create(self, tabledefine) -> 'AsyncPGSQLTable':
+        for sql in self._define(tabledefine):
+            await self._exec(sql)
+        return self
+
+    async def exists(self) -> bool:
+        return await self._scalar(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.tables "
+            "WHERE table_schema = %s AND table_name = %s)",
+            (self._schema or 'public', self._bare_table),
+        )
+
+    async def truncate(self) -> 'AsyncPGSQLTable':
+        await self._exec(f'TRUNCATE TABLE {self._qualified()}')
+        return self
+
+    async def drop(self) -> 'AsyncPGSQLTable':
+        await self._exec(self._drop_sql())
+        return self
+
+    # ===================== Context Manager =====================
+
+    async def __aenter__(self):
+        self._conn_var.set(await self.pool.getconn())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        conn = self._conn_var.get()
+        if conn is not None:
+            try:
+                if exc_type is None:
+                    await conn.commit()
+                else:
+                    await conn.rollback()
+            finally:
+                self._conn_var.set(None)
+                await self.pool.putconn(conn)
+
+    @asynccontextmanager
+    async def _connection(self):
+        conn = self._conn_var.get()
+        if conn is not None:
+            yield conn
+        else:
+            async with self.pool.connection() as conn:
+                yield conn
+
+    async def _exec(self, sql, params=None) -> int:
+        async with self._connection() as conn:
+            cur = await conn.execute(sql, params)
+            return cur.rowcount
+
+    async def _query(self, sql, params=None) -> list[dict]:
+        async with self._connection() as conn:
+            cur = conn.cursor(row_factory=dict_row)
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+    async def _scalar(self, sql, params=None):
+        async with self._connection() as conn:
+            cur = await conn.execute(sql, params)
+            row = await cur.fetchone()
+            return row[0]
+
+    async def _run_stmts(self, stmts: list[tuple[str, list]]) -> int:
+        """Execute statements on one connection (one transaction); total rowcount."""
+        async with self._connection() as conn:
+            cur = conn.cursor()
+            total = 0
+            for sql, params in stmts:
+                await cur.execute(sql, params)
+                total += cur.rowcount
+            return total
+
+    # ===================== Insert =====================
+
+    async def insert(self, *rows: dict, replace: bool = False, batch_size: int = 1000) -> 'AsyncPGSQLTable':
+        """
+        Multi-row ``INSERT ... VALUES`` statements as in PGSQLTable.insert(), sent in pipeline
+        mode: every statement goes out without waiting for the previous result.
+        """
+        if not rows:
+            return self
+        stmts = self._insert_stmts(rows, replace, batch_size)
+        async with self._connection() as conn:
+            async with conn.pipeline():
+                cur = conn.cursor()
+                for sql, params in stmts:
+                    await cur.execute(sql, params)
+        return self
+
+    # ===================== Fetch =====================
+
+    async def fetch(self, where: dict = None, keys: list[str] = None,
+                    order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+                    after: dict = None) -> list[dict]:
+        return await self._query(*self._select_stmt(where, keys, order_by, limit, offset, after))
+
+    async def iter_fetch(self, where: dict = None, keys: list[str] = None,
+                         order_by: dict[str, bool] = None, chunk_size: int = 1000,
+                         as_tuples: bool = False) -> AsyncIterator[list]:
+        """Async generator over chunks of at most chunk_size rows from a server-side cursor."""
+        sql, params = self._select_stmt(where, keys, order_by)
+        async with self._connection() as conn:
+            row_factory = tuple_row if as_tuples else dict_row
+            async with conn.cursor(name=f'gatling_{uuid.uuid4().hex}', row_factory=row_factory) as cur:
+                cur.itersize = chunk_size
+                await cur.execute(sql, params)
+                while rows := await cur.fetchmany(chunk_size):
+                    yield rows
+
+    async def fetch_many(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> dict:
+        """Rows by primary key, ``{pk: row}``; see PGSQLTable.fetch_many()."""
+        rows = []
+        for sql, args in self._fetch_many_stmts(ids, keys, batch_size):
+            rows.extend(await self._query(sql, args))
+        return self._index_by_pk(rows, keys)
+
+    async def count(self, where: dict = None) -> int:
+        return await self._scalar(*self._count_stmt(where))
+
+    async def aggregate(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                        order_by: dict[str, bool] = None, limit: int = None) -> list[dict]:
+        """Metrics per group, computed by the database; see PGSQLTable.aggregate()."""
+        return await self._query(*self._aggregate_stmt(group_by, metrics, where, order_by, limit))
+
+    # ===================== Update =====================
+
+    async def update(self, updates: dict, where: dict) -> int:
+        return await self._exec(*self._update_stmt(updates, where))
+
+    async def update_many(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> int:
+        """Apply the same updates to the rows with the given primary keys; see PGSQLTable.fetch_many()."""
+        return await self._run_stmts(self._update_many_stmts(updates, ids, batch_size))
+
+    # ===================== Delete =====================
+
+    async def delete(self, where: dict) -> int:
+        return await self._exec(*self._delete_stmt(where))
+
+    async def delete_many(self, ids: Iterable, batch_size: int = 1000) -> int:
+        """Delete the rows with the given primary keys; see PGSQLTable.fetch_many()."""
+        return await self._run_stmts(self._delete_many_stmts(ids, batch_size))
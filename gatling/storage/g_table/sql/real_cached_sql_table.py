@@ -0,0 +1,351 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Iterable, Hashable
+
+from gatling.storage.g_table.sql.base_sql_table import BaseSQLTable
+
+# cached marker for a primary key known to have no row
+_ABSENT = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU of at most maxsize entries, each dropped ttl seconds after it was stored
+    (never with ttl=None). Counts evictions of live entries.
+
+    ``generation`` goes up on every discard and clear; a value read from the source before
+    an invalidation is only stored if set() is given the generation seen before the read and
+    it has not moved since.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self.generation = 0
+        self._data: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value, generation: int = None) -> bool:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def discard(self, key: Hashable) -> bool:
+        with self._lock:
+            self.generation += 1
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> int:
+        with self._lock:
+            self.generation += 1
+            n = len(self._data)
+            self._data.clear()
+            return n
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _freeze(obj):
+    """Hashable form of a where / order_by / after dict, including nested operators and lists."""
+    if isinstance(obj, dict):
+        return tuple((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+class CachedSQLTable(BaseSQLTable):
+    """
+    Read-through cache in front of a PGSQLTable or SQLiteTable.
+
+    Point lookups (``fetch`` with an equality on exactly the primary keys, and ``fetch_many``)
+    go through a row cache keyed on primary key, which also remembers keys that have no row.
+    Other ``fetch``, ``count`` and ``aggregate`` results are cached per query (shape and
+    values). Writes made through this wrapper drop the affected rows and every cached query
+    result; writes that bypass it, e.g. from another process, are only picked up when entries
+    expire after ``ttl`` seconds. Rows are returned as copies, so callers may modify them.
+
+    Inside ``with cached:`` reads go straight to the table, since they may see uncommitted
+    rows; what the transaction wrote is dropped again when it commits, and everything when it
+    rolls back.
+    """
+
+    def __init__(self, table: BaseSQLTable, maxsize: int = 10000, ttl: float = None, negative: bool = True):
+        super().__init__()
+        self.table = table
+        self.negative = negative
+        self._rows = TTLCache(maxsize, ttl)
+        self._queries = TTLCache(maxsize, ttl)
+        self._stats_lock = threading.Lock()
+        self._tx_written: list = []  # ids invalidated in the open transaction, None for all
+        self.reset_stats()
+
+    @property
+    def _primary_keys(self) -> list[str]:
+        return self.table._primary_keys
+
+    @property
+    def _conn(self):
+        return self.table._conn
+
+    def _in_transaction(self) -> bool:
+        return self.table._conn is not None
+
+    # ===================== Stats =====================
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._hits = self._misses = self._negative_hits = self._invalidations = 0
+            self._hit_calls = self._miss_calls = 0
+            self._hit_seconds = self._miss_seconds = 0.0
+
+    def _record(self, hits: int, misses: int, seconds: float, negative_hits: int = 0):
+        with self._stats_lock:
+            self._hits += hits
+            self._misses += misses
+            self._negative_hits += negative_hits
+            if misses:
+                self._miss_calls += 1
+                self._miss_seconds += seconds
+            elif hits:
+                self._hit_calls += 1
+                self._hit_seconds += seconds
+
+    def stats(self) -> dict:
+        """
+        Lookup counts (a fetch_many counts one per key), hit rate, and the mean seconds of
+        calls answered from the cache alone vs. calls that went to the table.
+        """
+        with self._stats_lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'negative_hits': self._negative_hits,
+                'hit_rate': self._hits / total if total else 0.0,
+                'mean_hit_seconds': self._hit_seconds / self._hit_calls if self._hit_calls else 0.0,
+                'mean_miss_seconds': self._miss_seconds / self._miss_calls if self._miss_calls else 0.0,
+                'invalidations': self._invalidations,
+                'evictions': self._rows.evictions + self._queries.evictions,
+                'rows': len(self._rows),
+                'queries': len(self._queries),
+            }
+
+    # ===================== Invalidation =====================
+
+    def invalidate(self, ids: Iterable = None) -> 'CachedSQLTable':
+        """Drop the cached rows of ids (all rows if None) and every cached query result."""
+        ids = None if ids is None else self._unique_ids(ids)
+        n = self._queries.clear()
+        if ids is None:
+            n += self._rows.clear()
+        else:
+            n += sum(self._rows.discard(pk) for pk in ids)
+        with self._stats_lock:
+            self._invalidations += n
+        if self._in_transaction():
+            # other threads may cache the pre-commit rows until this commits
+            self._tx_written.append(ids)
+        return self
+
+    def _where_pk(self, where: dict):
+        """The primary key value if where is an equality on exactly the primary keys, else None."""
+        if not where or len(where) != len(self._primary_keys):
+            return None
+        if any(where.get(pk) is None or isinstance(where[pk], dict) for pk in self._primary_keys):
+            return None
+        return self._pk_of(where)
+
+    def _invalidate_written(self, where: dict = None, ids: list = None, updates: dict = None):
+        """After a write: just the rows it names, unless it may move rows to other keys."""
+        if where is not None:
+            pk = self._where_pk(where)
+            ids = None if pk is None else [pk]
+        if updates and any(pk in updates for pk in self._primary_keys):
+            ids = None
+        self.invalidate(ids)
+
+    # ===================== Schema & Init =====================
+
+    def create(self, tabledefine) -> 'CachedSQLTable':
+        self.table.create(tabledefine)
+        self.invalidate()
+        return self
+
+    def exists(self) -> bool:
+        return self.table.exists()
+
+    def truncate(self) -> 'CachedSQLTable':
+        self.table.truncate()
+        self.invalidate()
+        return self
+
+    def drop(self) -> 'CachedSQLTable':
+        self.table.drop()
+        self.invalidate()
+        return self
+
+    # ===================== Context Manager =====================
+
+    def __enter__(self):
+        self.table.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        written, self._tx_written = self._tx_written, []
+        try:
+            return self.table.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            if exc_type is not None:
+                self.invalidate()
+            elif None in written:
+                self.invalidate()
+            elif written:
+                self.invalidate([pk for ids in written for pk in ids])
+
+    # ===================== CRUD =====================
+
+    def insert(self, *rows: dict, replace: bool = False, batch_size: int = 1000) -> 'CachedSQLTable':
+        self.table.insert(*rows, replace=replace, batch_size=batch_size)
+        if rows and any(pk not in rows[0] for pk in self._primary_keys):  # generated keys
+            self.invalidate()
+        else:
+            self.invalidate([self._pk_of(r) for r in rows])
+        return self
+
+    def insert_bulk(self, rows: Iterable[dict], replace: bool = False, **kwargs) -> int:
+        n = self.table.insert_bulk(rows, replace=replace, **kwargs)
+        self.invalidate()
+        return n
+
+    def fetch(self, where: dict = None, keys: list[str] = None,
+              order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+              after: dict = None) -> list[dict]:
+        if self._in_transaction():
+            return self.table.fetch(where, keys, order_by, limit, offset, after)
+        start = time.perf_counter()
+        pk = self._where_pk(where) if order_by is None and offset is None and after is None else None
+        if pk is not None:
+            found = self._fetch_ids([pk], keys, start)
+            rows = list(found.values())
+            return rows if limit is None else rows[:limit]
+
+        rows = self._cached_query(
+            ('fetch', where, keys, order_by, limit, offset, after), start,
+            lambda: self.table.fetch(where, keys, order_by, limit, offset, after),
+        )
+        return [dict(r) for r in rows]
+
+    def _cached_query(self, query: tuple, start: float, run):
+        """run() once per distinct query, then from the query cache until a write or ttl."""
+        if self._in_transaction():
+            return run()
+        try:
+            qkey = _freeze(query)
+            hash(qkey)
+        except TypeError:  # unhashable filter values, e.g. JSON
+            return run()
+        result = self._queries.get(qkey)
+        if result is None:
+            generation = self._queries.generation  # a write during run() keeps its result out
+            result = run()
+            self._queries.set(qkey, result, generation)
+            self._record(0, 1, time.perf_counter() - start)
+        else:
+            self._record(1, 0, time.perf_counter() - start)
+        return result
+
+    def fetch_many(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> dict:
+        if self._in_transaction():
+            return self.table.fetch_many(ids, keys=keys, batch_size=batch_size)
+        return self._fetch_ids(self._unique_ids(ids), keys, time.perf_counter(), batch_size)
+
+    def _fetch_ids(self, ids: list, keys: list[str], start: float, batch_size: int = 1000) -> dict:
+        cached = {pk: self._rows.get(pk) for pk in ids}
+        missing = [pk for pk, row in cached.items() if row is None]
+        if missing:
+            generation = self._rows.generation  # a write during the read keeps its rows out
+            fetched = self.table.fetch_many(missing, batch_size=batch_size)
+            for pk in missing:
+                row = fetched.get(pk)
+                if row is not None:
+                    self._rows.set(pk, row, generation)
+                elif self.negative:
+                    self._rows.set(pk, _ABSENT, generation)
+                cached[pk] = row
+        negative_hits = sum(1 for row in cached.values() if row is _ABSENT)
+        self._record(len(ids) - len(missing), len(missing), time.perf_counter() - start, negative_hits)
+
+        out = {}
+        for pk, row in cached.items():
+            if row is None or row is _ABSENT:
+                continue
+            out[pk] = {k: row[k] for k in keys} if keys else dict(row)
+        return out
+
+    def iter_fetch(self, where: dict = None, keys: list[str] = None,
+                   order_by: dict[str, bool] = None, chunk_size: int = 1000) -> Iterator[list[dict]]:
+        """Not cached: streams straight from the table."""
+        yield from self.table.iter_fetch(where=where, keys=keys, order_by=order_by, chunk_size=chunk_size)
+
+    def count(self, where: dict = None) -> int:
+        return self._cached_query(('count', where), time.perf_counter(), lambda: self.table.count(where))
+
+    def aggregate(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                  order_by: dict[str, bool] = None, limit: int = None) -> list[dict]:
+        rows = self._cached_query(
+            ('aggregate', group_by, metrics, where, order_by, limit), time.perf_counter(),
+            lambda: self.table.aggregate(group_by, metrics, where, order_by, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def update(self, updates: dict, where: dict) -> int:
+        n = self.table.update(updates, where)
+        self._invalidate_written(where=where, updates=updates)
+        return n
+
+    def update_many(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> int:
+        ids = self._unique_ids(ids)
+        n = self.table.update_many(updates, ids, batch_size=batch_size)
+        self._invalidate_written(ids=ids, updates=updates)
+        return n
+
+    def delete(self, where: dict) -> int:
+        n = self.table.delete(where)
+        self._invalidate_written(where=where)
+        return n
+
+    def delete_many(self, ids: Iterable, batch_size: int = 1000) -> int:
+        ids = self._unique_ids(ids)
+        n = self.table.delete_many(ids, batch_size=batch_size)
+        self.invalidate(ids)
+        return n
+
+    # ===================== Meta =====================
+
+    def keys(self) -> list[str]:
+        return self.table.keys()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}({self.table!r})>"
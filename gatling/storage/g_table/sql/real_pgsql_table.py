@@ -1,83 +1,44 @@
-from sqlalchemy import (
-    MetaData,
-    select, update as sa_update, delete as sa_delete,
-    func,
-)
-from sqlalchemy.schema import CreateTable, DropTable
-from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB, JSON
-from psycopg.types.json import Jsonb
-from psycopg_pool import ConnectionPool
-
-from gatling.storage.g_table.sql.base_sql_table import BaseSQLTable, build_where
-from gatling.storage.g_table.sql.a_pgsql_base import compile_stmt, exist_table, _PG_DIALECT
+import uuid
+from itertools import chain
+from typing import Iterator, Iterable, Literal
 
+from sqlalchemy import select, table as sa_table, column as sa_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import ConnectionPool
 
-def _parse_table_name(table_name: str) -> tuple[str | None, str]:
-    """Parse 'schema.table' into (schema, table). Plain 'table' returns (None, table)."""
-    if '.' in table_name:
-        schema, table = table_name.split('.', 1)
-        return schema, table
-    return None, table_name
+from gatling.storage.g_table.sql.base_sql_table import BaseSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import compile_stmt, exist_table
+from gatling.storage.g_table.sql.a_pgsql_statements import PGStatementsMixin
 
 
-class PGSQLTable(BaseSQLTable):
+class PGSQLTable(PGStatementsMixin, BaseSQLTable):
 
     def __init__(self, table_name: str, pool: ConnectionPool):
         super().__init__()
-        self.table_name = table_name
-        self._schema, self._bare_table = _parse_table_name(table_name)
-        self.pool = pool
+        self._init_pg(table_name, pool)
         self._conn = None
-        self.tabledefine = None
-        self._table = None
-        self._all_keys = None
-        self._primary_keys = None
-        self._json_cols = set()
+        self._col_oids = None
 
     # ===================== Schema & Init =====================
 
     def create(self, tabledefine) -> 'PGSQLTable':
-        self.tabledefine = tabledefine
-        self._all_keys = tabledefine.keys()
-        self._primary_keys = [m.name for m in tabledefine if m.value.primary]
-        src = tabledefine.get_sql_table()
-        meta = MetaData(schema=self._schema) if self._schema else MetaData()
-        self._table = src.to_metadata(meta, name=self._bare_table)
-        self._json_cols = {c.name for c in self._table.columns if isinstance(c.type, (JSONB, JSON))}
-        if self._schema:
-            self._exec(f'CREATE SCHEMA IF NOT EXISTS "{self._schema}"')
-        sql = str(CreateTable(self._table, if_not_exists=True).compile(dialect=_PG_DIALECT))
-        self._exec(sql)
+        self._col_oids = None
+        for sql in self._define(tabledefine):
+            self._exec(sql)
         return self
 
     def exists(self) -> bool:
         return exist_table(self.pool, self._bare_table, schema=self._schema)
 
     def truncate(self) -> 'PGSQLTable':
-        qualified = f'"{self._schema}"."{self._bare_table}"' if self._schema else f'"{self._bare_table}"'
-        self._exec(f'TRUNCATE TABLE {qualified}')
+        self._exec(f'TRUNCATE TABLE {self._qualified()}')
         return self
 
     def drop(self) -> 'PGSQLTable':
-        if self._table is not None:
-            sql = str(DropTable(self._table, if_exists=True).compile(dialect=_PG_DIALECT))
-        else:
-            qualified = f'"{self._schema}"."{self._bare_table}"' if self._schema else f'"{self._bare_table}"'
-            sql = f'DROP TABLE IF EXISTS {qualified}'
-        self._exec(sql)
+        self._exec(self._drop_sql())
         return self
 
-    def _adapt_json(self, row: dict) -> dict:
-        if not self._json_cols:
-            return row
-        out = {}
-        for k, v in row.items():
-            if k in self._json_cols and isinstance(v, (dict, list)):
-                out[k] = Jsonb(v)
-            else:
-                out[k] = v
-        return out
-
     # ===================== Context Manager =====================
 
     def __enter__(self):
@@ -105,16 +66,12 @@ class PGSQLTable(BaseSQLTable):
 
     def _query(self, sql, params=None) -> list[dict]:
         if self._conn is not None:
-            cur = self._conn.execute(sql, params)
-            cols = [d.name for d in cur.description]
-            rows = cur.fetchall()
-            return [{k: v for k, v in zip(cols, row)} for row in rows]
+            cur = self._conn.cursor(row_factory=dict_row)
+            return cur.execute(sql, params).fetchall()
         else:
             with self.pool.connection() as conn:
-                cur = conn.execute(sql, params)
-                cols = [d.name for d in cur.description]
-                rows = cur.fetchall()
-                return [{k: v for k, v in zip(cols, row)} for row in rows]
+                cur = conn.cursor(row_factory=dict_row)
+                return cur.execute(sql, params).fetchall()
 
     def _scalar(self, sql, params=None):
         if self._conn is not None:
@@ -127,99 +84,195 @@ class PGSQLTable(BaseSQLTable):
                 row = cur.fetchone()
                 return row[0]
 
+    def _iter_query(self, sql, params, chunk_size: int, row_factory=dict_row) -> Iterator[list]:
+        """Stream a result through a named (server-side) cursor, chunk_size rows per round trip."""
+        def _iter(conn):
+            with conn.cursor(name=f'gatling_{uuid.uuid4().hex}', row_factory=row_factory) as cur:
+                cur.itersize = chunk_size
+                cur.execute(sql, params)
+                while rows := cur.fetchmany(chunk_size):
+                    yield rows
+
+        if self._conn is not None:
+            yield from _iter(self._conn)
+        else:
+            with self.pool.connection() as conn:
+                yield from _iter(conn)
+
     # ===================== Insert =====================
 
     def insert(self, *rows: dict, replace: bool = False, batch_size: int = 1000) -> 'PGSQLTable':
+        """
+        Rows are sent as multi-row ``INSERT ... VALUES`` statements of up to batch_size rows,
+        fewer when the columns would exceed PG_MAX_PARAMS. The columns are those of all rows together;
+        a row without one of them gets its Field default.
+        With replace, a later row wins over an earlier one with the same primary key, as if
+        the rows were upserted one by one (one statement cannot update a row twice).
+        """
         if not rows:
             return self
+        self._run_stmts(self._insert_stmts(rows, replace, batch_size))
+        return self
+
+    def _run_stmts(self, stmts: list[tuple[str, list]]) -> int:
+        """Execute statements in one transaction; total rowcount."""
+        def _run(conn):
+            cur = conn.cursor()
+            total = 0
+            for sql, params in stmts:
+                total += cur.execute(sql, params).rowcount
+            return total
+
+        if self._conn is not None:
+            return _run(self._conn)
+        with self.pool.connection() as conn:
+            total = _run(conn)
+            conn.commit()
+            return total
+
+    def _copy_oids(self, keys: list[str]) -> list[int]:
+        """Type OIDs of the given columns, read once from the catalog and cached."""
+        if self._col_oids is None:
+            rows = self._query(
+                "SELECT attname, atttypid::int AS oid FROM pg_attribute "
+                "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped",
+                (self._qualified(),),
+            )
+            self._col_oids = {row['attname']: row['oid'] for row in rows}
+        return [self._col_oids[k] for k in keys]
+
+    def insert_bulk(self, rows: Iterable[dict], replace: bool = False,
+                    method: Literal['copy', 'copy_text', 'executemany'] = 'copy') -> int:
+        """
+        Insert many rows in one COPY stream and return the row count.
+
+        'copy' uses binary COPY typed by the table's columns, so values must be the native
+        Python types of their columns (e.g. uuid.UUID for UUID, ipaddress objects for INET);
+        'copy_text' lets the server parse every value; 'executemany' falls back to insert().
+        With replace=True rows are copied into a temp table and upserted from it, so their
+        primary keys must be unique within the call.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        keys = list(first)
+        if method == 'executemany':
+            batch = [first, *rows]
+            self.insert(*batch, replace=replace)
+            return len(batch)
+        if method not in ('copy', 'copy_text'):
+            raise ValueError(f"method must be 'copy', 'copy_text' or 'executemany', not {method!r}")
+
+        cols = ', '.join(f'"{k}"' for k in keys)
+        binary = method == 'copy'
+        oids = self._copy_oids(keys) if binary else None
+        target = self._qualified()
         if replace:
-            stmt = pg_insert(self._table)
-            non_pk = [k for k in rows[0] if k not in self._primary_keys]
-            if non_pk:
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=self._primary_keys,
-                    set_={k: stmt.excluded[k] for k in non_pk},
-                )
-            else:
-                stmt = stmt.on_conflict_do_nothing(index_elements=self._primary_keys)
-            sql, _ = compile_stmt(stmt)
-        else:
-            sql, _ = compile_stmt(self._table.insert())
+            target = f'"_bulk_{self._bare_table}"'
+            tmp = sa_table(f'_bulk_{self._bare_table}', *[sa_column(k) for k in keys])
+            stmt = pg_insert(self._table).from_select(keys, select(*[tmp.c[k] for k in keys]))
+            upsert_sql, _ = compile_stmt(self._on_conflict(stmt, keys))
+        copy_sql = f'COPY {target} ({cols}) FROM STDIN' + (' (FORMAT BINARY)' if binary else '')
+
+        def _copy(conn) -> int:
+            count = 0
+            with conn.cursor() as cur:
+                if replace:
+                    cur.execute(f'CREATE TEMP TABLE {target} (LIKE {self._qualified()} INCLUDING DEFAULTS) ON COMMIT DROP')
+                with cur.copy(copy_sql) as copy:
+                    if binary:
+                        copy.set_types(oids)
+                    for row in chain([first], rows):
+                        row = self._adapt_json(row)
+                        copy.write_row([row[k] for k in keys])
+                        count += 1
+                if replace:
+                    cur.execute(upsert_sql)
+                    cur.execute(f'DROP TABLE {target}')
+            return count
 
-        if len(rows) == 1:
-            self._exec(sql, self._adapt_json(rows[0]))
+        if self._conn is not None:
+            return _copy(self._conn)
+        with self.pool.connection() as conn:
+            count = _copy(conn)
+            conn.commit()
+            return count
+
+    def copy_in_lines(self, keys: list[str], blocks: Iterable[bytes]) -> 'PGSQLTable':
+        """Stream blocks of COPY text-format lines (tab separated, newline terminated) into the given columns."""
+        cols = ', '.join(f'"{k}"' for k in keys)
+        sql = f'COPY {self._qualified()} ({cols}) FROM STDIN'
+
+        def _copy(conn):
+            with conn.cursor() as cur, cur.copy(sql) as copy:
+                for block in blocks:
+                    copy.write(block)
+
+        if self._conn is not None:
+            _copy(self._conn)
         else:
-            adapted = [self._adapt_json(r) for r in rows]
-            if self._conn is not None:
-                cur = self._conn.cursor()
-                for i in range(0, len(adapted), batch_size):
-                    cur.executemany(sql, adapted[i:i + batch_size])
-            else:
-                with self.pool.connection() as conn:
-                    cur = conn.cursor()
-                    for i in range(0, len(adapted), batch_size):
-                        cur.executemany(sql, adapted[i:i + batch_size])
-                    conn.commit()
+            with self.pool.connection() as conn:
+                _copy(conn)
+                conn.commit()
         return self
 
     # ===================== Fetch =====================
 
     def fetch(self, where: dict = None, keys: list[str] = None,
-              order_by: dict[str, bool] = None, limit: int = None, offset: int = None) -> list[dict]:
-        if keys:
-            stmt = select(*[self._table.c[k] for k in keys])
-        else:
-            stmt = select(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        if order_by:
-            for col, desc in order_by.items():
-                c = self._table.c[col]
-                stmt = stmt.order_by(c.desc() if desc else c.asc())
-        if limit is not None:
-            stmt = stmt.limit(limit)
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        sql, params = compile_stmt(stmt)
-        return self._query(sql, params or None)
+              order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+              after: dict = None) -> list[dict]:
+        return self._query(*self._select_stmt(where, keys, order_by, limit, offset, after))
+
+    def iter_fetch(self, where: dict = None, keys: list[str] = None,
+                   order_by: dict[str, bool] = None, chunk_size: int = 1000,
+                   as_tuples: bool = False) -> Iterator[list]:
+        """
+        Like fetch(), but yields the result in lists of at most chunk_size rows from a
+        server-side cursor, so memory stays constant. as_tuples yields plain tuples in
+        column order instead of dicts.
+        """
+        sql, params = self._select_stmt(where, keys, order_by)
+        yield from self._iter_query(sql, params or None, chunk_size, tuple_row if as_tuples else dict_row)
+
+    def fetch_many(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> dict:
+        """
+        Rows by primary key, ``{pk: row}`` (a tuple of values for a composite key). A
+        single-column key is matched with one ``= ANY(%s)`` array parameter whatever the
+        number of ids; a composite key with ``IN`` lists of up to batch_size keys. Keys with
+        no row are left out.
+        """
+        rows = []
+        for sql, args in self._fetch_many_stmts(ids, keys, batch_size):
+            rows.extend(self._query(sql, args))
+        return self._index_by_pk(rows, keys)
 
     def count(self, where: dict = None) -> int:
-        stmt = select(func.count()).select_from(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._scalar(sql, params or None)
+        return self._scalar(*self._count_stmt(where))
+
+    def aggregate(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                  order_by: dict[str, bool] = None, limit: int = None) -> list[dict]:
+        """
+        One row per group_by combination (a single row without group_by) with the metrics
+        computed by the database, e.g. ``metrics={'n': 'count', 'avg_score': ('avg', 'score')}``;
+        see build_aggregate. Defaults to ``{'count': 'count'}``.
+        """
+        return self._query(*self._aggregate_stmt(group_by, metrics, where, order_by, limit))
 
     # ===================== Update =====================
 
     def update(self, updates: dict, where: dict) -> int:
-        stmt = sa_update(self._table).values(self._adapt_json(updates))
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._exec(sql, params)
+        return self._exec(*self._update_stmt(updates, where))
+
+    def update_many(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> int:
+        """Apply the same updates to the rows with the given primary keys; see fetch_many()."""
+        return self._run_stmts(self._update_many_stmts(updates, ids, batch_size))
 
     # ===================== Delete =====================
 
     def delete(self, where: dict) -> int:
-        if not where:
-            raise ValueError("WHERE required for delete(). Use truncate() to clear all rows.")
-        stmt = sa_delete(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._exec(sql, params)
-
-    # ===================== Meta =====================
-
-    def keys(self) -> list[str]:
-        if self._all_keys:
-            return list(self._all_keys)
-        return [c.name for c in self._table.columns]
-
-    def __repr__(self) -> str:
-        return f"<{self.__class__.__name__}(table={self.table_name!r})>"
+        return self._exec(*self._delete_stmt(where))
+
+    def delete_many(self, ids: Iterable, batch_size: int = 1000) -> int:
+        """Delete the rows with the given primary keys; see fetch_many()."""
+        return self._run_stmts(self._delete_many_stmts(ids, batch_size))
@@ -1,21 +1,35 @@
 import datetime
 import json
+import os
 import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Iterable
 
 from sqlalchemy import (
     MetaData, JSON,
     select, update as sa_update, delete as sa_delete,
-    func,
+    func, bindparam,
 )
 from sqlalchemy.schema import CreateTable, DropTable
 from sqlalchemy.dialects import sqlite as sqlite_dialect
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from gatling.storage.g_table.sql.base_sql_table import BaseSQLTable, build_where, compile_stmt as _compile_stmt
+from gatling.storage.g_table.sql.base_sql_table import (
+    BaseSQLTable, StmtCache, build_where, build_select, select_shape, where_shape, bind_params,
+    build_aggregate, aggregate_shape,
+    build_values_insert, values_params, values_widths, build_pk_in, pk_params,
+    compile_stmt as _compile_stmt,
+)
 
 # ===================== SQLite Dialect & Type Adapters =====================
 
 _SQLITE_DIALECT = sqlite_dialect.dialect(paramstyle='named')
+_SQLITE_POSITIONAL_DIALECT = sqlite_dialect.dialect(paramstyle='qmark')
+
+# SQLITE_MAX_VARIABLE_NUMBER default, raised from 999 in SQLite 3.32
+SQLITE_MAX_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
 
 sqlite3.register_adapter(datetime.time, lambda t: t.isoformat())
 sqlite3.register_converter("BOOLEAN", lambda b: bool(int(b)))
@@ -28,33 +42,109 @@ def compile_stmt(stmt) -> tuple[str, dict]:
     return _compile_stmt(stmt, _SQLITE_DIALECT)
 
 
+def compile_positional(stmt) -> tuple[str, dict]:
+    return _compile_stmt(stmt, _SQLITE_POSITIONAL_DIALECT)
+
+
+# Opt-in tuning for write-heavy or read-heavy local databases. WAL keeps `<db>-wal` / `<db>-shm`
+# files next to the database while connections are open and lets readers run alongside a writer.
+SQLITE_FAST_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 << 20,
+    'cache_size': -64000,  # KiB
+    'temp_store': 'MEMORY',
+}
+
+
 class SQLiteTable(BaseSQLTable):
+    """
+    Table in a SQLite file.
+
+    With ``persistent`` (default) every thread keeps one open connection per table object
+    and reuses it across calls, instead of connecting and closing per operation; ``close()``
+    (also called by ``drop()``) releases them. ``pragmas`` are applied to each new connection,
+    e.g. ``SQLITE_FAST_PRAGMAS``.
+    """
 
-    def __init__(self, table_name: str, db_path: str):
+    def __init__(self, table_name: str, db_path: str, persistent: bool = True, pragmas: dict = None):
         super().__init__()
         self.table_name = table_name
         self.db_path = db_path
+        self.persistent = persistent
+        self.pragmas = dict(pragmas or {})
+        self._conns: weakref.WeakKeyDictionary[threading.Thread, tuple[int, sqlite3.Connection]] = weakref.WeakKeyDictionary()
+        self._conns_lock = threading.Lock()
         self._conn = None
         self.tabledefine = None
         self._table = None
         self._all_keys = None
         self._primary_keys = None
         self._json_cols = set()
+        self._stmt_cache = StmtCache()
 
     # ===================== Connection =====================
 
     def _connect(self):
-        return sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        for key, val in self.pragmas.items():
+            conn.execute(f'PRAGMA {key}={val}')
+        return conn
+
+    def _thread_conn(self):
+        """This thread's cached connection, dropped with the thread; a forked child opens its own."""
+        thread = threading.current_thread()
+        entry = self._conns.get(thread)
+        if entry is None or entry[0] != os.getpid():
+            entry = (os.getpid(), self._connect())
+            with self._conns_lock:
+                self._conns[thread] = entry
+        return entry[1]
+
+    @contextmanager
+    def _connection(self, commit: bool = False):
+        """The transaction connection, else this thread's cached one, else a one-shot connection."""
+        if self._conn is not None:
+            yield self._conn
+        elif self.persistent:
+            conn = self._thread_conn()
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            if commit:
+                conn.commit()
+        else:
+            conn = self._connect()
+            try:
+                yield conn
+                if commit:
+                    conn.commit()
+            finally:
+                conn.close()
+
+    def close(self) -> 'SQLiteTable':
+        """Close the cached connections of all threads."""
+        with self._conns_lock:
+            entries = list(self._conns.values())
+            self._conns.clear()
+        for pid, conn in entries:
+            if pid == os.getpid() and conn is not self._conn:
+                conn.close()
+        return self
 
     # ===================== Schema & Init =====================
 
     def create(self, tabledefine) -> 'SQLiteTable':
         self.tabledefine = tabledefine
-        self._all_keys = tabledefine.keys()
-        self._primary_keys = [m.name for m in tabledefine if m.value.primary]
+        schema = tabledefine.get_schema()
+        self._all_keys = list(schema.names)
+        self._primary_keys = list(schema.primary_keys)
         src = tabledefine.get_sql_table()
         self._table = src.to_metadata(MetaData(), name=self.table_name)
         self._json_cols = {c.name for c in self._table.columns if isinstance(c.type, JSON)}
+        self._stmt_cache.clear()
         sql = str(CreateTable(self._table, if_not_exists=True).compile(dialect=_SQLITE_DIALECT))
         self._exec(sql)
         return self
@@ -68,14 +158,8 @@ class SQLiteTable(BaseSQLTable):
             row = cursor.fetchone()
             return row[0] > 0
 
-        if self._conn is not None:
-            return _check(self._conn)
-        else:
-            conn = self._connect()
-            try:
-                return _check(conn)
-            finally:
-                conn.close()
+        with self._connection() as conn:
+            return _check(conn)
 
     def truncate(self) -> 'SQLiteTable':
         self._exec(f'DELETE FROM "{self.table_name}"')
@@ -87,6 +171,8 @@ class SQLiteTable(BaseSQLTable):
         else:
             sql = f'DROP TABLE IF EXISTS "{self.table_name}"'
         self._exec(sql)
+        if self._conn is None:
+            self.close()
         return self
 
     def _adapt_json(self, row: dict) -> dict:
@@ -103,7 +189,7 @@ class SQLiteTable(BaseSQLTable):
     # ===================== Context Manager =====================
 
     def __enter__(self):
-        self._conn = self._connect()
+        self._conn = self._thread_conn() if self.persistent else self._connect()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -112,140 +198,209 @@ class SQLiteTable(BaseSQLTable):
                 self._conn.commit()
             else:
                 self._conn.rollback()
-            self._conn.close()
+            if not self.persistent:
+                self._conn.close()
             self._conn = None
 
     def _exec(self, sql, params=None) -> int:
-        if self._conn is not None:
-            cursor = self._conn.execute(sql, params or {})
+        with self._connection(commit=True) as conn:
+            cursor = conn.execute(sql, params or {})
             return cursor.rowcount
-        else:
-            conn = self._connect()
-            try:
-                cursor = conn.execute(sql, params or {})
-                conn.commit()
-                return cursor.rowcount
-            finally:
-                conn.close()
 
     def _query(self, sql, params=None) -> list[dict]:
-        if self._conn is not None:
-            self._conn.row_factory = sqlite3.Row
-            cursor = self._conn.execute(sql, params or {})
-            rows = cursor.fetchall()
-            self._conn.row_factory = None
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(sql, params or {}).fetchall()
             return [dict(row) for row in rows]
-        else:
-            conn = self._connect()
-            try:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.execute(sql, params or {})
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
-            finally:
-                conn.close()
 
     def _scalar(self, sql, params=None):
-        if self._conn is not None:
-            cursor = self._conn.execute(sql, params or {})
+        with self._connection() as conn:
+            cursor = conn.execute(sql, params or {})
             row = cursor.fetchone()
             return row[0]
-        else:
-            conn = self._connect()
-            try:
-                cursor = conn.execute(sql, params or {})
-                row = cursor.fetchone()
-                return row[0]
-            finally:
-                conn.close()
+
+    def _iter_query(self, sql, params, chunk_size: int) -> Iterator[list[dict]]:
+        with self._connection() as conn:
+            cursor = conn.execute(sql, params or {})
+            cols = [d[0] for d in cursor.description]
+            while rows := cursor.fetchmany(chunk_size):
+                yield [{k: v for k, v in zip(cols, row)} for row in rows]
 
     # ===================== Insert =====================
 
+    def _on_conflict(self, stmt, keys: list[str]):
+        non_pk = [k for k in keys if k not in self._primary_keys]
+        if non_pk and self._primary_keys:
+            return stmt.on_conflict_do_update(
+                index_elements=self._primary_keys,
+                set_={k: stmt.excluded[k] for k in non_pk},
+            )
+        # without a primary key there is nothing to update; skip rows hitting any unique constraint
+        return stmt.on_conflict_do_nothing(index_elements=self._primary_keys or None)
+
     def insert(self, *rows: dict, replace: bool = False, batch_size: int = 1000) -> 'SQLiteTable':
+        """
+        Rows are sent as multi-row ``INSERT ... VALUES`` statements of up to batch_size rows,
+        fewer when the columns would exceed SQLITE_MAX_PARAMS. The columns are those of all rows together;
+        a row without one of them gets its Field default.
+        """
         if not rows:
             return self
-        if replace:
-            stmt = sqlite_insert(self._table)
-            non_pk = [k for k in rows[0] if k not in self._primary_keys]
-            if non_pk:
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=self._primary_keys,
-                    set_={k: stmt.excluded[k] for k in non_pk},
-                )
-            else:
-                stmt = stmt.on_conflict_do_nothing(index_elements=self._primary_keys)
-            sql, _ = compile_stmt(stmt)
-        else:
-            sql, _ = compile_stmt(self._table.insert())
-
-        if len(rows) == 1:
-            self._exec(sql, self._adapt_json(rows[0]))
-        else:
-            adapted = [self._adapt_json(r) for r in rows]
-            if self._conn is not None:
-                for i in range(0, len(adapted), batch_size):
-                    self._conn.executemany(sql, adapted[i:i + batch_size])
-            else:
-                conn = self._connect()
-                try:
-                    for i in range(0, len(adapted), batch_size):
-                        conn.executemany(sql, adapted[i:i + batch_size])
-                    conn.commit()
-                finally:
-                    conn.close()
+        keys, rows = self._insert_rows(rows)
+        width = max(1, min(batch_size, SQLITE_MAX_PARAMS // max(1, len(keys))))
+
+        def build(n):
+            stmt = build_values_insert(sqlite_insert, self._table, keys, n)
+            return compile_positional(self._on_conflict(stmt, keys) if replace else stmt)
+
+        adapted = [self._adapt_json(r) for r in rows]
+        with self._connection(commit=True) as conn:
+            i = 0
+            for n in values_widths(len(adapted), width):
+                sql, _ = self._stmt_cache.get(('insert', n, tuple(keys), replace), lambda: build(n))
+                conn.execute(sql, values_params(adapted[i:i + n], keys))
+                i += n
         return self
 
     # ===================== Fetch =====================
 
     def fetch(self, where: dict = None, keys: list[str] = None,
-              order_by: dict[str, bool] = None, limit: int = None, offset: int = None) -> list[dict]:
-        if keys:
-            stmt = select(*[self._table.c[k] for k in keys])
-        else:
-            stmt = select(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        if order_by:
-            for col, desc in order_by.items():
-                c = self._table.c[col]
-                stmt = stmt.order_by(c.desc() if desc else c.asc())
-        if limit is not None:
-            stmt = stmt.limit(limit)
-        if offset is not None:
-            stmt = stmt.offset(offset)
-        sql, params = compile_stmt(stmt)
-        return self._query(sql, params or None)
+              order_by: dict[str, bool] = None, limit: int = None, offset: int = None,
+              after: dict = None) -> list[dict]:
+        sql, fixed = self._stmt_cache.get(
+            select_shape(where, keys, order_by, limit, offset, after),
+            lambda: compile_stmt(build_select(self._table, where, keys, order_by, limit, offset, after, bind=True)),
+        )
+        return self._query(sql, {**fixed, **bind_params(where, after, limit, offset)} or None)
+
+    def iter_fetch(self, where: dict = None, keys: list[str] = None,
+                   order_by: dict[str, bool] = None, chunk_size: int = 1000) -> Iterator[list[dict]]:
+        """Like fetch(), but yields the result in lists of at most chunk_size rows."""
+        sql, fixed = self._stmt_cache.get(
+            select_shape(where, keys, order_by),
+            lambda: compile_stmt(build_select(self._table, where, keys, order_by, bind=True)),
+        )
+        params = {**fixed, **bind_params(where)}
+        yield from self._iter_query(sql, params or None, chunk_size)
+
+    def fetch_many(self, ids: Iterable, keys: list[str] = None, batch_size: int = 1000) -> dict:
+        """
+        Rows by primary key, ``{pk: row}`` (a tuple of values for a composite key), looked up
+        with ``IN (...)`` lists of up to batch_size keys. Keys with no row are left out.
+        """
+        self._require_pk('fetch_many')
+        ids = self._unique_ids(ids)
+        fetch_keys = self._fetch_keys(keys)
+        composite = len(self._primary_keys) > 1
+        width = max(1, min(batch_size, SQLITE_MAX_PARAMS // len(self._primary_keys)))
+
+        def build(n):
+            stmt = select(*[self._table.c[k] for k in fetch_keys]) if fetch_keys else select(self._table)
+            return compile_positional(stmt.where(build_pk_in(self._table, self._primary_keys, n)))
+
+        rows = []
+        i = 0
+        for n in values_widths(len(ids), width):
+            sql, _ = self._stmt_cache.get(('fetch_many', n, tuple(fetch_keys or ())), lambda: build(n))
+            rows.extend(self._query(sql, pk_params(ids[i:i + n], composite)))
+            i += n
+        return self._index_by_pk(rows, keys)
 
     def count(self, where: dict = None) -> int:
-        stmt = select(func.count()).select_from(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._scalar(sql, params or None)
+        def build():
+            stmt = select(func.count()).select_from(self._table)
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('count', where_shape(where)), build)
+        return self._scalar(sql, {**fixed, **bind_params(where)} or None)
+
+    def aggregate(self, group_by: list[str] = None, metrics: dict = None, where: dict = None,
+                  order_by: dict[str, bool] = None, limit: int = None) -> list[dict]:
+        """
+        One row per group_by combination (a single row without group_by) with the metrics
+        computed by the database, e.g. ``metrics={'n': 'count', 'avg_score': ('avg', 'score')}``;
+        see build_aggregate. Defaults to ``{'count': 'count'}``.
+        """
+        sql, fixed = self._stmt_cache.get(
+            aggregate_shape(group_by, metrics, where, order_by, limit),
+            lambda: compile_stmt(build_aggregate(self._table, group_by, metrics, where, order_by, limit, bind=True)),
+        )
+        return self._query(sql, {**fixed, **bind_params(where, limit=limit)} or None)
 
     # ===================== Update =====================
 
     def update(self, updates: dict, where: dict) -> int:
-        stmt = sa_update(self._table).values(self._adapt_json(updates))
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._exec(sql, params)
+        def build():
+            stmt = sa_update(self._table).values({k: bindparam(f'u_{k}', type_=self._table.c[k].type) for k in updates})
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('update', tuple(updates), where_shape(where)), build)
+        return self._exec(sql, {**fixed, **bind_params(where, updates=self._adapt_json(updates))})
+
+    def update_many(self, updates: dict, ids: Iterable, batch_size: int = 1000) -> int:
+        """Apply the same updates to the rows with the given primary keys; see fetch_many()."""
+        self._require_pk('update_many')
+        ids = self._unique_ids(ids)
+        composite = len(self._primary_keys) > 1
+        width = max(1, min(batch_size, (SQLITE_MAX_PARAMS - len(updates)) // len(self._primary_keys)))
+
+        def build(n):
+            stmt = sa_update(self._table).ordered_values(
+                *[(self._table.c[k], bindparam(f'u_{k}', type_=self._table.c[k].type)) for k in updates]
+            )
+            return compile_positional(stmt.where(build_pk_in(self._table, self._primary_keys, n)))
+
+        values = list(self._adapt_json(updates).values())
+        total = 0
+        with self._connection(commit=True) as conn:
+            i = 0
+            for n in values_widths(len(ids), width):
+                sql, _ = self._stmt_cache.get(('update_many', n, tuple(updates)), lambda: build(n))
+                total += conn.execute(sql, values + pk_params(ids[i:i + n], composite)).rowcount
+                i += n
+        return total
 
     # ===================== Delete =====================
 
     def delete(self, where: dict) -> int:
         if not where:
             raise ValueError("WHERE required for delete(). Use truncate() to clear all rows.")
-        stmt = sa_delete(self._table)
-        w = build_where(self._table, where)
-        if w is not None:
-            stmt = stmt.where(w)
-        sql, params = compile_stmt(stmt)
-        return self._exec(sql, params)
+
+        def build():
+            stmt = sa_delete(self._table)
+            w = build_where(self._table, where, bind=True)
+            if w is not None:
+                stmt = stmt.where(w)
+            return compile_stmt(stmt)
+
+        sql, fixed = self._stmt_cache.get(('delete', where_shape(where)), build)
+        return self._exec(sql, {**fixed, **bind_params(where)})
+
+    def delete_many(self, ids: Iterable, batch_size: int = 1000) -> int:
+        """Delete the rows with the given primary keys; see fetch_many()."""
+        self._require_pk('delete_many')
+        ids = self._unique_ids(ids)
+        composite = len(self._primary_keys) > 1
+        width = max(1, min(batch_size, SQLITE_MAX_PARAMS // len(self._primary_keys)))
+
+        def build(n):
+            return compile_positional(sa_delete(self._table).where(build_pk_in(self._table, self._primary_keys, n)))
+
+        total = 0
+        with self._connection(commit=True) as conn:
+            i = 0
+            for n in values_widths(len(ids), width):
+                sql, _ = self._stmt_cache.get(('delete_many', n), lambda: build(n))
+                total += conn.execute(sql, pk_params(ids[i:i + n], composite)).rowcount
+                i += n
+        return total
 
     # ===================== Meta =====================
 
@@ -0,0 +1,276 @@
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Literal, Optional
+
+from gatling.storage.g_queue.base_queue import BaseQueue
+from gatling.storage.g_table.sql.base_sql_table import BaseSQLTable
+
+try:
+    import psycopg
+    from psycopg_pool import PoolTimeout
+except ImportError:  # SQLite only
+    psycopg = None
+
+# errors after which the same batch is worth sending again: lost connections, pool
+# exhaustion, serialization conflicts and deadlocks
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = ()
+if psycopg is not None:
+    TRANSIENT_ERRORS += (
+        psycopg.OperationalError,
+        psycopg.errors.SerializationFailure,
+        psycopg.errors.DeadlockDetected,
+        PoolTimeout,
+    )
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Default ``retry_on``: one of TRANSIENT_ERRORS, or a locked/busy SQLite database
+    (other sqlite3.OperationalErrors, such as a missing table or column, are not retried).
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message
+    return isinstance(error, TRANSIENT_ERRORS)
+
+Method = Literal['auto', 'insert', 'copy', 'copy_text']
+
+
+class SQLBatchWriter:
+    """
+    Group-commit writer for a PGSQLTable or SQLiteTable, meant as the sink of a pipeline.
+
+    Rows given to ``append``/``extend`` (or to ``sink``, a TaskFlowManager stage function,
+    or pulled by ``drain`` from a BaseQueue) are kept in memory until ``max_rows`` are pending
+    or the oldest is ``max_delay`` seconds old, then written as one transaction. With
+    method 'auto' a batch whose rows all have the same keys goes through text COPY
+    (``insert_bulk``) where the table has it, the server parsing values as for ``insert``;
+    other batches, and every batch without COPY, through ``insert`` (multi-row VALUES).
+    Binary 'copy' needs the same keys in every row and native column types. A batch whose error ``retry_on`` accepts is sent again up to
+    ``retries`` times with exponential backoff; a batch that still fails is kept pending
+    and the error raised from the next call (or ``close``). A failed background flush
+    does not stop the timer: the batch is tried again once that error has been raised.
+    ``close`` writes what is pending before raising a stored error, and stays open if
+    rows could not be written, so it can be called again. Retrying a batch whose commit
+    was lost in transit can write it twice unless ``replace`` is set; with ``replace``,
+    a later row wins over an earlier one with the same primary key.
+
+    All methods are thread-safe; batches are written in the order rows were added.
+    """
+
+    def __init__(self, table: BaseSQLTable, max_rows: int = 5000, max_delay: Optional[float] = 1.0,
+                 replace: bool = False, method: Method = 'auto', retries: int = 3, backoff: float = 0.1,
+                 retry_on: Callable[[BaseException], bool] = is_transient):
+        if method not in ('auto', 'insert', 'copy', 'copy_text'):
+            raise ValueError(f"method must be 'auto', 'insert', 'copy' or 'copy_text', not {method!r}")
+        if method in ('copy', 'copy_text') and not hasattr(table, 'insert_bulk'):
+            raise ValueError(f"{table!r} has no COPY path (insert_bulk)")
+        self.table = table
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.replace = replace
+        self.method = method
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._pending: list[dict] = []
+        self._pending_since: Optional[float] = None
+        self._error: Optional[BaseException] = None
+        self._opened = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.rows_written = 0
+        self.batches = 0
+        self.retried = 0
+        self.write_seconds = 0.0
+        self._started: Optional[float] = None
+
+    # ===================== Lifecycle =====================
+
+    def open(self) -> 'SQLBatchWriter':
+        with self._cond:
+            self._opened = True
+            self._started = time.monotonic()
+            if self.max_delay is not None:
+                self._running = True
+                self._thread = threading.Thread(target=self._background, daemon=True)
+                self._thread.start()
+        return self
+
+    def close(self):
+        with self._cond:
+            if not self._opened:
+                raise RuntimeError(f'{self!r} is not opened.')
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # write what is pending first; on failure the writer stays open (with the rows) for another close()
+        try:
+            self._flush()
+        except BaseException:
+            with self._cond:
+                self._error = None  # superseded by this attempt at the same rows
+            raise
+        with self._cond:
+            self._opened = False
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ===================== Write =====================
+
+    def append(self, row: dict) -> 'SQLBatchWriter':
+        return self.extend([row])
+
+    def extend(self, rows: list[dict]) -> 'SQLBatchWriter':
+        with self._cond:
+            self._check_locked()
+            if not rows:
+                return self
+            self._pending.extend(rows)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                self._cond.notify_all()
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self.flush()
+        return self
+
+    def sink(self, rows: dict | list[dict]) -> None:
+        """Stage function for ``tfm.register_thread(writer.sink)``: takes one row or a list of rows."""
+        self.extend(rows if isinstance(rows, list) else [rows])
+
+    def drain(self, source: BaseQueue, stop: threading.Event = None, timeout: float = 0.1) -> int:
+        """
+        Move rows (or lists of rows) from a queue into the writer until the queue is empty,
+        or, with ``stop``, until stop is set and the queue is empty. Returns the number of items.
+        """
+        n = 0
+        while True:
+            try:
+                item = source.get(block=True, timeout=timeout)
+            except queue.Empty:
+                if stop is None or stop.is_set():
+                    return n
+                continue
+            self.sink(item)
+            n += 1
+
+    def flush(self) -> 'SQLBatchWriter':
+        with self._cond:
+            self._check_locked()
+        return self._flush()
+
+    def _flush(self) -> 'SQLBatchWriter':
+        with self._flush_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+                self._pending_since = None
+            if batch:
+                try:
+                    self._write(batch)
+                except BaseException:
+                    with self._cond:
+                        self._pending[:0] = batch
+                        if self._pending_since is None:
+                            self._pending_since = time.monotonic()
+                    raise
+        return self
+
+    def _check_locked(self):
+        if not self._opened:
+            raise RuntimeError(f'{self!r} is not opened.')
+        if self._error is not None:
+            error, self._error = self._error, None
+            self._cond.notify_all()
+            raise error
+
+    def _method(self, batch: list[dict]) -> str:
+        """'insert', or the insert_bulk method batch is written with."""
+        if self.method == 'insert' or not hasattr(self.table, 'insert_bulk'):
+            return 'insert'
+        if self.method != 'auto':
+            return self.method
+        # COPY takes one column list for the whole stream; insert() fills a row's missing columns
+        keys = batch[0].keys()
+        return 'copy_text' if all(row.keys() == keys for row in batch) else 'insert'
+
+    def _write(self, batch: list[dict]):
+        if self.replace and self.table._primary_keys:
+            # one statement (or COPY) cannot upsert a key twice; the later row wins on every path
+            batch = list({self.table._pk_of(r): r for r in batch}.values())
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                method = self._method(batch)
+                if method == 'insert':
+                    self.table.insert(*batch, replace=self.replace)
+                else:
+                    self.table.insert_bulk(batch, replace=self.replace, method=method)
+                break
+            except Exception as e:
+                if attempt == self.retries or not self.retry_on(e):
+                    raise
+                self.retried += 1
+                time.sleep(self.backoff * 2 ** attempt)
+        self.write_seconds += time.perf_counter() - start
+        self.rows_written += len(batch)
+        self.batches += 1
+
+    def _background(self):
+        with self._cond:
+            while self._running:
+                timeout = None
+                # after a failure, wait until the caller has seen the error before trying again
+                if self._pending_since is not None and self._error is None:
+                    timeout = self._pending_since + self.max_delay - time.monotonic()
+                    if timeout <= 0:
+                        self._cond.release()
+                        try:
+                            self._flush()
+                        except Exception as e:  # surfaced by the next append/flush/close
+                            with self._cond:
+                                self._error = e
+                        finally:
+                            self._cond.acquire()
+                        continue
+                self._cond.wait(timeout)
+
+    # ===================== Meta =====================
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        """Rows and batches written, retries, and throughput over wall time and over time spent writing."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            return {
+                'rows_written': self.rows_written,
+                'batches': self.batches,
+                'retried': self.retried,
+                'pending': len(self._pending),
+                'write_seconds': self.write_seconds,
+                'rows_per_second': self.rows_written / elapsed if elapsed else 0.0,
+                'write_rows_per_second': self.rows_written / self.write_seconds if self.write_seconds else 0.0,
+            }
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.table!r}, max_rows={self.max_rows})>"
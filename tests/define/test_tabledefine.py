@@ -1,6 +1,11 @@
 import datetime
 import unittest
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from enum import auto
 from gatling.define.constdefine import ConstDefine
 from gatling.define.tabledefine import TableDefine, Field
@@ -188,6 +193,40 @@ class TestTableDefineBasic(unittest.TestCase):
         self.assertEqual(ConstSchema.Debug.value.fmstr("0"), False)
         self.assertEqual(ConstSchema.StartDate.value.fmstr("2025-06-15"), datetime.date(2025, 6, 15))
 
+    def test_tostr_many(self):
+        for m in ConstSchema:
+            field, value = m.value, m.value.default
+            with self.subTest(name=m.name):
+                self.assertEqual(field.tostr_many([value, value]), [field.tostr(value)] * 2)
+        self.assertEqual(ConstSchema.Debug.value.tostr_many(iter([True, False])), ["1", "0"])
+
+    def test_fmstr_many(self):
+        for m in ConstSchema:
+            field = m.value
+            strs = [field.tostr(field.default), field.tostr(field.default)]
+            with self.subTest(name=m.name):
+                self.assertEqual(field.fmstr_many(strs), [field.fmstr(s) for s in strs])
+        self.assertEqual(ConstSchema.Port.value.fmstr_many(iter(["1", "-2"])), [1, -2])
+        self.assertEqual(ConstSchema.Debug.value.fmstr_many(["0", "1"]), [False, True])
+
+    def test_fmstr_many_dates_parsed_once(self):
+        got = ConstSchema.StartDate.value.fmstr_many(["2025-06-15", "2025-06-16", "2025-06-15"])
+        self.assertEqual(got, [datetime.date(2025, 6, 15), datetime.date(2025, 6, 16), datetime.date(2025, 6, 15)])
+        self.assertIs(got[0], got[2])
+
+    def test_custom_converters_many(self):
+        f = Field(int, tostr=lambda x: f"#{x}", fmstr=lambda x: int(x[1:]))
+        self.assertEqual(f.tostr_many([1, 2]), ["#1", "#2"])
+        self.assertEqual(f.fmstr_many(["#1", "#2"]), [1, 2])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_fmstr_many_array(self):
+        ints = ConstSchema.Port.value.fmstr_many(["1", "2"], array=True)
+        self.assertEqual((ints.dtype, ints.tolist()), (np.dtype('int64'), [1, 2]))
+        self.assertEqual(ConstSchema.Lr.value.fmstr_many(["0.5"], array=True).dtype, np.dtype('float64'))
+        self.assertEqual(ConstSchema.Debug.value.fmstr_many(["0", "1"], array=True).tolist(), [False, True])
+        self.assertEqual(ConstSchema.AppName.value.fmstr_many(["a"], array=True).dtype, np.dtype(object))
+
     def test_nullable(self):
         self.assertTrue(ConstSchema.AppName.value.nullable)
 
@@ -284,6 +323,49 @@ class TestTableDefineAsSchema(unittest.TestCase):
         self.assertEqual(d['flag'].default, False)
 
 
+# ===================== CompiledSchema =====================
+
+class TestCompiledSchema(unittest.TestCase):
+
+    def test_cached(self):
+        self.assertIs(TableSchema.get_schema(), TableSchema.get_schema())
+        self.assertIsNot(TableSchema.get_schema(), CompositePK.get_schema())
+
+    def test_columns(self):
+        schema = TableSchema.get_schema()
+        self.assertEqual(schema.names, ('id', 'name', 'score'))
+        self.assertEqual(schema.dtypes, (int, str, float))
+        self.assertEqual(schema.fields, (TableSchema['id'], TableSchema['name'], TableSchema['score']))
+        self.assertEqual(schema.tostrs[2](9.5), '9.5')
+        self.assertEqual(schema.fmstrs[0]('7'), 7)
+        self.assertEqual(dict(schema.positions), {'id': 0, 'name': 1, 'score': 2})
+        self.assertEqual(len(schema), 3)
+
+    def test_keys(self):
+        self.assertEqual(CompositePK.get_schema().primary_keys, ('group_id', 'item_id'))
+        self.assertEqual(EmptyDefault.get_schema().primary_keys, ())
+
+    def test_frozen(self):
+        schema = TableSchema.get_schema()
+        with self.assertRaises(AttributeError):
+            schema.names = ()
+        with self.assertRaises(TypeError):
+            schema.name2dtype['id'] = str
+        TableSchema.get_name2dtype()['id'] = str
+        self.assertIs(schema.name2dtype['id'], int)
+
+    def test_functional_api(self):
+        Dyn = TableDefine('Dyn', {'a': Field(int, primary=True), 'b': Field(str, index=True)})
+        self.assertEqual(Dyn.keys(), ['a', 'b'])
+        self.assertEqual((Dyn.get_schema().primary_keys, Dyn.get_schema().index_keys), (('a',), ('b',)))
+
+    def test_getitem_missing(self):
+        with self.assertRaises(KeyError):
+            TableSchema['nope']
+        with self.assertRaises(KeyError):
+            AppConfig['nope']
+
+
 # ===================== SQL Mode Types =====================
 
 class TestSQLModeTypes(unittest.TestCase):
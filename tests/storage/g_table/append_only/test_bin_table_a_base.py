@@ -0,0 +1,154 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from gatling.define.tabledefine import TableDefine, Field
+from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
+from gatling.storage.g_table.append_only.real_bin_table import BINTable, BinRowCodec
+from gatling.storage.g_table.append_only.real_tsv_table import KEY_IDX
+from gatling.utility.error_tools import FileAlreadyOpenedError, FileAlreadyOpenedForWriteError
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys, const_keys_extra, const_key2type_extra, filterbykeys, rows2cols
+
+s = Slice
+
+
+class TestBinRowCodec(unittest.TestCase):
+
+    def test_roundtrip(self):
+        codec = BinRowCodec(const_key2type_extra)
+        for i in range(20):
+            row = {KEY_IDX: i, **rand_row()}
+            self.assertEqual(codec.decode(codec.encode(row)), row)
+
+    def test_projection(self):
+        codec = BinRowCodec(const_key2type_extra)
+        row = {KEY_IDX: 3, **rand_row()}
+        data = codec.encode(row)
+        self.assertEqual(codec.decode(data, {'nickname_en': const_keys_extra.index('nickname_en')}), {'nickname_en': row['nickname_en']})
+
+    def test_special_values(self):
+        codec = BinRowCodec({'s': str, 'dt': datetime.datetime, 't': datetime.time, 'd': datetime.date})
+        row = {'s': 'tab\there\nnewline 中文',
+               'dt': datetime.datetime(1, 1, 1, 0, 0, 0, 1),
+               't': datetime.time(23, 59, 59, 999999),
+               'd': datetime.date(9999, 12, 31)}
+        self.assertEqual(codec.decode(codec.encode(row)), row)
+
+    def test_aware_datetime_raises(self):
+        codec = BinRowCodec({'dt': datetime.datetime})
+        with self.assertRaises(ValueError):
+            codec.encode({'dt': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)})
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(TypeError):
+            BinRowCodec({'b': bytes})
+
+
+class TestBINTable(SubTestCase):
+    """Unit tests for the binary row table."""
+
+    def prerun_0row(self):
+        pass
+
+    def prerun_5row_append(self):
+        for _ in range(5):
+            row = rand_row()
+            self.ft.append(row)
+            self.rows.append(row)
+
+    def prerun_5row_extend_ctxt(self):
+        rows = [rand_row() for _ in range(5)]
+        with self.ft:
+            self.ft.extend(rows[:2]).extend(rows[2:])
+        self.rows.extend(rows)
+
+    def setUp(self):
+        self.preruns = [self.prerun_0row, self.prerun_5row_append, self.prerun_5row_extend_ctxt]
+        self.slices = [s[:], s[:0], s[:1], s[1:4], s[2:], s[-3:], s[::2], s[::-1], s[::-2]]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.bin")
+        self.ft = BINTable(self.test_fname).create(tabledefine=ConstTestSchema)
+        self.rows = []
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_nofile(self):
+        with self.subTestCase():
+            self.ft.drop()
+            self.assertFalse(self.ft.exists())
+            with self.assertRaises(FileNotFoundError):
+                len(self.ft)
+            with self.assertRaises(FileNotFoundError):
+                self.ft.append(rand_row())
+
+    def test_keys_len(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                self.assertEqual(self.ft.get_key2type(), const_key2type_extra)
+                self.assertEqual(self.ft.keys(), const_keys_extra)
+                self.assertEqual(len(self.ft), len(self.rows))
+
+    def test_index(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                N = len(self.rows)
+                for idx in list(range(N)) + list(range(-N, 0)):
+                    self.assertEqual(self.ft[idx], self.rows[idx])
+                    self.assertEqual(self.ft[idx, const_keys[:2]], filterbykeys(self.rows[idx], const_keys[:2]))
+                for idx in [N, -N - 1]:
+                    with self.assertRaises(IndexError):
+                        _ = self.ft[idx]
+
+    def test_slice(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                for slc in self.slices:
+                    with self.subTest(slc=slc):
+                        self.assertEqual(self.ft[slc], self.rows[slc])
+                        self.assertEqual(self.ft.cols(None, slc), rows2cols(self.rows[slc], keys=const_keys))
+                        with self.ft:
+                            self.assertEqual(self.ft.rows(slc), self.rows[slc])
+
+    def test_pop_shrink(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                N = len(self.rows)
+                if N == 0:
+                    self.assertEqual(self.ft.pop(), {})
+                    self.assertEqual(self.ft.shrink(2), [])
+                    continue
+                with self.ft:
+                    self.assertEqual(self.ft.pop(), {KEY_IDX: N - 1, **self.rows[-1]})
+                    self.assertEqual(len(self.ft), N - 1)
+                self.assertEqual(self.ft.shrink(2), [{KEY_IDX: N - 2 - i, **self.rows[-2 - i]} for i in range(2)])
+                self.assertEqual(self.ft[:], self.rows[:N - 3])
+                self.ft.append(self.rows[0])
+                self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: N - 3})
+
+    def test_ctxt_errors(self):
+        with self.subTestCase():
+            with self.ft:
+                with self.assertRaises(FileAlreadyOpenedError):
+                    self.ft.truncate()
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    with self.ft:
+                        pass
+
+    def test_unsupported_schema(self):
+        with self.subTestCase():
+            schema = TableDefine('BytesSchema', {'raw': Field(bytes)})
+            with self.assertRaises(TypeError):
+                self.ft.drop().create(tabledefine=schema)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.help_tools.file_tools import iter_lines_backward, readline_backward, goto_tail, get_pos, popout
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row
+
+
+def rand_lines(n):
+    return [bytes(random.choice(b'ab\t') for _ in range(random.randint(0, 20))) for _ in range(n)]
+
+
+class TestIterLinesBackward(unittest.TestCase):
+
+    def test_lines_and_offsets(self):
+        for _ in range(200):
+            lines = rand_lines(random.randint(0, 40))
+            file = io.BytesIO(b'head\n' + b''.join(line + b'\n' for line in lines))
+            block_size = random.randint(1, 30)
+            got = list(iter_lines_backward(file, stop=5, block_size=block_size))
+            self.assertEqual([line for _, line in got], lines[::-1])
+            offsets = [5]
+            for line in lines:
+                offsets.append(offsets[-1] + len(line) + 1)
+            self.assertEqual([pos for pos, _ in got], offsets[:-1][::-1])
+
+    def test_whole_file(self):
+        lines = rand_lines(50)
+        file = io.BytesIO(b''.join(line + b'\n' for line in lines))
+        self.assertEqual([line for _, line in iter_lines_backward(file, block_size=7)], lines[::-1])
+        self.assertEqual(list(iter_lines_backward(io.BytesIO(b''))), [])
+
+    def test_readline_backward(self):
+        lines = rand_lines(30)
+        file = io.BytesIO(b''.join(line + b'\n' for line in lines))
+        goto_tail(file)
+        for line in reversed(lines):
+            self.assertEqual(readline_backward(file, chunk_size=4), line)
+        self.assertEqual(get_pos(file), 0)
+        self.assertEqual(readline_backward(file), b'')
+
+    def test_popout(self):
+        file = io.BytesIO(b'a\nbb\nccc\n')
+        self.assertEqual(popout(file), b'ccc')
+        self.assertEqual(file.getvalue(), b'a\nbb\n')
+
+
+class TestTSVTableTail(unittest.TestCase):
+    """Tail reads that span many 64 KB blocks."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ft = TSVTable(os.path.join(self.temp_dir.name, "test_table.tsv")).create(tabledefine=ConstTestSchema)
+        self.rows = [rand_row() for _ in range(1500)]
+        self.ft.extend(self.rows)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_negative_reads(self):
+        self.assertGreater(os.path.getsize(self.ft.fpath), 3 * (1 << 16))
+        self.assertEqual(self.ft[::-1], self.rows[::-1])
+        self.assertEqual(self.ft[-2:-1200:-7], self.rows[-2:-1200:-7])
+        self.assertEqual(self.ft[-1000], self.rows[-1000])
+        self.assertEqual(self.ft.get_last_row(), {KEY_IDX: 1499, **self.rows[-1]})
+
+    def test_shrink(self):
+        popped = self.ft.shrink(1200)
+        self.assertEqual([row[KEY_IDX] for row in popped], list(range(1499, 299, -1)))
+        self.assertEqual(len(self.ft), 300)
+        self.assertEqual(self.ft[:], self.rows[:300])
+        self.assertEqual(self.ft.shrink(0), [])
+        self.assertEqual(len(self.ft), 300)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
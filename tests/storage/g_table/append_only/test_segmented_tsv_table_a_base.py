@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gatling.storage.g_table.append_only.real_segmented_tsv_table import SegmentedTSVTable, MANIFEST_NAME
+from gatling.storage.g_table.append_only.real_tsv_table import KEY_IDX
+from gatling.storage.g_table.append_only.real_zst_table import ZSTTable
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys, const_keys_extra, rows2cols
+
+
+class TestSegmentedTSVTable(SubTestCase):
+    """Unit tests for the rolling segmented table."""
+
+    def setUp(self):
+        self.slices = [slice(None), slice(3, 17), slice(2, 20, 3), slice(None, None, -1), slice(18, 1, -4), slice(7, 8), slice(5, 5)]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dpath = os.path.join(self.temp_dir.name, "seg_table")
+        self.ft = SegmentedTSVTable(self.dpath, max_rows=4).create(tabledefine=ConstTestSchema)
+
+    def subTearDown(self):
+        self.ft.wait_archive()
+        self.temp_dir.cleanup()
+
+    def test_create_drop(self):
+        with self.subTestCase():
+            self.assertTrue(self.ft.exists())
+            self.assertTrue(os.path.exists(os.path.join(self.dpath, MANIFEST_NAME)))
+            self.assertEqual(self.ft.keys(), const_keys_extra)
+            self.assertEqual(len(self.ft), 0)
+            self.ft.drop()
+            self.assertFalse(self.ft.exists())
+            with self.assertRaises(FileNotFoundError):
+                self.ft.append(rand_row())
+
+    def test_roll_rows(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(10)]
+            self.ft.extend(rows[:3]).append(rows[3]).extend(rows[4:])
+            segs = self.ft.segments()
+            self.assertEqual([(s['start'], s['nrows']) for s in segs], [(0, 4), (4, 4), (8, 2)])
+            self.assertEqual(len(self.ft), 10)
+            self.assertEqual(self.ft[:], rows)
+
+    def test_roll_bytes(self):
+        with self.subTestCase():
+            ft = SegmentedTSVTable(self.dpath, max_rows=1000, max_bytes=1).create(tabledefine=ConstTestSchema)
+            rows = [rand_row() for _ in range(3)]
+            ft.extend(rows[:2]).append(rows[2])
+            self.assertEqual([s['nrows'] for s in ft.segments()], [1, 1, 1])
+            self.assertEqual(ft[:], rows)
+
+    def test_roll_bytes_extend(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(30)]
+            one = SegmentedTSVTable(self.dpath + '_one', max_rows=1000, max_bytes=2000).create(tabledefine=ConstTestSchema)
+            for row in rows:
+                one.append(row)
+            ft = SegmentedTSVTable(self.dpath, max_rows=1000, max_bytes=2000).create(tabledefine=ConstTestSchema)
+            ft.extend(rows[:7]).extend(rows[7:])
+            self.assertGreater(len(ft.segments()), 2)
+            self.assertEqual(ft.segments(), one.segments())
+            self.assertEqual(ft[:], rows)
+
+    def test_getitem(self):
+        for archived in [False, True]:
+            with self.subTestCase(archived=archived):
+                rows = [rand_row() for _ in range(19)]
+                self.ft.extend(rows)
+                if archived:
+                    self.assertEqual(self.ft.archive(), 4)
+                    self.assertEqual([s['kind'] for s in self.ft.segments()], ['zst'] * 4 + ['tsv'])
+                rows_extra = [{KEY_IDX: i, **row} for i, row in enumerate(rows)]
+                for sl in self.slices:
+                    self.assertEqual(self.ft[sl], rows[sl])
+                    self.assertEqual(self.ft[sl, const_keys_extra], rows_extra[sl])
+                    self.assertEqual(self.ft.cols(idxs=sl), rows2cols(rows[sl], const_keys))
+                for i in [0, 3, 4, 11, 18, -1, -19]:
+                    self.assertEqual(self.ft[i], rows[i])
+                    self.assertEqual(self.ft[i, [KEY_IDX]], {KEY_IDX: i % 19})
+                with self.assertRaises(IndexError):
+                    _ = self.ft[19]
+
+    def test_pop_shrink(self):
+        for archived in [False, True]:
+            with self.subTestCase(archived=archived):
+                rows = [rand_row() for _ in range(10)]
+                self.ft.extend(rows)
+                if archived:
+                    self.ft.archive()
+                self.assertEqual(self.ft.pop(), {KEY_IDX: 9, **rows[9]})
+                popped = self.ft.shrink(5)
+                self.assertEqual([r[KEY_IDX] for r in popped], [8, 7, 6, 5, 4])
+                self.assertEqual(len(self.ft), 4)
+                self.assertEqual(len(self.ft.segments()), 1)
+                self.ft.extend(rows[4:6])
+                self.assertEqual(self.ft[:], rows[:6])
+                self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: 5})
+                self.assertEqual(len(self.ft.shrink(100)), 6)
+                self.assertEqual(self.ft.pop(), {})
+
+    def test_truncate(self):
+        with self.subTestCase():
+            self.ft.extend([rand_row() for _ in range(9)])
+            self.ft.truncate()
+            self.assertEqual(len(self.ft), 0)
+            self.assertEqual(len(self.ft.segments()), 1)
+            row = rand_row()
+            self.ft.append(row)
+            self.assertEqual(self.ft[:], [row])
+
+    def test_reopen(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(9)]
+            self.ft.extend(rows).archive()
+            ft = SegmentedTSVTable(self.dpath, max_rows=4)
+            self.assertEqual(ft[:], rows)
+            self.assertEqual(len(ft), 9)
+
+    def test_auto_archive(self):
+        with self.subTestCase():
+            ft = SegmentedTSVTable(self.dpath, max_rows=3, auto_archive=True).create(tabledefine=ConstTestSchema)
+            rows = [rand_row() for _ in range(20)]
+            for row in rows:
+                ft.append(row)
+            ft.wait_archive()
+            ft.archive()
+            self.assertEqual([s['kind'] for s in ft.segments()], ['zst'] * 6 + ['tsv'])
+            self.assertEqual(ft[:], rows)
+            names = set(os.listdir(self.dpath))
+            self.assertFalse(any(name.endswith('.tsv') for name in names if name != ft.segments()[-1]['name']))
+
+    def test_archive_error(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(9)]
+            self.ft.extend(rows)
+            with mock.patch.object(ZSTTable, 'extend', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    self.ft.archive()
+            self.assertEqual([s['kind'] for s in self.ft.segments()], ['tsv'] * 3)
+            self.assertEqual(sorted(os.listdir(self.dpath)), sorted([MANIFEST_NAME, *(s['name'] for s in self.ft.segments())]))
+            self.assertEqual(self.ft.archive(), 2)
+            self.assertEqual(self.ft[:], rows)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX
+from gatling.utility.error_tools import FileAlreadyOpenedError, FileNotOpenError
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row
+
+
+class TestTSVTableWriter(SubTestCase):
+    """Unit tests for the buffered group-commit writer."""
+
+    def setUp(self):
+        self.durabilities = ['buffer', 'fsync', 'async']
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_nofile(self):
+        with self.subTestCase():
+            self.ft.drop()
+            with self.assertRaises(FileNotFoundError):
+                self.ft.writer().open()
+
+    def test_not_opened(self):
+        with self.subTestCase():
+            w = self.ft.writer()
+            with self.assertRaises(FileNotOpenError):
+                w.append(rand_row())
+            with self.assertRaises(FileNotOpenError):
+                w.close()
+
+    def test_conflicts(self):
+        with self.subTestCase():
+            with self.ft:
+                with self.assertRaises(FileAlreadyOpenedError):
+                    self.ft.writer().open()
+            with self.ft.writer() as w:
+                with self.assertRaises(FileAlreadyOpenedError):
+                    w.open()
+
+    def test_invalid_durability(self):
+        with self.subTestCase():
+            with self.assertRaises(ValueError):
+                self.ft.writer(durability='never')
+
+    def test_roundtrip(self):
+        for durability in self.durabilities:
+            with self.subTestCase(durability=durability):
+                head = [rand_row() for _ in range(3)]
+                self.ft.extend(head)
+                rows = [rand_row() for _ in range(10)]
+                with self.ft.writer(max_rows=4, durability=durability) as w:
+                    w.append(rows[0]).extend(rows[1:])
+                    w.extend([])
+                    self.assertEqual(len(w), 13)
+                self.assertEqual(self.ft[:], head + rows)
+                self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: 12})
+
+    def test_flush_on_rows(self):
+        with self.subTestCase():
+            with self.ft.writer(max_rows=3, max_delay=None) as w:
+                w.extend([rand_row(), rand_row()])
+                self.assertEqual(w.pending(), 2)
+                self.assertEqual(len(self.ft), 0)
+                w.append(rand_row())
+                self.assertEqual(w.pending(), 0)
+                self.assertEqual(len(self.ft), 3)
+                w.append(rand_row())
+                w.flush()
+                self.assertEqual(len(self.ft), 4)
+
+    def test_flush_on_bytes(self):
+        with self.subTestCase():
+            with self.ft.writer(max_rows=1000, max_bytes=1, max_delay=None) as w:
+                w.append(rand_row())
+                self.assertEqual(w.pending(), 0)
+                self.assertEqual(len(self.ft), 1)
+
+    def test_flush_on_delay(self):
+        with self.subTestCase():
+            with self.ft.writer(max_rows=1000, max_delay=0.05) as w:
+                w.append(rand_row())
+                deadline = time.monotonic() + 5
+                while w.pending() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(w.pending(), 0)
+                self.assertEqual(len(self.ft), 1)
+
+    def test_extend_all_or_nothing(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(3)]
+            bad = {k: v for k, v in rand_row().items() if k != next(iter(rows[0]))}
+            with self.ft.writer(max_rows=1000, max_delay=None) as w:
+                w.append(rows[0])
+                with self.assertRaises(KeyError):
+                    w.extend([rows[1], bad])
+                self.assertEqual((w.pending(), len(w)), (1, 1))
+                w.extend(rows[1:])
+            self.assertEqual(self.ft[:], rows)
+
+    def test_background_error(self):
+        with self.subTestCase():
+            class BrokenFile:
+                """Writes half of what it is given, then fails, while broken."""
+
+                def __init__(self, file):
+                    self.file, self.broken = file, True
+
+                @property
+                def raw(self):
+                    return self
+
+                def write(self, data):
+                    if self.broken:
+                        self.file.raw.write(data[:len(data) // 2])
+                        raise OSError('disk full')
+                    return self.file.raw.write(data)
+
+                def __getattr__(self, name):
+                    return getattr(self.file, name)
+
+            rows = [rand_row() for _ in range(3)]
+            w = self.ft.writer(max_rows=1000, max_delay=0.01).open()
+            broken = w.state.file = BrokenFile(w.state.file)
+            w.append(rows[0])
+            deadline = time.monotonic() + 5
+            while w._error is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            with self.assertRaises(OSError):
+                w.append(rows[1])
+            self.assertEqual(w.pending(), 1)  # the failed rows stay pending
+
+            broken.broken = False
+            w.append(rows[1])
+            deadline = time.monotonic() + 5
+            while w.pending() and time.monotonic() < deadline:  # the background thread is still running
+                time.sleep(0.01)
+            self.assertEqual(w.pending(), 0)
+            broken.broken = True
+            w.append(rows[2])
+            with self.assertRaises(OSError):
+                w.close()  # the pending row cannot be written: the writer stays open
+            broken.broken = False
+            w.close()
+            self.assertEqual(self.ft[:], rows)
+
+    def test_concurrent_appenders(self):
+        for durability in self.durabilities:
+            with self.subTestCase(durability=durability):
+                n_thread, n_row = 8, 50
+
+                def work(w):
+                    for _ in range(n_row):
+                        w.append(rand_row())
+
+                with self.ft.writer(max_rows=16, max_delay=0.01, durability=durability) as w:
+                    threads = [threading.Thread(target=work, args=(w,)) for _ in range(n_thread)]
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                self.assertEqual(len(self.ft), n_thread * n_row)
+                self.assertEqual(self.ft.cols([KEY_IDX])[KEY_IDX], list(range(n_thread * n_row)))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gatling.define.tabledefine import TableDefine, Field
+from gatling.storage.g_table.append_only.help_tools.meta_cache import FileMetaCache, stat_key
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, TSV_META_CACHE, KEY_IDX, row2sent
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys_extra, const_key2type_extra
+
+
+class TestFileMetaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.temp_dir.name, "a.txt")
+        with open(self.fpath, 'wb') as f:
+            f.write(b'x')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit_and_invalidate(self):
+        cache = FileMetaCache()
+        cache.put(self.fpath, stat_key(self.fpath), 'meta')
+        self.assertEqual(cache.get(self.fpath, stat_key(self.fpath)), 'meta')
+        with open(self.fpath, 'ab') as f:
+            f.write(b'y')
+        self.assertIsNone(cache.get(self.fpath, stat_key(self.fpath)))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru(self):
+        cache = FileMetaCache(maxsize=2)
+        for name in ['a', 'b', 'c']:
+            cache.put(name, (1, 1, 1), name)
+        self.assertIsNone(cache.get('a', (1, 1, 1)))
+        self.assertEqual(cache.get('c', (1, 1, 1)), 'c')
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            stat_key(self.fpath + '.nope')
+
+
+class TestTSVTableMetaCache(SubTestCase):
+    """The metadata cache must serve repeated calls and never go stale."""
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_repeated_len_does_not_read(self):
+        with self.subTestCase():
+            self.ft.extend([rand_row() for _ in range(3)])
+            TSV_META_CACHE.pop(self.test_fname)
+            with mock.patch.object(TSVTable, 'get_last_row', wraps=self.ft.get_last_row) as spy:
+                for _ in range(5):
+                    self.assertEqual(len(self.ft), 3)
+                    self.assertEqual(self.ft.keys(), const_keys_extra)
+                self.assertEqual(spy.call_count, 1)
+
+    def test_writes_keep_cache_exact(self):
+        with self.subTestCase():
+            with mock.patch.object(TSVTable, 'get_last_row', wraps=self.ft.get_last_row) as spy:
+                self.ft.append(rand_row()).extend([rand_row(), rand_row()])
+                self.assertEqual(len(self.ft), 3)
+                self.assertEqual(self.ft.pop()[KEY_IDX], 2)
+                self.assertEqual(len(self.ft), 2)
+                self.assertEqual(len(self.ft.shrink(5)), 2)
+                self.assertEqual(len(self.ft), 0)
+                self.assertEqual(spy.call_count, 0)
+
+    def test_ctxt_pop_shrink_counts(self):
+        with self.subTestCase():
+            self.ft.extend([rand_row() for _ in range(5)])
+            with self.ft:
+                self.ft.pop()
+                self.assertEqual(len(self.ft), 4)
+                self.ft.shrink(2)
+                self.assertEqual(len(self.ft), 2)
+                self.ft.append(rand_row())
+            self.assertEqual(len(self.ft), 3)
+            self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: 2})
+
+    def test_external_append_invalidates(self):
+        with self.subTestCase():
+            self.ft.extend([rand_row()])
+            self.assertEqual(len(self.ft), 1)
+            with open(self.test_fname, 'ab') as f:
+                f.write(row2sent({KEY_IDX: 1, **rand_row()}, const_key2type_extra).encode() + b'\n')
+            self.assertEqual(len(self.ft), 2)
+
+    def test_recreate_invalidates(self):
+        with self.subTestCase():
+            self.ft.extend([rand_row()])
+            self.assertEqual(len(self.ft), 1)
+            other = TableDefine('OtherSchema', {'x': Field(int)})
+            self.ft.create(tabledefine=other)
+            self.assertEqual(self.ft.keys(), [KEY_IDX, 'x'])
+            self.assertEqual(len(self.ft), 0)
+            self.ft.drop()
+            with self.assertRaises(FileNotFoundError):
+                len(self.ft)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,186 @@
+import datetime
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from gatling.define.tabledefine import TableDefine, Field
+from gatling.storage.g_table.append_only.help_tools.index_tools import index_fpath, load_index
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX
+from gatling.utility.error_tools import FileAlreadyOpenedError
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row
+
+IndexSchema = TableDefine('IndexSchema', {
+    'name': Field(str, index=True),
+    'level': Field(int, index=True),
+    'day': Field(datetime.date, index=True),
+    'note': Field(str),
+})
+
+names = ['ann', 'bob', 'cat']
+
+
+def make_row(i):
+    return {'name': names[i % 3], 'level': i % 4, 'day': datetime.date(2024, 1, 1 + i % 5), 'note': f'n{i}'}
+
+
+def shrink_then_extend(fpath, n, rows):
+    TSVTable(fpath).shrink(n)
+    TSVTable(fpath).extend(rows)
+
+
+def scan(rows, **where):
+    return [{KEY_IDX: i, **row} for i, row in enumerate(rows) if all(row[k] == v for k, v in where.items())]
+
+
+class TestTSVTableIndex(SubTestCase):
+    """Secondary indexes must agree with a full scan after every kind of write."""
+
+    def setUp(self):
+        self.preruns = [
+            lambda: None,
+            lambda: self.ft.extend([make_row(i) for i in range(20)]),
+        ]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=IndexSchema)
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def assertMatchesScan(self, **where):
+        expected = scan(self.ft.rows(keys=list(IndexSchema.keys())), **where)
+        self.assertEqual(self.ft.find(keys=[KEY_IDX, *IndexSchema.keys()], **where), expected)
+
+    def test_files(self):
+        with self.subTestCase():
+            self.assertEqual(self.ft.index_keys(), ['name', 'level', 'day'])
+            for key in ['name', 'level', 'day']:
+                self.assertTrue(os.path.exists(index_fpath(self.test_fname, key)))
+            self.assertFalse(os.path.exists(index_fpath(self.test_fname, 'note')))
+            self.ft.drop()
+            self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_find(self):
+        for i, prerun in enumerate(self.preruns):
+            with self.subTestCase(prerun=i):
+                prerun()
+                self.ft.append(make_row(20))
+                for name in names + ['nobody']:
+                    self.assertMatchesScan(name=name)
+                self.assertMatchesScan(name='bob', level=1)
+                self.assertMatchesScan(day=datetime.date(2024, 1, 3), level=2)
+                self.assertEqual(self.ft.find({'name': 'cat'}, keys=['note'])[-1], {'note': 'n20'})
+                self.assertEqual(self.ft.find(level=1.0), self.ft.find(level=1))
+                self.assertEqual(self.ft.find(level=1.5), [])
+
+    def test_find_errors(self):
+        with self.subTestCase():
+            with self.assertRaises(ValueError):
+                self.ft.find()
+            with self.assertRaises(KeyError):
+                self.ft.find(note='n0')
+
+    def test_ctxt(self):
+        for i, prerun in enumerate(self.preruns):
+            with self.subTestCase(prerun=i):
+                prerun()
+                with self.ft:
+                    self.ft.extend([make_row(i) for i in range(7)])
+                    self.ft.append(make_row(7))
+                    self.assertMatchesScan(name='cat')
+                    self.ft.pop()
+                    self.ft.shrink(3)
+                    self.assertMatchesScan(name='cat')
+                    self.assertMatchesScan(level=0)
+                self.assertMatchesScan(name='bob')
+
+    def test_pop_shrink_truncate(self):
+        for i, prerun in enumerate(self.preruns):
+            with self.subTestCase(prerun=i):
+                prerun()
+                self.ft.extend([make_row(i) for i in range(10)])
+                self.ft.pop()
+                self.assertMatchesScan(name='ann')
+                self.ft.shrink(4)
+                self.assertMatchesScan(name='ann')
+                self.ft.extend([make_row(i) for i in range(3)])
+                self.assertMatchesScan(name='ann')
+                self.ft.truncate()
+                self.assertEqual(self.ft.find(name='ann'), [])
+                self.ft.append(make_row(0))
+                self.assertMatchesScan(name='ann')
+
+    def test_writer(self):
+        for i, prerun in enumerate(self.preruns):
+            with self.subTestCase(prerun=i):
+                prerun()
+                with self.ft.writer(max_rows=3, max_delay=None) as w:
+                    w.extend([make_row(i) for i in range(10)])
+                self.assertMatchesScan(name='bob')
+                self.assertMatchesScan(level=3)
+
+    def test_incremental_load(self):
+        with self.subTestCase():
+            self.ft.extend([make_row(i) for i in range(5)])
+            value2locs = load_index(index_fpath(self.test_fname, 'name'))
+            self.ft.extend([make_row(i) for i in range(5, 8)])
+            self.assertIs(load_index(index_fpath(self.test_fname, 'name')), value2locs)  # extended, not re-read
+            self.assertEqual([idx for idx, _ in value2locs[b'bob']], [1, 4, 7])
+            self.ft.shrink(2)
+            self.assertEqual([idx for idx, _ in load_index(index_fpath(self.test_fname, 'name'))[b'bob']], [1, 4])
+            # rewritten in place (same inode): the last parsed line no longer matches, so it is re-read
+            fpath_idx = index_fpath(self.test_fname, 'name')
+            with open(fpath_idx, 'rb') as f:
+                lines = f.read().splitlines(keepends=True)
+            with open(fpath_idx, 'r+b') as f:
+                f.write(b''.join(lines[:-1]) + lines[-1].replace(b'cat', b'cow') + lines[0])
+            value2locs = load_index(fpath_idx)
+            self.assertEqual([[idx for idx, _ in value2locs[name]] for name in [b'cat', b'cow']], [[2], [5]])
+
+    def test_shrink_in_other_process(self):
+        with self.subTestCase():
+            self.ft.extend([make_row(i) for i in range(10)])
+            self.assertMatchesScan(name='bob')
+            rows = [{**make_row(i), 'name': name} for i, name in enumerate(['cat', 'annabel', 'bo'])]
+            proc = multiprocessing.Process(target=shrink_then_extend, args=(self.test_fname, 2, rows))
+            proc.start()
+            proc.join()
+            self.assertEqual(proc.exitcode, 0)
+            for name in names + ['annabel', 'bo']:
+                self.assertMatchesScan(name=name)
+
+    def test_index_from_other_instance(self):
+        with self.subTestCase():
+            other = TSVTable(self.test_fname)
+            self.assertEqual(other.index_keys(), ['name', 'level', 'day'])
+            self.ft.drop_index('level')
+            self.ft.create_index('note')
+            self.assertEqual(other.index_keys(), ['name', 'day', 'note'])
+            other.extend([make_row(i) for i in range(4)])
+            self.assertEqual(self.ft.find(note='n3', keys=['name']), [{'name': 'ann'}])
+
+    def test_create_index(self):
+        with self.subTestCase():
+            ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+            rows = [rand_row() for _ in range(10)]
+            ft.extend(rows)
+            with ft:
+                with self.assertRaises(FileAlreadyOpenedError):
+                    ft.create_index('account')
+            with self.assertRaises(KeyError):
+                ft.create_index('nope')
+            ft.create_index('account').create_index('birthday')
+            self.assertEqual(ft.index_keys(), ['account', 'birthday'])
+            for row in rows:
+                self.assertIn(row, ft.find(account=row['account']))
+                self.assertIn(row, ft.find(birthday=row['birthday']))
+            ft.drop_index('birthday')
+            self.assertEqual(ft.index_keys(), ['account'])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
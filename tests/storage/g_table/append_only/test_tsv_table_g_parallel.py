@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.help_tools.parallel_tools import split_ranges, read_range
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys, rows2cols
+
+
+class TestSplitRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.fpath = os.path.join(self.temp_dir.name, "lines.txt")
+        self.lines = [f"line{i}".encode() * (i % 7 + 1) for i in range(100)]
+        with open(self.fpath, 'wb') as f:
+            f.write(b'\n'.join(self.lines) + b'\n')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cover_in_order(self):
+        end = os.path.getsize(self.fpath)
+        for n in [1, 2, 3, 8, 64, 1000]:
+            ranges = split_ranges(self.fpath, 0, end, n)
+            self.assertLessEqual(len(ranges), n)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], end)
+            lines = [line for start, stop in ranges for line in read_range(self.fpath, start, stop)]
+            self.assertEqual(lines, self.lines)
+
+    def test_empty(self):
+        self.assertEqual(split_ranges(self.fpath, 10, 10, 4), [])
+
+
+class TestTSVTableParallel(SubTestCase):
+    """scan() and cols(workers=...) must agree with the serial readers."""
+
+    def setUp(self):
+        self.workers = [1, 2]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_empty(self):
+        for workers in self.workers:
+            with self.subTestCase(workers=workers):
+                self.assertEqual(self.ft.scan(len, workers=workers), [])
+                self.assertEqual(self.ft.cols(workers=workers), {key: [] for key in const_keys})
+
+    def test_cols(self):
+        for workers in self.workers:
+            with self.subTestCase(workers=workers):
+                rows = [rand_row() for _ in range(50)]
+                self.ft.extend(rows)
+                self.assertEqual(self.ft.cols(workers=workers), rows2cols(rows, const_keys))
+                self.assertEqual(self.ft.cols([KEY_IDX, 'level'], workers=workers), self.ft.cols([KEY_IDX, 'level']))
+                self.assertEqual(self.ft.cols('level', idxs=slice(2, 5), workers=workers), self.ft.cols('level', idxs=slice(2, 5)))
+                self.assertEqual(self.ft.cols(['level'], idxs=-1, workers=workers), self.ft.cols(['level'], idxs=-1))
+
+    def test_scan(self):
+        for workers in self.workers:
+            with self.subTestCase(workers=workers):
+                rows = [rand_row() for _ in range(50)]
+                self.ft.extend(rows)
+                self.assertEqual(sum(self.ft.scan(len, workers=workers)), 50)
+                total = sum(self.ft.scan(lambda part: sum(r['level'] for r in part), workers=workers, keys=['level']))
+                self.assertEqual(total, sum(r['level'] for r in rows))
+                active = [r for part in self.ft.scan(lambda part: [r for r in part if r['is_active']], workers=workers) for r in part]
+                self.assertEqual(active, [r for r in rows if r['is_active']])
+
+    def test_ctxt(self):
+        for workers in self.workers:
+            with self.subTestCase(workers=workers):
+                rows = [rand_row() for _ in range(20)]
+                with self.ft:
+                    self.ft.extend(rows)
+                    self.assertEqual(self.ft.cols(workers=workers), rows2cols(rows, const_keys))
+                    self.assertEqual(sum(self.ft.scan(len, workers=workers)), 20)
+
+    def test_invalid_workers(self):
+        with self.subTestCase():
+            with self.assertRaises(ValueError):
+                self.ft.scan(len, workers=0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
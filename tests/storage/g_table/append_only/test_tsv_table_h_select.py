@@ -0,0 +1,98 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys, filterbykeys
+
+
+class TestTSVTableSelect(SubTestCase):
+    """select() must agree with filtering the fully decoded rows."""
+
+    def setUp(self):
+        self.wheres = [
+            (None, lambda r: True),
+            ({'is_active': True}, lambda r: r['is_active']),
+            ({'level': {'$gte': 100, '$lt': 200}}, lambda r: 100 <= r['level'] < 200),
+            ({'level': {'$between': (50, 60)}}, lambda r: 50 <= r['level'] <= 60),
+            ({'level': {'$in': [1, 2, 3, 250]}}, lambda r: r['level'] in (1, 2, 3, 250)),
+            ({'level': {'$nin': [1, 2, 3]}, 'is_active': {'$ne': True}}, lambda r: r['level'] not in (1, 2, 3) and not r['is_active']),
+            ({'account': {'$gt': 'm'}}, lambda r: r['account'] > 'm'),
+            ({'nickname_zh': {'$lte': '张'}}, lambda r: r['nickname_zh'] <= '张'),
+            ({'price': {'$lt': 0.5}}, lambda r: r['price'] < 0.5),
+            ({'birthday': {'$gte': datetime.date(2000, 1, 1)}}, lambda r: r['birthday'] >= datetime.date(2000, 1, 1)),
+            ({'created_at': {'$lt': datetime.datetime(2010, 1, 1)}}, lambda r: r['created_at'] < datetime.datetime(2010, 1, 1)),
+        ]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+        self.rows = [rand_row() for _ in range(200)]
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_empty(self):
+        with self.subTestCase():
+            self.assertEqual(self.ft.select(), [])
+            self.assertEqual(self.ft.select({'level': 3}), [])
+
+    def test_where(self):
+        for i, (where, pred) in enumerate(self.wheres):
+            with self.subTestCase(where=i):
+                self.ft.extend(self.rows)
+                self.assertEqual(self.ft.select(where), [r for r in self.rows if pred(r)])
+
+    def test_equality(self):
+        with self.subTestCase():
+            self.ft.extend(self.rows)
+            target = self.rows[17]
+            for key in const_keys:
+                if key == 'threshold_inf':
+                    continue
+                self.assertIn(target, self.ft.select({key: target[key]}))
+            self.assertEqual(self.ft.select({'level': target['level'], 'account': target['account']}, keys=[KEY_IDX])[0], {KEY_IDX: 17})
+
+    def test_equality_coerces(self):
+        with self.subTestCase():
+            rows = [{**rand_row(), 'level': i % 3, 'price': float(i % 2), 'is_active': i % 2 == 0} for i in range(6)]
+            self.ft.extend(rows)
+            self.assertEqual(self.ft.select({'price': 1}), [r for r in rows if r['price'] == 1.0])
+            self.assertEqual(self.ft.select({'level': True}), [r for r in rows if r['level'] == 1])
+            self.assertEqual(self.ft.select({'level': 2.0}), [r for r in rows if r['level'] == 2])
+            self.assertEqual(self.ft.select({'level': 1.5}), [])
+            self.assertEqual(self.ft.select({'level': {'$ne': 1.5}}), rows)
+            self.assertEqual(self.ft.select({'is_active': 1}), [r for r in rows if r['is_active']])
+            self.assertEqual(self.ft.select({'level': {'$in': [0.0, 1.5]}}), [r for r in rows if r['level'] == 0])
+
+    def test_keys_limit(self):
+        with self.subTestCase():
+            self.ft.extend(self.rows)
+            keys = ['level', 'account']
+            expected = [filterbykeys(r, keys) for r in self.rows if r['level'] >= 128]
+            self.assertEqual(self.ft.select({'level': {'$gte': 128}}, keys=keys), expected)
+            self.assertEqual(self.ft.select({'level': {'$gte': 128}}, keys=keys, limit=3), expected[:3])
+            self.assertEqual(self.ft.select(keys='level', limit=0), [])
+            self.assertEqual(self.ft.select(keys=[KEY_IDX], limit=2), [{KEY_IDX: 0}, {KEY_IDX: 1}])
+
+    def test_ctxt(self):
+        with self.subTestCase():
+            with self.ft:
+                self.ft.extend(self.rows)
+                self.assertEqual(self.ft.select({'is_active': False}), [r for r in self.rows if not r['is_active']])
+                self.ft.shrink(100)
+                self.assertEqual(self.ft.select({'is_active': False}), [r for r in self.rows[:100] if not r['is_active']])
+
+    def test_errors(self):
+        with self.subTestCase():
+            with self.assertRaises(KeyError):
+                self.ft.select({'nope': 1})
+            with self.assertRaises(ValueError):
+                self.ft.select({'level': {'$regex': 'x'}})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from gatling.storage.g_table.append_only.help_tools.lock_tools import fcntl
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable, KEY_IDX, row2sent
+from gatling.utility.error_tools import FileAlreadyOpenedForWriteError
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_key2type_extra
+
+
+class TestTSVTableSnapshot(SubTestCase):
+    """Readers see a pinned, complete prefix of the table while a writer appends."""
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+        self.rows = [rand_row() for _ in range(8)]
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_snapshot_pins(self):
+        with self.subTestCase():
+            self.ft.extend(self.rows[:5])
+            writer = TSVTable(self.test_fname)
+            with self.ft.snapshot():
+                writer.extend(self.rows[5:])
+                self.assertEqual(len(self.ft), 5)
+                self.assertEqual(self.ft[:], self.rows[:5])
+                self.assertEqual(self.ft[::-1], self.rows[:5][::-1])
+                self.assertEqual(self.ft[-1], self.rows[4])
+                self.assertEqual(self.ft.cols(['level'], workers=1)['level'], [r['level'] for r in self.rows[:5]])
+            self.assertEqual(len(self.ft), 8)
+            self.assertEqual(self.ft[:], self.rows)
+
+    def test_snapshot_is_read_only_context(self):
+        with self.subTestCase():
+            self.ft.extend(self.rows)
+            with self.ft.snapshot():
+                found = self.ft.select({'level': self.rows[3]['level']}, keys=[KEY_IDX])
+                self.assertIn({KEY_IDX: 3}, found)
+            with self.ft:
+                self.ft.append(rand_row())
+            self.assertEqual(len(self.ft), 9)
+            self.ft.snapshot()  # never entered: must not leave the next context read-only
+            with self.ft:
+                self.ft.append(rand_row())
+            with self.ft.snapshot() as ft:
+                self.assertEqual(len(ft), 10)
+
+    def test_torn_line(self):
+        with self.subTestCase():
+            self.ft.extend(self.rows[:3])
+            sent = row2sent({KEY_IDX: 3, **self.rows[3]}, const_key2type_extra).encode()
+            with open(self.test_fname, 'ab') as f:
+                f.write(sent[:len(sent) // 2])
+            self.assertEqual(len(self.ft), 3)
+            self.assertEqual(self.ft[-1], self.rows[2])
+            with self.ft.snapshot():
+                self.assertEqual(self.ft[::-1], self.rows[:3][::-1])
+            # the next writer drops the torn tail before appending
+            self.ft.append(self.rows[3])
+            self.assertEqual(self.ft[:], self.rows[:4])
+
+    def test_concurrent_reader(self):
+        with self.subTestCase():
+            errors = []
+            stop = threading.Event()
+
+            def read():
+                reader = TSVTable(self.test_fname)
+                while not stop.is_set():
+                    with reader.snapshot():
+                        n = len(reader)
+                        idxs = reader.cols([KEY_IDX])[KEY_IDX]
+                        tail = reader[-1, [KEY_IDX]] if n else None
+                    if idxs != list(range(n)) or (n and tail != {KEY_IDX: n - 1}):
+                        errors.append((n, idxs[-3:], tail))
+
+            thread = threading.Thread(target=read)
+            thread.start()
+            with self.ft.writer(max_rows=3, max_delay=None) as w:
+                for _ in range(60):
+                    w.append(rand_row())
+            stop.set()
+            thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(len(self.ft), 60)
+
+
+@unittest.skipIf(fcntl is None, "advisory file locks need fcntl")
+class TestTSVTableWriterLock(SubTestCase):
+    """Only one writer at a time; readers are never refused."""
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv")
+        self.ft = TSVTable(self.test_fname).create(tabledefine=ConstTestSchema)
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_second_writer_refused(self):
+        with self.subTestCase():
+            other = TSVTable(self.test_fname)
+            with self.ft:
+                self.ft.append(rand_row())
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    other.append(rand_row())
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    other.pop()
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    other.truncate()
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    other.writer().open()
+                self.assertEqual(len(other), 1)
+                with other.snapshot():
+                    self.assertEqual(len(other), 1)
+            other.append(rand_row())
+            self.assertEqual(len(self.ft), 2)
+
+    def test_writer_holds_lock(self):
+        with self.subTestCase():
+            with self.ft.writer(max_delay=None):
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    TSVTable(self.test_fname).append(rand_row())
+            TSVTable(self.test_fname).append(rand_row())
+            self.assertEqual(len(self.ft), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.help_tools.slice_tools import Slice
+from gatling.storage.g_table.append_only.real_zst_table import ZSTTable
+from gatling.storage.g_table.append_only.real_tsv_table import KEY_IDX, TSVTable
+from gatling.utility.error_tools import FileAlreadyOpenedError, FileAlreadyOpenedForWriteError
+from gatling.ztest.subtestcase import SubTestCase
+from storage.g_table.append_only.a_const_test import ConstTestSchema, rand_row, const_keys, const_keys_extra, filterbykeys, rows2cols
+
+s = Slice
+
+
+class TestZSTTable(SubTestCase):
+    """Unit tests for the zstd block-compressed table."""
+
+    def prerun_0row(self):
+        pass
+
+    def prerun_5row_append(self):
+        for _ in range(5):
+            row = rand_row()
+            self.ft.append(row)
+            self.rows.append(row)
+
+    def prerun_7row_extend(self):
+        rows = [rand_row() for _ in range(7)]
+        self.ft.extend(rows[:3]).extend(rows[3:])
+        self.rows.extend(rows)
+
+    def prerun_7row_ctxt(self):
+        rows = [rand_row() for _ in range(7)]
+        with self.ft:
+            self.ft.append(rows[0])
+            self.ft.extend(rows[1:])
+        self.rows.extend(rows)
+
+    def setUp(self):
+        self.preruns = [self.prerun_0row, self.prerun_5row_append, self.prerun_7row_extend, self.prerun_7row_ctxt]
+        self.slices = [s[:], s[:0], s[:1], s[1:4], s[2:], s[-3:], s[::2], s[::-1], s[::-3]]
+
+    def subSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_fname = os.path.join(self.temp_dir.name, "test_table.tsv.zst")
+        self.ft = ZSTTable(self.test_fname, block_rows=3).create(tabledefine=ConstTestSchema)
+        self.rows = []
+
+    def subTearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_nofile(self):
+        with self.subTestCase():
+            self.ft.drop()
+            self.assertFalse(self.ft.exists())
+            self.assertFalse(os.path.exists(self.ft.fpath_idx))
+            with self.assertRaises(FileNotFoundError):
+                len(self.ft)
+            with self.assertRaises(FileNotFoundError):
+                self.ft.append(rand_row())
+            with self.assertRaises(FileNotFoundError):
+                self.ft.extend([])
+
+    def test_keys_len_blocks(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                self.assertEqual(self.ft.keys(), const_keys_extra)
+                self.assertEqual(len(self.ft), len(self.rows))
+                self.assertEqual(self.ft.nblocks(), len(self.rows) // 3)
+
+    def test_index(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                N = len(self.rows)
+                for idx in list(range(N)) + list(range(-N, 0)):
+                    self.assertEqual(self.ft[idx], self.rows[idx])
+                    self.assertEqual(self.ft[idx, const_keys[:2]], filterbykeys(self.rows[idx], const_keys[:2]))
+                for idx in [N, -N - 1]:
+                    with self.assertRaises(IndexError):
+                        _ = self.ft[idx]
+
+    def test_slice(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                for slc in self.slices:
+                    with self.subTest(slc=slc):
+                        self.assertEqual(self.ft[slc], self.rows[slc])
+                        self.assertEqual(self.ft.rows(slc), self.rows[slc])
+                        self.assertEqual(self.ft.cols(None, slc), rows2cols(self.rows[slc], keys=const_keys))
+                        with self.ft:
+                            self.assertEqual(self.ft[slc], self.rows[slc])
+
+    def test_pop_shrink(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                N = len(self.rows)
+                if N == 0:
+                    self.assertEqual(self.ft.pop(), {})
+                    self.assertEqual(self.ft.shrink(2), [])
+                    continue
+                self.assertEqual(self.ft.pop(), {KEY_IDX: N - 1, **self.rows[-1]})
+                self.assertEqual(self.ft.shrink(3), [{KEY_IDX: N - 2 - i, **self.rows[-2 - i]} for i in range(3)])
+                self.assertEqual(len(self.ft), N - 4)
+                self.assertEqual(self.ft[:], self.rows[:N - 4])
+
+                row = rand_row()
+                self.ft.append(row)
+                self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: N - 4})
+                self.assertEqual(self.ft[:], self.rows[:N - 4] + [row])
+
+    def test_truncate(self):
+        for prerun in self.preruns:
+            with self.subTestCase(prerun=prerun.__name__):
+                prerun()
+                self.ft.truncate()
+                self.assertEqual(len(self.ft), 0)
+                self.assertEqual(self.ft.nblocks(), 0)
+                self.assertEqual(self.ft.keys(), const_keys_extra)
+
+    def test_ctxt_errors(self):
+        with self.subTestCase():
+            with self.ft:
+                with self.assertRaises(FileAlreadyOpenedError):
+                    self.ft.create(tabledefine=ConstTestSchema)
+                with self.assertRaises(FileAlreadyOpenedForWriteError):
+                    with self.ft:
+                        pass
+
+    def test_tail_appends_leave_blocks(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(5)]
+            self.ft.extend(rows[:3])
+            size = os.path.getsize(self.ft.fpath)
+            self.ft.append(rows[3]).append(rows[4])
+            self.assertEqual(os.path.getsize(self.ft.fpath), size)  # the open block is not recompressed
+            self.assertEqual((self.ft.nblocks(), self.ft[:]), (1, rows))
+
+    def test_crash_recovery(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(5)]
+            self.ft.extend(rows[:2])
+            with open(self.ft.fpath_tail, 'rb') as f:
+                stale_tail = f.read()
+            self.ft.extend(rows[2:4])
+            # crash after the block and its index entry, before the tail was replaced ...
+            with open(self.ft.fpath_tail, 'wb') as f:
+                f.write(stale_tail + stale_tail.splitlines(keepends=True)[0] + b'9\ttorn')
+            # ... and during a later block: a frame without its index entry, half an entry
+            with open(self.ft.fpath, 'ab') as f:
+                f.write(b'garbage')
+            with open(self.ft.fpath_idx, 'ab') as f:
+                f.write(b'\x01\x02')
+            self.assertEqual(self.ft[:], rows[:3])
+            self.ft.append(rows[4])
+            self.assertEqual(self.ft[:], rows[:3] + [rows[4]])
+            self.assertEqual(self.ft[-1, [KEY_IDX]], {KEY_IDX: 3})
+
+    def test_smaller_than_tsv(self):
+        with self.subTestCase():
+            rows = [rand_row() for _ in range(500)]
+            ft = ZSTTable(self.test_fname, block_rows=100).create(tabledefine=ConstTestSchema).extend(rows)
+            ft_tsv = TSVTable(os.path.join(self.temp_dir.name, "test_table.tsv")).create(tabledefine=ConstTestSchema).extend(rows)
+            self.assertLess(os.path.getsize(ft.fpath), os.path.getsize(ft_tsv.fpath))
+            self.assertEqual(ft[:], ft_tsv[:])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -162,6 +162,12 @@ CompositePKSchema = TableDefine('CompositePKSchema', {
     'value':    Field(str),
 })
 
+# --- Schema without a primary key ---
+NoPKSchema = TableDefine('NoPKSchema', {
+    'name':  Field(str),
+    'score': Field(int, default=7),
+})
+
 # --- 3-column schema for multi-column order_by tests ---
 ThreeColSchema = TableDefine('ThreeColSchema', {
     'id':    Field(int, primary=True),
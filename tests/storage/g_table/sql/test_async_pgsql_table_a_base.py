@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+
+from gatling.storage.g_table.sql.real_async_pgsql_table import AsyncPGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_async_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, MinimalSchema, NoPKSchema, PyModeSchema,
+    rand_row_minimal, rand_row_py,
+    reset_counter, skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestAsyncPGSQLTable(unittest.IsolatedAsyncioTestCase):
+    """CRUD, transactions and concurrency on AsyncConnectionPool."""
+
+    async def asyncSetUp(self):
+        reset_counter()
+        self.pool = await create_async_pool(CONNINFO, max_size=4)
+        self.ft = AsyncPGSQLTable("test_async_pgsql", self.pool)
+        await self.ft.drop()
+        await self.ft.create(MinimalSchema)
+
+    async def asyncTearDown(self):
+        await self.ft.drop()
+        await self.pool.close()
+
+    async def test_lifecycle(self):
+        self.assertTrue(await self.ft.exists())
+        await self.ft.insert(rand_row_minimal())
+        await self.ft.truncate()
+        self.assertEqual(await self.ft.count(), 0)
+        await self.ft.drop()
+        self.assertFalse(await self.ft.exists())
+
+    async def test_crud(self):
+        rows = [rand_row_minimal() for _ in range(30)]
+        await self.ft.insert(*rows, batch_size=7)
+        self.assertEqual(await self.ft.fetch(order_by={'id': False}), rows)
+        self.assertEqual(await self.ft.fetch(where={'id': 3}), [rows[2]])
+        self.assertGreaterEqual(await self.ft.count(where={'name': rows[0]['name']}), 1)
+        self.assertEqual(await self.ft.update({'name': 'x'}, {'id': 1}), 1)
+        self.assertEqual(await self.ft.delete({'name': 'x'}), 1)
+        self.assertEqual(await self.ft.count(), 29)
+
+    async def test_replace(self):
+        await self.ft.insert({'id': 1, 'name': 'a'})
+        await self.ft.insert({'id': 1, 'name': 'b'}, {'id': 2, 'name': 'c'}, replace=True)
+        self.assertEqual(await self.ft.fetch(order_by={'id': False}), [{'id': 1, 'name': 'b'}, {'id': 2, 'name': 'c'}])
+
+    async def test_replace_duplicates_in_one_call(self):
+        await self.ft.insert({'id': 1, 'name': 'a'}, {'id': 1, 'name': 'b'}, {'id': 2}, replace=True)
+        self.assertEqual(await self.ft.fetch(order_by={'id': False}), [{'id': 1, 'name': 'b'}, {'id': 2, 'name': ''}])
+
+    async def test_many(self):
+        await self.ft.insert(*[{'id': i, 'name': str(i)} for i in range(1, 11)])
+        got = await self.ft.fetch_many([3, 1, 3, 99], keys=['name'])
+        self.assertEqual(got, {1: {'name': '1'}, 3: {'name': '3'}})
+        self.assertEqual(await self.ft.update_many({'name': 'x'}, [1, 2, 2]), 2)
+        self.assertEqual(await self.ft.count({'name': 'x'}), 2)
+        self.assertEqual(await self.ft.delete_many(range(1, 6), batch_size=2), 5)
+        self.assertEqual(await self.ft.count(), 5)
+
+    async def test_no_primary_key(self):
+        ft = AsyncPGSQLTable("test_async_pgsql_nopk", self.pool)
+        await ft.drop()
+        await ft.create(NoPKSchema)
+        try:
+            await ft.insert({'name': 'a'}, {'name': 'a', 'score': 1}, replace=True)
+            self.assertEqual(await ft.count(), 2)
+            for call in (ft.fetch_many([1]), ft.update_many({'score': 1}, [1]), ft.delete_many([1])):
+                with self.assertRaises(ValueError):
+                    await call
+        finally:
+            await ft.drop()
+
+    async def test_iter_fetch(self):
+        rows = [rand_row_minimal() for _ in range(25)]
+        await self.ft.insert(*rows)
+        chunks = [c async for c in self.ft.iter_fetch(order_by={'id': False}, chunk_size=10)]
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        self.assertEqual([r for c in chunks for r in c], rows)
+
+    async def test_aggregate(self):
+        await self.ft.insert(*[{'id': i, 'name': 'ab'[i % 2]} for i in range(9)])
+        got = await self.ft.aggregate(group_by=['name'], metrics={'n': 'count', 'top': ('max', 'id')}, order_by={'name': False})
+        self.assertEqual(got, [{'name': 'a', 'n': 5, 'top': 8}, {'name': 'b', 'n': 4, 'top': 7}])
+
+    async def test_transaction_rollback(self):
+        with self.assertRaises(RuntimeError):
+            async with self.ft:
+                await self.ft.insert(rand_row_minimal())
+                raise RuntimeError
+        self.assertEqual(await self.ft.count(), 0)
+
+    async def test_concurrent_transactions_are_isolated(self):
+        async def work(i):
+            async with self.ft:
+                await self.ft.insert({'id': i, 'name': f'n{i}'})
+                await asyncio.sleep(0)
+                if i % 2:
+                    raise RuntimeError
+
+        results = await asyncio.gather(*[work(i) for i in range(20)], return_exceptions=True)
+        self.assertEqual(sum(isinstance(r, RuntimeError) for r in results), 10)
+        self.assertEqual([r['id'] for r in await self.ft.fetch(order_by={'id': False})], list(range(0, 20, 2)))
+
+    async def test_many_coroutines_small_pool(self):
+        await asyncio.gather(*[self.ft.insert({'id': i, 'name': f'n{i}'}) for i in range(300)])
+        counts = await asyncio.gather(*[self.ft.count(where={'id': i}) for i in range(300)])
+        self.assertEqual(counts, [1] * 300)
+
+    async def test_py_types(self):
+        await self.ft.drop()
+        ft = AsyncPGSQLTable("test_async_pgsql", self.pool)
+        await ft.create(PyModeSchema)
+        rows = [rand_row_py() for _ in range(10)]
+        await ft.insert(*rows)
+        self.assertEqual(await ft.fetch(order_by={'id': False}), rows)
+        self.ft = ft
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
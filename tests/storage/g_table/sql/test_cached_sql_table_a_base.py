@@ -0,0 +1,212 @@
+import os
+import tempfile
+import time
+import unittest
+
+from gatling.storage.g_table.sql.real_cached_sql_table import CachedSQLTable, TTLCache
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    ThreeColSchema, CompositePKSchema,
+)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru(self):
+        c = TTLCache(maxsize=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        self.assertEqual(c.get('a'), 1)
+        c.set('c', 3)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual((c.get('a'), c.get('c')), (1, 3))
+        self.assertEqual(c.evictions, 1)
+
+    def test_ttl(self):
+        c = TTLCache(maxsize=10, ttl=0.01)
+        c.set('a', 1)
+        self.assertEqual(c.get('a'), 1)
+        time.sleep(0.02)
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(len(c), 0)
+
+    def test_generation(self):
+        c = TTLCache(maxsize=10)
+        generation = c.generation
+        c.discard('b')
+        self.assertFalse(c.set('a', 1, generation))
+        self.assertIsNone(c.get('a'))
+        self.assertTrue(c.set('a', 1, c.generation))
+        self.assertEqual(c.get('a'), 1)
+
+
+class TestCachedSQLTable(unittest.TestCase):
+    """Read-through caching, negative caching and invalidation over a SQLiteTable."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.inner = SQLiteTable("test_sqlite_cached", self.db_path)
+        self.ft = CachedSQLTable(self.inner)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(1, 21)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_point_fetch(self):
+        self.assertEqual(self.ft.fetch({'id': 3}), [self.rows[2]])
+        self.inner.update({'score': 99}, {'id': 3})  # behind the cache's back
+        self.assertEqual(self.ft.fetch({'id': 3}, keys=['score']), [{'score': 3}])
+        stats = self.ft.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_returns_copies(self):
+        self.ft.fetch({'id': 3})[0]['score'] = -1
+        self.assertEqual(self.ft.fetch({'id': 3}), [self.rows[2]])
+
+    def test_negative(self):
+        self.assertEqual(self.ft.fetch({'id': 100}), [])
+        self.assertEqual(self.ft.fetch_many([100, 1]), {1: self.rows[0]})
+        self.assertEqual(self.ft.stats()['negative_hits'], 1)
+        self.ft.insert({'id': 100, 'group': 'c', 'score': 0})
+        self.assertEqual(self.ft.fetch({'id': 100}), [{'id': 100, 'group': 'c', 'score': 0}])
+
+    def test_no_negative(self):
+        ft = CachedSQLTable(self.inner, negative=False)
+        ft.fetch({'id': 100})
+        self.inner.insert({'id': 100, 'group': 'c', 'score': 0})
+        self.assertEqual(len(ft.fetch({'id': 100})), 1)
+
+    def test_fetch_many(self):
+        self.ft.fetch_many([1, 2])
+        got = self.ft.fetch_many([2, 3, 1], keys=['group'])
+        self.assertEqual(got, {2: {'group': 'a'}, 3: {'group': 'b'}, 1: {'group': 'b'}})
+        stats = self.ft.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['rows']), (2, 3, 3))
+
+    def test_query_cache(self):
+        where = {'group': 'a'}
+        self.assertEqual(self.ft.count(where), 10)
+        got = self.ft.fetch(where, order_by={'id': True}, limit=2)
+        self.inner.delete({'id': 20})
+        self.assertEqual(self.ft.count(where), 10)
+        self.assertEqual(self.ft.fetch(where, order_by={'id': True}, limit=2), got)
+        self.assertEqual(self.ft.stats()['queries'], 2)
+
+    def test_operator_where(self):
+        where = {'score': {'$in': [1, 2]}, '$or': [{'group': 'a'}, {'id': {'$lt': 3}}]}
+        got = self.ft.fetch(where)
+        self.assertEqual(self.ft.fetch({'id': {'$in': [1, 2]}}), self.rows[:2])
+        self.assertEqual(self.ft.fetch(where), got)
+        self.assertEqual(self.ft.count({'id': {'$gte': 11}}), 10)
+        self.ft.delete({'id': {'$gte': 11}})
+        self.assertEqual(self.ft.count({'id': {'$gte': 11}}), 0)
+        self.assertEqual(self.ft.stats()['hits'], 1)
+
+    def test_aggregate(self):
+        metrics = {'n': 'count', 'total': ('sum', 'score')}
+        got = self.ft.aggregate(group_by=['group'], metrics=metrics, order_by={'group': False})
+        self.assertEqual(self.ft.aggregate(group_by=['group'], metrics=metrics, order_by={'group': False}), got)
+        self.ft.delete({'id': 1})
+        self.assertEqual(self.ft.aggregate(group_by=['group'], metrics=metrics, order_by={'group': False})[1]['n'], 9)
+        self.assertEqual((self.ft.stats()['hits'], self.ft.stats()['misses']), (1, 2))
+
+    def test_write_invalidates(self):
+        self.ft.fetch({'id': 1})
+        self.ft.fetch({'id': 2})
+        self.assertEqual(self.ft.count({'group': 'a'}), 10)
+        self.ft.update({'group': 'a'}, {'id': 1})
+        self.assertEqual(self.ft.fetch({'id': 1})[0]['group'], 'a')
+        self.assertEqual(self.ft.count({'group': 'a'}), 11)
+        self.assertEqual(self.ft.stats()['rows'], 2)  # id 2 stayed cached
+        self.ft.delete({'group': 'a'})
+        self.assertEqual(self.ft.stats()['rows'], 0)
+        self.assertEqual(self.ft.fetch_many([1, 2]), {})
+
+    def test_many_writes_invalidate(self):
+        self.ft.fetch_many([1, 2, 3])
+        self.ft.update_many({'score': 7}, [1, 2])
+        self.assertEqual([r['score'] for r in self.ft.fetch_many([1, 2, 3]).values()], [7, 7, 3])
+        self.ft.delete_many([3])
+        self.assertEqual(self.ft.fetch({'id': 3}), [])
+
+    def test_pk_update_invalidates_target(self):
+        self.assertEqual(self.ft.fetch({'id': 50}), [])
+        self.ft.update({'id': 50}, {'id': 1})
+        self.assertEqual(self.ft.fetch({'id': 50})[0]['group'], 'b')
+
+    def test_write_during_read(self):
+        fetch_many, count = self.inner.fetch_many, self.inner.count
+
+        def racing_fetch_many(*args, **kwargs):
+            found = fetch_many(*args, **kwargs)
+            self.ft.update({'score': 99}, {'id': 3})  # lands before the read stores the old row
+            return found
+
+        def racing_count(*args, **kwargs):
+            n = count(*args, **kwargs)
+            self.ft.delete({'id': 4})
+            return n
+
+        self.inner.fetch_many, self.inner.count = racing_fetch_many, racing_count
+        self.assertEqual(self.ft.fetch({'id': 3}, keys=['score']), [{'score': 3}])
+        self.assertEqual(self.ft.count(), 20)
+        self.inner.fetch_many, self.inner.count = fetch_many, count
+        self.assertEqual(self.ft.fetch({'id': 3}, keys=['score']), [{'score': 99}])
+        self.assertEqual(self.ft.count(), 19)
+
+    def test_rollback_invalidates(self):
+        with self.assertRaises(RuntimeError):
+            with self.ft:
+                self.inner.update({'score': 42}, {'id': 4})
+                self.assertEqual(self.ft.fetch({'id': 4})[0]['score'], 42)
+                raise RuntimeError
+        self.assertEqual(self.ft.fetch({'id': 4}), [self.rows[3]])
+
+    def test_transaction_bypasses_cache(self):
+        self.ft.fetch({'id': 5})
+        with self.ft:
+            self.inner.update({'score': 42}, {'id': 4})
+            self.assertEqual(self.ft.fetch({'id': 4})[0]['score'], 42)
+            self.assertEqual(self.ft.fetch_many([4, 5])[4]['score'], 42)
+            self.assertEqual(self.ft.count({'score': 42}), 1)
+            self.assertEqual((self.ft.stats()['rows'], self.ft.stats()['queries']), (1, 0))
+        stats = self.ft.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+
+    def test_commit_invalidates_written(self):
+        self.ft.fetch_many([1, 2])
+        with self.ft:
+            self.ft.update({'score': 9}, {'id': 1})
+            self.ft._rows.set(1, self.rows[0])  # refilled by another thread before the commit
+        self.assertEqual(self.ft.fetch({'id': 1})[0]['score'], 9)
+        self.assertEqual(self.ft.stats()['rows'], 2)
+
+    def test_maxsize(self):
+        ft = CachedSQLTable(self.inner, maxsize=5)
+        ft.fetch_many(range(1, 11))
+        self.assertEqual(ft.stats()['rows'], 5)
+        self.assertEqual(ft.stats()['evictions'], 5)
+
+    def test_composite_pk(self):
+        ft = CachedSQLTable(SQLiteTable("test_sqlite_cached_pk", self.db_path))
+        ft.create(CompositePKSchema)
+        try:
+            ft.insert(*[{'group_id': g, 'item_id': i, 'value': f'{g}-{i}'} for g in range(2) for i in range(3)])
+            self.assertEqual(ft.fetch({'item_id': 2, 'group_id': 1}), [{'group_id': 1, 'item_id': 2, 'value': '1-2'}])
+            self.assertEqual(ft.fetch_many([(1, 2)], keys=['value']), {(1, 2): {'value': '1-2'}})
+            self.assertEqual(ft.stats()['hits'], 1)
+        finally:
+            ft.drop()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -3,7 +3,7 @@ import unittest
 from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
 from gatling.storage.g_table.sql.a_pgsql_base import create_pool
 from storage.g_table.sql.a_const_test import (
-    CONNINFO, MinimalSchema,
+    CONNINFO, MinimalSchema, NoPKSchema,
     rand_row_minimal,
     reset_counter, skip_pgsql,
 )
@@ -275,6 +275,21 @@ class TestPGSQLTableInsertReplace(unittest.TestCase):
         fetched = self.ft.fetch(where={'id': 1})
         self.assertEqual(fetched[0]['name'], 'Alice_v2')
 
+    def test_replace_duplicates_in_one_call(self):
+        self.ft.insert({'id': 1, 'name': 'a'}, {'id': 1, 'name': 'b'}, replace=True)
+        self.assertEqual(self.ft.fetch(), [{'id': 1, 'name': 'b'}])
+
+    def test_replace_without_pk_keeps_rows(self):
+        ft = PGSQLTable("test_pgsql_replace_nopk", self.pool)
+        ft.drop()
+        ft.create(NoPKSchema)
+        try:
+            ft.insert({'name': 'a'}, {'name': 'a'}, {'name': 'b', 'score': 1}, replace=True)
+            self.assertEqual(ft.count(), 3)
+            self.assertEqual(ft.count({'score': 7}), 2)
+        finally:
+            ft.drop()
+
     def test_insert_duplicate_without_replace_raises(self):
         self.ft.insert({'id': 1, 'name': 'Alice'})
         with self.assertRaises(Exception):
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, MinimalSchema, PyModeSchema,
+    rand_row_minimal, rand_row_py,
+    reset_counter, skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableIterFetch(unittest.TestCase):
+    """Tests for chunked iter_fetch."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        reset_counter()
+        self.ft = PGSQLTable("test_pgsql_copy", self.pool)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_chunks(self):
+        rows = [rand_row_minimal() for _ in range(25)]
+        self.ft.insert(*rows)
+        chunks = list(self.ft.iter_fetch(order_by={'id': False}, chunk_size=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        self.assertEqual([r for c in chunks for r in c], rows)
+
+    def test_copy_in_lines(self):
+        self.ft.copy_in_lines(['id', 'name'], [b'1\ta\\\\b\n2\tc\n', b'3\td\n'])
+        self.assertEqual(self.ft.fetch(order_by={'id': False}),
+                         [{'id': 1, 'name': 'a\\b'}, {'id': 2, 'name': 'c'}, {'id': 3, 'name': 'd'}])
+
+
+@skip_pgsql
+class TestPGSQLTableCopy(unittest.TestCase):
+    """Bulk copy between TSVTable and PGSQLTable."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        reset_counter()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ft = PGSQLTable("test_pgsql_copy", self.pool)
+        self.ft.drop()
+        self.ft.create(PyModeSchema)
+        self.tsv = TSVTable(os.path.join(self.temp_dir.name, "test.tsv")).create(tabledefine=PyModeSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        self.temp_dir.cleanup()
+
+    def test_copy_to(self):
+        rows = [rand_row_py() for _ in range(57)]
+        rows[0]['secret'] = 'back\\slash\\N'
+        self.tsv.extend(rows)
+        self.assertEqual(self.tsv.copy_to(self.ft, batch_size=10), 57)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+    def test_copy_to_keys(self):
+        rows = [rand_row_py() for _ in range(5)]
+        self.tsv.extend(rows)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+        self.tsv.copy_to(self.ft, keys=['id'])
+        self.assertEqual([r['id'] for r in self.ft.fetch(order_by={'id': False})], [r['id'] for r in rows])
+
+    def test_copy_to_in_transaction(self):
+        self.tsv.extend([rand_row_py() for _ in range(5)])
+        with self.assertRaises(RuntimeError):
+            with self.ft:
+                self.tsv.copy_to(self.ft)
+                raise RuntimeError
+        self.assertEqual(self.ft.count(), 0)
+
+    def test_copy_from(self):
+        rows = [rand_row_py() for _ in range(57)]
+        self.ft.insert(*rows)
+        self.assertEqual(self.tsv.copy_from(self.ft, order_by={'id': False}, batch_size=10), 57)
+        self.assertEqual(self.tsv[:], rows)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, MinimalSchema, PyModeSchema,
+    rand_row_minimal, rand_row_py,
+    reset_counter, skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableInsertBulk(unittest.TestCase):
+    """Tests for COPY-based insert_bulk."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        reset_counter()
+        self.ft = PGSQLTable("test_pgsql_bulk", self.pool)
+        self.ft.drop()
+        self.ft.create(PyModeSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_methods(self):
+        for method in ('copy', 'copy_text', 'executemany'):
+            with self.subTest(method=method):
+                self.ft.truncate()
+                rows = [rand_row_py() for _ in range(200)]
+                self.assertEqual(self.ft.insert_bulk(rows, method=method), 200)
+                self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+    def test_generator(self):
+        rows = [rand_row_py() for _ in range(50)]
+        self.assertEqual(self.ft.insert_bulk(row for row in rows), 50)
+        self.assertEqual(self.ft.count(), 50)
+
+    def test_empty(self):
+        self.assertEqual(self.ft.insert_bulk([]), 0)
+        self.assertEqual(self.ft.count(), 0)
+
+    def test_replace(self):
+        rows = [rand_row_py() for _ in range(20)]
+        self.ft.insert_bulk(rows)
+        new = [{**row, 'level': 7} for row in rows[10:]] + [rand_row_py() for _ in range(5)]
+        self.assertEqual(self.ft.insert_bulk(new, replace=True), 15)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows[:10] + new)
+        # the temp table is dropped, so a second upsert works in the same transaction
+        with self.ft:
+            self.ft.insert_bulk(new[:3], replace=True)
+            self.ft.insert_bulk(new[3:6], replace=True)
+        self.assertEqual(self.ft.count(), 25)
+
+    def test_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with self.ft:
+                self.ft.insert_bulk([rand_row_py() for _ in range(5)])
+                raise RuntimeError
+        self.assertEqual(self.ft.count(), 0)
+
+    def test_bad_method(self):
+        with self.assertRaises(ValueError):
+            self.ft.insert_bulk([rand_row_py()], method='bogus')
+
+    def test_pk_only_replace(self):
+        self.ft.drop()
+        self.ft = PGSQLTable("test_pgsql_bulk", self.pool)
+        self.ft.create(MinimalSchema)
+        rows = [rand_row_minimal() for _ in range(5)]
+        self.ft.insert_bulk(rows)
+        self.ft.insert_bulk([{'id': row['id']} for row in rows], replace=True)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,65 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, ThreeColSchema,
+    skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableStream(unittest.TestCase):
+    """Server-side cursor iter_fetch and keyset pagination."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        self.ft = PGSQLTable("test_pgsql_stream", self.pool)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(1, 48)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_iter_fetch_dicts(self):
+        chunks = list(self.ft.iter_fetch(order_by={'id': False}, chunk_size=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 10, 10, 7])
+        self.assertEqual([r for c in chunks for r in c], self.rows)
+
+    def test_iter_fetch_tuples(self):
+        chunks = list(self.ft.iter_fetch(keys=['id', 'score'], order_by={'id': False}, chunk_size=20, as_tuples=True))
+        self.assertEqual([r for c in chunks for r in c], [(r['id'], r['score']) for r in self.rows])
+
+    def test_iter_fetch_in_transaction(self):
+        with self.ft:
+            self.ft.insert({'id': 100, 'group': 'c', 'score': 0})
+            got = [r for c in self.ft.iter_fetch(where={'group': 'c'}) for r in c]
+        self.assertEqual(got, [{'id': 100, 'group': 'c', 'score': 0}])
+
+    def test_iter_fetch_early_stop(self):
+        for chunk in self.ft.iter_fetch(chunk_size=5):
+            break
+        self.assertEqual(self.ft.count(), 47)
+
+    def test_pages(self):
+        pages = list(self.ft.iter_pages(page_size=10))
+        self.assertEqual([r for p in pages for r in p], self.rows)
+
+    def test_pages_mixed_order(self):
+        order_by = {'score': True, 'group': False}
+        expected = self.ft.fetch(order_by={**order_by, 'id': False})
+        got = [r for p in self.ft.iter_pages(order_by=order_by, page_size=4) for r in p]
+        self.assertEqual(got, expected)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,57 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, MinimalSchema,
+    rand_row_minimal,
+    reset_counter, skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableStmtCache(unittest.TestCase):
+    """Compiled statements are reused per shape and prepared once hot."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=2, prepare_threshold=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        reset_counter()
+        self.ft = PGSQLTable("test_pgsql_stmt_cache", self.pool)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+        self.rows = [rand_row_minimal() for _ in range(10)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_point_lookups_share_one_statement(self):
+        cache = self.ft._stmt_cache
+        misses = cache.misses
+        with self.ft:
+            for row in self.rows:
+                self.assertEqual(self.ft.fetch(where={'id': row['id']}), [row])
+        self.assertEqual(cache.misses, misses + 1)
+
+    def test_limit_offset_values_vary(self):
+        order = {'id': False}
+        self.assertEqual(self.ft.fetch(order_by=order, limit=3), self.rows[:3])
+        self.assertEqual(self.ft.fetch(order_by=order, limit=2, offset=4), self.rows[4:6])
+        self.assertEqual(self.ft.fetch(order_by=order, offset=8), self.rows[8:])
+
+    def test_update_delete_count(self):
+        self.assertEqual(self.ft.update({'name': 'x'}, {'id': self.rows[0]['id']}), 1)
+        self.assertEqual(self.ft.count(where={'name': 'x'}), 1)
+        self.assertEqual(self.ft.delete({'name': 'x'}), 1)
+        self.assertEqual(self.ft.count(), 9)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,87 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, ThreeColSchema, CompositePKSchema, NoPKSchema,
+    skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableMany(unittest.TestCase):
+    """fetch_many / update_many / delete_many by primary key."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        self.ft = PGSQLTable("test_pgsql_many", self.pool)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(1, 48)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_fetch_many(self):
+        got = self.ft.fetch_many([3, 30, 7, 3, 99])
+        self.assertEqual(got, {i: self.rows[i - 1] for i in (3, 30, 7)})
+
+    def test_fetch_many_one_statement(self):
+        self.ft._stmt_cache.clear()
+        got = self.ft.fetch_many(range(1, 48), keys=['score'], batch_size=10)
+        self.assertEqual(got, {r['id']: {'score': r['score']} for r in self.rows})
+        self.assertEqual(len(self.ft._stmt_cache), 1)
+
+    def test_fetch_many_empty(self):
+        self.assertEqual(self.ft.fetch_many([]), {})
+
+    def test_update_many(self):
+        self.assertEqual(self.ft.update_many({'score': 9, 'group': 'z'}, [1, 2, 3, 100]), 3)
+        self.assertEqual(self.ft.count({'score': 9, 'group': 'z'}), 3)
+
+    def test_delete_many_in_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with self.ft:
+                self.assertEqual(self.ft.delete_many(range(10, 48)), 38)
+                raise RuntimeError
+        self.assertEqual(self.ft.count(), 47)
+        self.assertEqual(self.ft.delete_many(range(10, 48)), 38)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), self.rows[:9])
+
+    def test_composite_pk(self):
+        ft = PGSQLTable("test_pgsql_many_pk", self.pool)
+        ft.drop()
+        ft.create(CompositePKSchema)
+        try:
+            rows = [{'group_id': g, 'item_id': i, 'value': f'{g}-{i}'} for g in range(4) for i in range(6)]
+            ft.insert(*rows)
+            got = ft.fetch_many([(0, 1), [2, 5], (9, 9)], keys=['value'])
+            self.assertEqual(got, {(0, 1): {'value': '0-1'}, (2, 5): {'value': '2-5'}})
+            self.assertEqual(ft.update_many({'value': 'x'}, [(1, 1), (1, 2)]), 2)
+            self.assertEqual(ft.delete_many([(g, 0) for g in range(4)], batch_size=3), 4)
+            self.assertEqual(ft.count(), 20)
+        finally:
+            ft.drop()
+
+
+    def test_no_primary_key(self):
+        ft = PGSQLTable("test_pgsql_many_nopk", self.pool)
+        ft.create(NoPKSchema)
+        try:
+            for call in (lambda: ft.fetch_many([1]), lambda: ft.update_many({'score': 1}, [1]), lambda: ft.delete_many([1])):
+                with self.assertRaisesRegex(ValueError, 'requires a primary key'):
+                    call()
+        finally:
+            ft.drop()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
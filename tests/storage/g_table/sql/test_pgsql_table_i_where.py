@@ -0,0 +1,65 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, ThreeColSchema,
+    skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableWhere(unittest.TestCase):
+    """Operator and OR-group where expressions in fetch/count/update/delete."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        self.ft = PGSQLTable("test_pgsql_where", self.pool)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'abc'[i % 3] + str(i % 2), 'score': i % 7} for i in range(1, 41)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def assertWhere(self, where, pred):
+        expected = [r for r in self.rows if pred(r)]
+        self.assertEqual(self.ft.fetch(where, order_by={'id': False}), expected)
+        self.assertEqual(self.ft.count(where), len(expected))
+
+    def test_operators(self):
+        cases = [
+            ({'score': {'$gt': 2, '$lte': 4}}, lambda r: 2 < r['score'] <= 4),
+            ({'id': {'$in': [3, 5, 99]}}, lambda r: r['id'] in (3, 5, 99)),
+            ({'id': {'$in': []}}, lambda r: False),
+            ({'score': {'$nin': [0, 1, 2]}}, lambda r: r['score'] not in (0, 1, 2)),
+            ({'id': {'$between': [10, 14]}}, lambda r: 10 <= r['id'] <= 14),
+            ({'group': {'$like': 'a%'}}, lambda r: r['group'].startswith('a')),
+            ({'group': {'$ilike': 'B1'}}, lambda r: r['group'] == 'b1'),
+        ]
+        for where, pred in cases:
+            with self.subTest(where=where):
+                self.assertWhere(where, pred)
+
+    def test_or_groups(self):
+        self.assertWhere(
+            {'score': {'$gte': 1}, '$or': [{'group': 'a0'}, {'id': {'$lt': 4}}]},
+            lambda r: r['score'] >= 1 and (r['group'] == 'a0' or r['id'] < 4),
+        )
+
+    def test_update_delete(self):
+        self.assertEqual(self.ft.update({'score': 100}, {'id': {'$between': [1, 5]}}), 5)
+        self.assertEqual(self.ft.delete({'$or': [{'score': 100}, {'id': {'$gt': 35}}]}), 10)
+        self.assertEqual(self.ft.count(), 30)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
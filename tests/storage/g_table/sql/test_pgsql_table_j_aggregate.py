@@ -0,0 +1,49 @@
+import unittest
+
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, ThreeColSchema,
+    skip_pgsql,
+)
+
+
+@skip_pgsql
+class TestPGSQLTableAggregate(unittest.TestCase):
+    """aggregate(): server-side metrics per group."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        self.ft = PGSQLTable("test_pgsql_aggregate", self.pool)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'abc'[i % 3], 'score': i % 7} for i in range(1, 41)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_group_by(self):
+        got = self.ft.aggregate(group_by=['group'], metrics={'n': 'count', 'avg_score': ('avg', 'score')},
+                                order_by={'group': False})
+        for row, group in zip(got, 'abc'):
+            scores = [r['score'] for r in self.rows if r['group'] == group]
+            self.assertEqual(row['n'], len(scores))
+            self.assertIsInstance(row['avg_score'], float)
+            self.assertAlmostEqual(row['avg_score'], sum(scores) / len(scores))
+
+    def test_no_group(self):
+        self.assertEqual(self.ft.aggregate(), [{'count': 40}])
+        got = self.ft.aggregate(metrics={'hi': ('max', 'score')}, where={'group': 'a'})
+        self.assertEqual(got, [{'hi': max(r['score'] for r in self.rows if r['group'] == 'a')}])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
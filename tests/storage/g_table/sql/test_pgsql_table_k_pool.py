@@ -0,0 +1,95 @@
+import unittest
+
+from psycopg_pool import PoolTimeout
+
+from gatling.runtime.taskflow_manager import TaskFlowManager
+from gatling.storage.g_queue.memory_queue import MemoryQueue
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.a_pgsql_base import (
+    create_pool, InstrumentedPool, PoolMetrics, pool_size_for, _slow_query_hook,
+)
+from gatling.vtasks.sample_tasks import fake_fctn_cpu, fake_fctn_disk, async_fake_fctn_net
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, MinimalSchema,
+    skip_pgsql,
+)
+
+
+class TestPoolMetrics(unittest.TestCase):
+
+    def test_histogram(self):
+        m = PoolMetrics()
+        for wait in (0.0002, 0.003, 0.003, 0.2, 9.0):
+            m.checkout(wait)
+        m.checkin()
+        snap = m.snapshot()
+        self.assertEqual((snap['checkouts'], snap['in_use'], snap['max_in_use']), (5, 4, 5))
+        hist = snap['wait_histogram_ms']
+        self.assertEqual((hist[1], hist[5], hist[500], hist[float('inf')]), (1, 2, 1, 1))
+        self.assertEqual(sum(hist.values()), 5)
+
+    def test_slow_query_hook(self):
+        m, logged = PoolMetrics(), []
+        hook = _slow_query_hook(m, 0.5, logged.append)
+        hook(b'SELECT 1', 0.1)
+        hook('SELECT *\n  FROM t', 0.7)
+        self.assertEqual(m.slow_queries, 1)
+        self.assertEqual(logged, ['slow query 0.700s: SELECT * FROM t'])
+
+    def test_timeout_counted(self):
+        pool = InstrumentedPool('host=127.0.0.1 port=1 connect_timeout=1', min_size=1, max_size=1,
+                                open=True, reconnect_timeout=60)
+        try:
+            with self.assertRaises(PoolTimeout):
+                pool.getconn(timeout=0.05)
+            self.assertEqual(pool.metrics()['timeouts'], 1)
+            self.assertEqual(pool.metrics()['pool_max'], 1)
+        finally:
+            pool.close()
+
+    def test_pool_size_for(self):
+        tfm = TaskFlowManager(MemoryQueue(), retry_on_error=False)
+        tfm.register_process(fake_fctn_cpu, worker=4)
+        tfm.register_thread(fake_fctn_disk, worker=6)
+        tfm.register_coroutine(async_fake_fctn_net, worker=3)
+        self.assertEqual(pool_size_for(tfm), {'min_size': 5, 'max_size': 10})
+        self.assertEqual(pool_size_for(tfm, per_worker=2, spare=0), {'min_size': 9, 'max_size': 18})
+
+
+@skip_pgsql
+class TestPGSQLTablePool(unittest.TestCase):
+    """Pool metrics and slow-query log surfaced through the table."""
+
+    def setUp(self):
+        self.logged = []
+        self.pool = create_pool(CONNINFO, max_size=2, slow_query_seconds=0.05, slow_logfctn=self.logged.append)
+        self.ft = PGSQLTable("test_pgsql_pool", self.pool)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        self.pool.close()
+
+    def test_metrics(self):
+        self.ft.insert({'id': 1, 'name': 'a'})
+        with self.ft:
+            self.assertEqual(self.ft.pool_stats()['in_use'], 1)
+            self.ft.fetch()
+        stats = self.ft.pool_stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertGreaterEqual(stats['checkouts'], 4)
+        self.assertEqual(sum(stats['wait_histogram_ms'].values()), stats['checkouts'])
+        self.assertIn('requests_num', stats)
+
+    def test_slow_query_logged(self):
+        with self.pool.connection() as conn:
+            conn.execute("SELECT pg_sleep(0.1)")
+            conn.execute("SELECT 1")
+        self.assertEqual(self.pool.metrics()['slow_queries'], 1)
+        self.assertEqual(len(self.logged), 1)
+        self.assertIn('pg_sleep', self.logged[0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,304 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from gatling.runtime.taskflow_manager import TaskFlowManager
+from gatling.storage.g_queue.memory_queue import MemoryQueue
+from gatling.storage.g_table.sql.real_pgsql_table import PGSQLTable
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from gatling.storage.g_table.sql.sql_batch_writer import SQLBatchWriter, is_transient
+from gatling.storage.g_table.sql.a_pgsql_base import create_pool
+from storage.g_table.sql.a_const_test import (
+    CONNINFO, NoPKSchema, ThreeColSchema,
+    skip_pgsql,
+)
+
+
+def make_rows(start, stop):
+    return [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(start, stop)]
+
+
+class TestSQLBatchWriterSQLite(unittest.TestCase):
+    """Size- and time-triggered flushes, pipeline sinks and retries over a SQLiteTable."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_batch_writer", self.db_path)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_not_opened(self):
+        w = SQLBatchWriter(self.ft)
+        with self.assertRaises(RuntimeError):
+            w.append(make_rows(1, 2)[0])
+        with self.assertRaises(RuntimeError):
+            w.close()
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            SQLBatchWriter(self.ft, method='bulk')
+        with self.assertRaises(ValueError):
+            SQLBatchWriter(self.ft, method='copy')  # SQLite has no COPY
+
+    def test_flush_by_size(self):
+        with SQLBatchWriter(self.ft, max_rows=10, max_delay=None) as w:
+            w.extend(make_rows(1, 10))
+            self.assertEqual((self.ft.count(), w.pending()), (0, 9))
+            w.append(make_rows(10, 11)[0])
+            self.assertEqual((self.ft.count(), w.pending()), (10, 0))
+            w.extend(make_rows(11, 16))
+        self.assertEqual(self.ft.count(), 15)
+        stats = w.stats()
+        self.assertEqual((stats['rows_written'], stats['batches'], stats['pending']), (15, 2, 0))
+        self.assertGreater(stats['write_rows_per_second'], 0)
+
+    def test_flush_by_delay(self):
+        with SQLBatchWriter(self.ft, max_rows=1000, max_delay=0.05) as w:
+            w.extend(make_rows(1, 6))
+            self.assertEqual(self.ft.count(), 0)
+            deadline = time.monotonic() + 5
+            while w.stats()['rows_written'] < 5 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.ft.count(), 5)
+
+    def test_replace(self):
+        with SQLBatchWriter(self.ft, replace=True, max_delay=None) as w:
+            w.extend(make_rows(1, 4))
+            w.append({'id': 2, 'group': 'c', 'score': 9})
+        self.assertEqual(self.ft.fetch({'id': 2}), [{'id': 2, 'group': 'c', 'score': 9}])
+
+    def test_replace_without_pk(self):
+        ft = SQLiteTable("test_sqlite_batch_writer_nopk", self.db_path)
+        ft.drop()
+        ft.create(NoPKSchema)
+        with SQLBatchWriter(ft, replace=True, max_delay=None) as w:
+            w.extend([{'name': 'a', 'score': 1}, {'name': 'a', 'score': 1}])
+        self.assertEqual(ft.count(), 2)
+        ft.drop()
+
+    def test_auto_method(self):
+        methods = []
+
+        def insert_bulk(rows, replace=False, method='copy'):
+            methods.append(method)
+            rows = list(rows)
+            self.ft.insert(*rows, replace=replace)
+            return len(rows)
+
+        self.ft.insert_bulk = insert_bulk  # a table with a COPY path
+        with SQLBatchWriter(self.ft, max_rows=3, max_delay=None) as w:
+            w.extend(make_rows(1, 4))
+            w.extend([{'id': 4, 'group': 'a'}, {'id': 5, 'score': 2}, {'id': 6, 'group': 'b', 'score': 1}])
+        self.assertEqual(methods, ['copy_text'])
+        self.assertEqual(self.ft.fetch({'id': 5}), [{'id': 5, 'group': '', 'score': 2}])
+        self.assertEqual(self.ft.count(), 6)
+
+    def test_concurrent_appends(self):
+        with SQLBatchWriter(self.ft, max_rows=50, max_delay=0.01) as w:
+            threads = [threading.Thread(target=w.extend, args=(make_rows(k * 100 + 1, k * 100 + 101),)) for k in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(self.ft.count(), 800)
+
+    def test_taskflow_sink(self):
+        q_wait = MemoryQueue()
+        for row in make_rows(1, 21):
+            q_wait.put(row)
+        with SQLBatchWriter(self.ft, max_rows=8) as w:
+            tfm = TaskFlowManager(q_wait, retry_on_error=False)
+            tfm.register_thread(w.sink, worker=2)
+            with tfm.execute(log_interval=0.01):
+                pass
+        self.assertEqual(self.ft.count(), 20)
+
+    def test_drain(self):
+        q = MemoryQueue()
+        q.put(make_rows(1, 4))
+        q.put(make_rows(4, 5)[0])
+        with SQLBatchWriter(self.ft, max_delay=None) as w:
+            self.assertEqual(w.drain(q, timeout=0.01), 2)
+        self.assertEqual(self.ft.count(), 4)
+
+    def test_drain_until_stop(self):
+        q, stop = MemoryQueue(), threading.Event()
+
+        def produce():
+            for row in make_rows(1, 11):
+                q.put(row)
+                time.sleep(0.002)
+            stop.set()
+
+        producer = threading.Thread(target=produce)
+        with SQLBatchWriter(self.ft, max_delay=None) as w:
+            producer.start()
+            self.assertEqual(w.drain(q, stop=stop, timeout=0.01), 10)
+        producer.join()
+        self.assertEqual(self.ft.count(), 10)
+
+    def test_retry(self):
+        insert, calls = self.ft.insert, []
+
+        def flaky(*rows, **kwargs):
+            calls.append(len(rows))
+            if len(calls) <= 2:
+                raise sqlite3.OperationalError('database is locked')
+            return insert(*rows, **kwargs)
+
+        self.ft.insert = flaky
+        with SQLBatchWriter(self.ft, max_delay=None, backoff=0.001) as w:
+            w.extend(make_rows(1, 6))
+        self.assertEqual((calls, w.stats()['retried']), ([5, 5, 5], 2))
+        self.assertEqual(self.ft.count(), 5)
+
+    def test_transient(self):
+        self.assertTrue(is_transient(sqlite3.OperationalError('database is locked')))
+        self.assertTrue(is_transient(sqlite3.OperationalError('database table is busy')))
+        self.assertFalse(is_transient(sqlite3.OperationalError('no such table: t')))
+        self.assertFalse(is_transient(ValueError('locked')))
+
+    def test_no_retry_on_other_operational_error(self):
+        calls = []
+
+        def missing(*rows, **kwargs):
+            calls.append(len(rows))
+            raise sqlite3.OperationalError('no such column: x')
+
+        self.ft.insert = missing
+        w = SQLBatchWriter(self.ft, max_delay=None, backoff=0.001).open()
+        w.extend(make_rows(1, 3))
+        with self.assertRaises(sqlite3.OperationalError):
+            w.flush()
+        self.assertEqual(calls, [2])
+
+    def test_retries_exhausted(self):
+        insert = self.ft.insert
+
+        def locked(*rows, **kwargs):
+            raise sqlite3.OperationalError('database is locked')
+
+        self.ft.insert = locked
+        w = SQLBatchWriter(self.ft, max_delay=None, retries=1, backoff=0.001).open()
+        w.extend(make_rows(1, 4))
+        with self.assertRaises(sqlite3.OperationalError):
+            w.flush()
+        w.append(make_rows(4, 5)[0])
+        self.assertEqual(w.pending(), 4)  # the failed batch is kept, in order
+
+        self.ft.insert = insert
+        w.close()
+        self.assertEqual([r['id'] for r in self.ft.fetch(order_by={'id': False})], [1, 2, 3, 4])
+
+    def test_background_error(self):
+        def broken(*rows, **kwargs):
+            raise ValueError('bad row')
+
+        insert = self.ft.insert
+        self.ft.insert = broken
+        w = SQLBatchWriter(self.ft, max_delay=0.01).open()
+        w.append(make_rows(1, 2)[0])
+        time.sleep(0.1)
+        with self.assertRaises(ValueError):
+            w.append(make_rows(2, 3)[0])
+        self.assertEqual(w.pending(), 1)
+
+        # the background thread keeps running and writes once the table works again
+        self.ft.insert = insert
+        w.append(make_rows(2, 3)[0])
+        deadline = time.monotonic() + 5
+        while w.stats()['rows_written'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.ft.count(), 2)
+        w.close()
+
+    def test_close_writes_before_raising(self):
+        def broken(*rows, **kwargs):
+            raise ValueError('bad row')
+
+        insert = self.ft.insert
+        self.ft.insert = broken
+        w = SQLBatchWriter(self.ft, max_delay=0.01).open()
+        w.append(make_rows(1, 2)[0])
+        time.sleep(0.1)
+        self.ft.insert = insert
+        with self.assertRaises(ValueError):  # the stored error, raised after the rows are written
+            w.close()
+        self.assertEqual((self.ft.count(), w.pending()), (1, 0))
+        with self.assertRaises(RuntimeError):
+            w.close()
+
+    def test_close_failure_stays_open(self):
+        def broken(*rows, **kwargs):
+            raise ValueError('bad row')
+
+        insert = self.ft.insert
+        self.ft.insert = broken
+        w = SQLBatchWriter(self.ft, max_delay=0.01).open()
+        w.extend(make_rows(1, 3))
+        time.sleep(0.1)  # the background flush fails and stores its error
+        with self.assertRaises(ValueError):
+            w.close()
+        self.assertEqual(w.pending(), 2)
+        self.ft.insert = insert
+        w.close()  # the stored error was superseded by the failed close
+        self.assertEqual(self.ft.count(), 2)
+
+
+@skip_pgsql
+class TestSQLBatchWriterPGSQL(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = create_pool(CONNINFO, max_size=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def setUp(self):
+        self.ft = PGSQLTable("test_pgsql_batch_writer", self.pool)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+
+    def test_methods(self):
+        for method in ('auto', 'insert', 'copy_text'):
+            with self.subTest(method=method):
+                self.ft.truncate()
+                with SQLBatchWriter(self.ft, max_rows=100, method=method) as w:
+                    w.extend(make_rows(1, 251))
+                self.assertEqual(self.ft.count(), 250)
+                self.assertEqual(w.stats()['batches'], 3)
+
+    def test_auto_mixed_keys(self):
+        with SQLBatchWriter(self.ft, max_delay=None) as w:
+            w.extend([{'id': 1, 'group': 'a'}, {'id': 2, 'score': 3}, {'id': 3, 'group': 'b', 'score': 1}])
+            w.flush()
+            w.extend([{'id': 4, 'group': 'a', 'score': '7'}])  # text COPY parses like insert()
+        self.assertEqual(self.ft.count(), 4)
+        self.assertEqual(self.ft.fetch({'id': 4}), [{'id': 4, 'group': 'a', 'score': 7}])
+
+    def test_replace_dedupes_copy(self):
+        with SQLBatchWriter(self.ft, replace=True, max_delay=None) as w:
+            w.extend(make_rows(1, 4))
+            w.append({'id': 2, 'group': 'c', 'score': 9})
+        self.assertEqual(self.ft.count(), 3)
+        self.assertEqual(self.ft.fetch({'id': 2}), [{'id': 2, 'group': 'c', 'score': 9}])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
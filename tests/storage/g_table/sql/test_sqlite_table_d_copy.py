@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.append_only.real_tsv_table import TSVTable
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    MinimalSchema, PyModeSchema,
+    rand_row_minimal, rand_row_py, reset_counter,
+)
+
+
+class TestSQLiteTableIterFetch(unittest.TestCase):
+    """Tests for chunked iter_fetch."""
+
+    def setUp(self):
+        reset_counter()
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_copy", self.db_path)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_chunks(self):
+        rows = [rand_row_minimal() for _ in range(25)]
+        self.ft.insert(*rows)
+        chunks = list(self.ft.iter_fetch(order_by={'id': False}, chunk_size=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        self.assertEqual([r for c in chunks for r in c], rows)
+
+    def test_where_keys(self):
+        self.ft.insert(*[rand_row_minimal() for _ in range(10)])
+        chunks = list(self.ft.iter_fetch(where={'id': 3}, keys=['name']))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(list(chunks[0][0].keys()), ['name'])
+
+    def test_empty(self):
+        self.assertEqual(list(self.ft.iter_fetch()), [])
+
+    def test_in_context(self):
+        rows = [rand_row_minimal() for _ in range(5)]
+        with self.ft:
+            self.ft.insert(*rows)
+            got = [r for c in self.ft.iter_fetch(chunk_size=2) for r in c]
+        self.assertEqual(got, rows)
+
+
+class TestSQLiteTableCopy(unittest.TestCase):
+    """Bulk copy between TSVTable and SQLiteTable."""
+
+    def setUp(self):
+        reset_counter()
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.tsv_path = os.path.join(self._tmpdir, "test.tsv")
+        self.ft = SQLiteTable("test_sqlite_copy", self.db_path)
+        self.ft.drop()
+        self.ft.create(PyModeSchema)
+        self.tsv = TSVTable(self.tsv_path).create(tabledefine=PyModeSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        self.tsv.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_copy_to(self):
+        rows = [rand_row_py() for _ in range(57)]
+        self.tsv.extend(rows)
+        self.assertEqual(self.tsv.copy_to(self.ft, batch_size=10), 57)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+    def test_copy_from(self):
+        rows = [rand_row_py() for _ in range(57)]
+        self.ft.insert(*rows)
+        self.assertEqual(self.tsv.copy_from(self.ft, order_by={'id': False}, batch_size=10), 57)
+        self.assertEqual(self.tsv[:], rows)
+
+    def test_copy_from_where(self):
+        rows = [rand_row_py() for _ in range(20)]
+        self.ft.insert(*rows)
+        self.assertEqual(self.tsv.copy_from(self.ft, where={'id': 5}), 1)
+        self.assertEqual(self.tsv[:], [rows[4]])
+
+    def test_round_trip(self):
+        rows = [rand_row_py() for _ in range(30)]
+        self.tsv.extend(rows)
+        self.tsv.copy_to(self.ft, batch_size=7)
+        other = TSVTable(os.path.join(self._tmpdir, "other.tsv")).create(tabledefine=PyModeSchema)
+        try:
+            other.copy_from(self.ft, order_by={'id': False}, batch_size=7)
+            self.assertEqual(other[:], rows)
+        finally:
+            other.drop()
+
+    def test_copy_empty(self):
+        self.assertEqual(self.tsv.copy_to(self.ft), 0)
+        self.assertEqual(self.tsv.copy_from(self.ft), 0)
+        self.assertEqual(len(self.tsv), 0)
+
+    def test_iter_batches(self):
+        rows = [rand_row_py() for _ in range(23)]
+        self.tsv.extend(rows)
+        batches = list(self.tsv.iter_batches(batch_size=10, keys=['id', 'level']))
+        self.assertEqual([len(b) for b in batches], [10, 10, 3])
+        self.assertEqual([r for b in batches for r in b], [{'id': r['id'], 'level': r['level']} for r in rows])
+        with self.tsv:
+            self.assertEqual([r for b in self.tsv.iter_batches(batch_size=4) for r in b], rows)
+            self.tsv.append(rand_row_py())
+        self.assertEqual(len(self.tsv), 24)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    ThreeColSchema, CompositePKSchema,
+)
+
+
+class TestSQLiteTableKeyset(unittest.TestCase):
+    """Tests for fetch(after=...) and iter_pages keyset pagination."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_page", self.db_path)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(1, 48)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_fetch_after(self):
+        got = self.ft.fetch(order_by={'id': False}, after={'id': 40}, limit=3)
+        self.assertEqual([r['id'] for r in got], [41, 42, 43])
+        got = self.ft.fetch(order_by={'id': True}, after={'id': 3})
+        self.assertEqual([r['id'] for r in got], [2, 1])
+
+    def test_fetch_after_needs_order(self):
+        with self.assertRaises(ValueError):
+            self.ft.fetch(after={'id': 1})
+
+    def test_pages_by_pk(self):
+        pages = list(self.ft.iter_pages(page_size=10))
+        self.assertEqual([len(p) for p in pages], [10, 10, 10, 10, 7])
+        self.assertEqual([r for p in pages for r in p], self.rows)
+
+    def test_pages_mixed_order(self):
+        order_by = {'score': True, 'group': False}
+        expected = self.ft.fetch(order_by={**order_by, 'id': False})
+        got = [r for p in self.ft.iter_pages(order_by=order_by, page_size=4) for r in p]
+        self.assertEqual(got, expected)
+
+    def test_pages_where_keys(self):
+        pages = list(self.ft.iter_pages(where={'group': 'a'}, keys=['score'], order_by={'score': False}, page_size=5))
+        got = [r for p in pages for r in p]
+        self.assertEqual(got, [{'score': r['score']} for r in sorted((r for r in self.rows if r['group'] == 'a'), key=lambda r: (r['score'], r['id']))])
+
+    def test_pages_exact_multiple(self):
+        pages = list(self.ft.iter_pages(where={'group': 'a'}, page_size=23))
+        self.assertEqual([len(p) for p in pages], [23])
+
+    def test_pages_composite_pk(self):
+        ft = SQLiteTable("test_sqlite_page_pk", self.db_path)
+        ft.create(CompositePKSchema)
+        try:
+            rows = [{'group_id': g, 'item_id': i, 'value': f'{g}-{i}'} for g in range(4) for i in range(6)]
+            ft.insert(*rows)
+            self.assertEqual([r for p in ft.iter_pages(page_size=5) for r in p], rows)
+        finally:
+            ft.drop()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
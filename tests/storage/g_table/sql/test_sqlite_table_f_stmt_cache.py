@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.sql.base_sql_table import StmtCache
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    MinimalSchema, rand_row_minimal, reset_counter,
+)
+
+
+class TestStmtCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = StmtCache(maxsize=2)
+        builds = []
+
+        def build(sql):
+            def _build():
+                builds.append(sql)
+                return sql, {'p': None, 'param_1': -1}
+            return _build
+
+        self.assertEqual(cache.get('a', build('A')), ('A', {'param_1': -1}))
+        cache.get('b', build('B'))
+        cache.get('a', build('A'))
+        cache.get('c', build('C'))  # evicts b, the least recently used
+        cache.get('a', build('A'))
+        cache.get('b', build('B'))
+        self.assertEqual(builds, ['A', 'B', 'C', 'B'])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 4, 2))
+
+
+class TestSQLiteTableStmtCache(unittest.TestCase):
+    """Compiled statements are reused per shape and take bound values."""
+
+    def setUp(self):
+        reset_counter()
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_stmt_cache", self.db_path)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+        self.rows = [rand_row_minimal() for _ in range(10)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_point_lookups_share_one_statement(self):
+        cache = self.ft._stmt_cache
+        misses = cache.misses
+        for row in self.rows:
+            self.assertEqual(self.ft.fetch(where={'id': row['id']}), [row])
+        self.assertEqual(cache.misses, misses + 1)
+        self.assertEqual(cache.hits, len(self.rows) - 1)
+
+    def test_null_is_a_separate_shape(self):
+        self.ft.insert({'id': 100, 'name': None})
+        self.assertEqual(self.ft.count(where={'name': None}), 1)
+        self.assertEqual(self.ft.count(where={'name': self.rows[0]['name']}), 1)
+        self.assertEqual(self.ft.count(where={'name': None}), 1)
+
+    def test_limit_offset_values_vary(self):
+        order = {'id': False}
+        self.assertEqual(self.ft.fetch(order_by=order, limit=3), self.rows[:3])
+        self.assertEqual(self.ft.fetch(order_by=order, limit=2), self.rows[:2])
+        self.assertEqual(self.ft.fetch(order_by=order, offset=8), self.rows[8:])
+        self.assertEqual(self.ft.fetch(order_by=order, limit=2, offset=4), self.rows[4:6])
+        self.assertEqual(self.ft.fetch(order_by=order, limit=1, offset=5), self.rows[5:6])
+
+    def test_update_delete(self):
+        for row in self.rows[:3]:
+            self.assertEqual(self.ft.update({'name': 'x'}, {'id': row['id']}), 1)
+        self.assertEqual(self.ft.count(where={'name': 'x'}), 3)
+        self.assertEqual(self.ft.delete({'name': 'x'}), 3)
+        self.assertEqual(self.ft.count(), 7)
+
+    def test_create_clears(self):
+        self.ft.fetch(where={'id': 1})
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+        self.assertEqual(len(self.ft._stmt_cache), 0)
+        self.assertEqual(self.ft.fetch(where={'id': 1}), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable, SQLITE_FAST_PRAGMAS
+from storage.g_table.sql.a_const_test import (
+    MinimalSchema, rand_row_minimal, reset_counter,
+)
+
+
+class TestSQLiteTableConnCache(unittest.TestCase):
+    """Per-thread connection reuse, release and pragmas."""
+
+    def setUp(self):
+        reset_counter()
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_conn", self.db_path)
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.unlink(self.db_path + suffix)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_reused_across_calls(self):
+        conn = self.ft._thread_conn()
+        self.ft.insert(rand_row_minimal())
+        self.ft.fetch()
+        self.ft.count()
+        self.assertIs(self.ft._thread_conn(), conn)
+        with self.ft:
+            self.assertIs(self.ft._conn, conn)
+        self.assertEqual(self.ft.count(), 1)
+
+    def test_one_conn_per_thread(self):
+        conns = []
+
+        def work():
+            self.ft.insert(rand_row_minimal())
+            conns.append(self.ft._thread_conn())
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(c) for c in conns}), 4)
+        self.assertEqual(self.ft.count(), 4)
+
+    def test_close(self):
+        conn = self.ft._thread_conn()
+        self.ft.close()
+        self.assertIsNot(self.ft._thread_conn(), conn)
+        self.assertEqual(self.ft.count(), 0)
+
+    def test_failed_statement_rolls_back(self):
+        self.ft.insert({'id': 1, 'name': 'a'})
+        with self.assertRaises(Exception):
+            self.ft.insert({'id': 2, 'name': 'b'}, {'id': 1, 'name': 'dup'})
+        self.assertEqual(self.ft.fetch(), [{'id': 1, 'name': 'a'}])
+
+    def test_transaction_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with self.ft:
+                self.ft.insert(rand_row_minimal())
+                raise RuntimeError
+        self.assertEqual(self.ft.count(), 0)
+
+    def test_not_persistent(self):
+        ft = SQLiteTable("test_sqlite_conn", self.db_path, persistent=False)
+        ft.create(MinimalSchema)
+        ft.insert(rand_row_minimal())
+        self.assertEqual(ft.count(), 1)
+        self.assertEqual(len(ft._conns), 0)
+
+    def test_pragmas(self):
+        self.ft.drop()
+        self.ft = SQLiteTable("test_sqlite_conn", self.db_path, pragmas=SQLITE_FAST_PRAGMAS)
+        self.ft.create(MinimalSchema)
+        rows = [rand_row_minimal() for _ in range(10)]
+        self.ft.insert(*rows)
+        self.assertEqual(self.ft._scalar("PRAGMA journal_mode"), 'wal')
+        self.assertEqual(self.ft._scalar("PRAGMA synchronous"), 1)
+        self.assertEqual(self.ft._scalar("PRAGMA temp_store"), 2)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
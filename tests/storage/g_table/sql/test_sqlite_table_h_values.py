@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gatling.storage.g_table.sql import real_sqlite_table
+from gatling.storage.g_table.sql.base_sql_table import values_widths
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    MinimalSchema, PyModeSchema, NoPKSchema,
+    rand_row_minimal, rand_row_py, reset_counter,
+)
+
+
+class TestValuesWidths(unittest.TestCase):
+
+    def test_widths(self):
+        self.assertEqual(values_widths(0, 8), [])
+        self.assertEqual(values_widths(8, 8), [8])
+        self.assertEqual(values_widths(21, 8), [8, 8, 4, 1])
+        self.assertEqual(values_widths(7, 100), [4, 2, 1])
+        for n in range(200):
+            self.assertEqual(sum(values_widths(n, 16)), n)
+
+
+class TestSQLiteTableMultiValues(unittest.TestCase):
+    """Multi-row INSERT ... VALUES batching."""
+
+    def setUp(self):
+        reset_counter()
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_values", self.db_path)
+        self.ft.drop()
+        self.ft.create(PyModeSchema)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def insert_shapes(self):
+        return sorted(key[1] for key in self.ft._stmt_cache._data if key[0] == 'insert')
+
+    def test_batches(self):
+        rows = [rand_row_py() for _ in range(300)]
+        self.ft.insert(*rows, batch_size=64)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+        self.assertEqual(self.insert_shapes(), [4, 8, 32, 64])
+
+    def test_param_limit(self):
+        with mock.patch.object(real_sqlite_table, 'SQLITE_MAX_PARAMS', 50):
+            rows = [rand_row_py() for _ in range(23)]
+            self.ft.insert(*rows)
+        # 9 columns -> 5 rows per statement
+        self.assertEqual(self.insert_shapes(), [1, 2, 5])
+        self.assertEqual(self.ft.count(), 23)
+
+    def test_replace(self):
+        rows = [rand_row_py() for _ in range(10)]
+        self.ft.insert(*rows)
+        changed = [{**row, 'level': 1} for row in rows[5:]]
+        self.ft.insert(*changed, {**rows[9], 'level': 2}, replace=True)
+        expected = rows[:5] + changed[:-1] + [{**rows[9], 'level': 2}]
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), expected)
+
+    def test_replace_pk_only(self):
+        self.ft.drop()
+        self.ft.create(MinimalSchema)
+        rows = [rand_row_minimal() for _ in range(4)]
+        self.ft.insert(*rows)
+        self.ft.insert(*[{'id': r['id']} for r in rows], replace=True)
+        self.assertEqual(self.ft.fetch(order_by={'id': False}), rows)
+
+    def test_columns_of_all_rows(self):
+        self.ft.drop()
+        self.ft.create(NoPKSchema)
+        self.ft.insert({'name': 'a'}, {'name': 'b', 'score': 1}, {'score': 2})
+        self.assertEqual(self.ft.fetch(order_by={'score': False}),
+                         [{'name': 'b', 'score': 1}, {'name': '', 'score': 2}, {'name': 'a', 'score': 7}])
+
+    def test_replace_without_pk(self):
+        self.ft.drop()
+        self.ft.create(NoPKSchema)
+        rows = [{'name': 'a', 'score': 1}, {'name': 'a', 'score': 1}, {'name': 'b', 'score': 2}]
+        self.ft.insert(*rows, replace=True)
+        self.assertEqual(self.ft.count(), 3)
+
+    def test_failed_batch_rolls_back(self):
+        rows = [rand_row_py() for _ in range(5)]
+        with self.assertRaises(Exception):
+            self.ft.insert(*rows, rows[0], batch_size=2)
+        self.assertEqual(self.ft.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import (
+    ThreeColSchema, CompositePKSchema, NoPKSchema,
+)
+
+
+class TestSQLiteTableMany(unittest.TestCase):
+    """Tests for fetch_many / update_many / delete_many by primary key."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_many", self.db_path)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'ab'[i % 2], 'score': i % 5} for i in range(1, 48)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def test_fetch_many(self):
+        got = self.ft.fetch_many([3, 30, 7, 3, 99], batch_size=2)
+        self.assertEqual(got, {i: self.rows[i - 1] for i in (3, 30, 7)})
+
+    def test_fetch_many_keys(self):
+        got = self.ft.fetch_many(range(1, 6), keys=['score'])
+        self.assertEqual(got, {i: {'score': i % 5} for i in range(1, 6)})
+
+    def test_fetch_many_empty(self):
+        self.assertEqual(self.ft.fetch_many([]), {})
+
+    def test_fetch_many_all(self):
+        self.ft._stmt_cache.clear()
+        got = self.ft.fetch_many(range(1, 48), batch_size=10)
+        self.assertEqual(list(got.values()), self.rows)
+        self.assertEqual(len(self.ft._stmt_cache), 4)  # widths 10, 4, 2, 1
+
+    def test_update_many(self):
+        self.assertEqual(self.ft.update_many({'score': 9, 'group': 'z'}, [1, 2, 3, 100], batch_size=2), 3)
+        self.assertEqual(self.ft.count({'score': 9, 'group': 'z'}), 3)
+        self.assertEqual(self.ft.fetch_many([4])[4], self.rows[3])
+
+    def test_delete_many(self):
+        self.assertEqual(self.ft.delete_many(range(10, 48), batch_size=16), 38)
+        self.assertEqual(self.ft.fetch(), self.rows[:9])
+
+    def test_composite_pk(self):
+        ft = SQLiteTable("test_sqlite_many_pk", self.db_path)
+        ft.create(CompositePKSchema)
+        try:
+            rows = [{'group_id': g, 'item_id': i, 'value': f'{g}-{i}'} for g in range(4) for i in range(6)]
+            ft.insert(*rows)
+            got = ft.fetch_many([(0, 1), [2, 5], (9, 9)], keys=['value'])
+            self.assertEqual(got, {(0, 1): {'value': '0-1'}, (2, 5): {'value': '2-5'}})
+            self.assertEqual(ft.update_many({'value': 'x'}, [(1, 1), (1, 2)]), 2)
+            self.assertEqual(ft.count({'value': 'x'}), 2)
+            self.assertEqual(ft.delete_many([(g, 0) for g in range(4)], batch_size=3), 4)
+            self.assertEqual(ft.count(), 20)
+        finally:
+            ft.drop()
+
+
+    def test_no_primary_key(self):
+        ft = SQLiteTable("test_sqlite_many_nopk", self.db_path)
+        ft.create(NoPKSchema)
+        try:
+            for call in (lambda: ft.fetch_many([1]), lambda: ft.update_many({'score': 1}, [1]), lambda: ft.delete_many([1])):
+                with self.assertRaisesRegex(ValueError, 'requires a primary key'):
+                    call()
+        finally:
+            ft.drop()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.sql.base_sql_table import where_shape, bind_params
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import ThreeColSchema
+
+
+class TestWhereShape(unittest.TestCase):
+
+    def test_plain(self):
+        self.assertEqual(where_shape({'a': 1, 'b': None}), (('a', False), ('b', True)))
+        self.assertEqual(bind_params({'a': 1, 'b': None}), {'w_0': 1})
+
+    def test_operators(self):
+        where = {'a': {'$gte': 1, '$lt': 5}, 'b': {'$in': [1, 2, 3]}, '$or': [{'c': 'x'}, {'c': {'$like': 'y%'}}]}
+        self.assertEqual(where_shape(where), (
+            ('a', '$gte', False), ('a', '$lt', False), ('b', '$in', 3),
+            ('$or', ((('c', False),), (('c', '$like', False),))),
+        ))
+        self.assertEqual(bind_params(where), {
+            'w_0': 1, 'w_1': 5, 'w_2_0': 1, 'w_2_1': 2, 'w_2_2': 3,
+            'w_3_0_0': 'x', 'w_3_1_0': 'y%',
+        })
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            where_shape({'a': {'$near': 1}})
+
+    def test_none_operand(self):
+        for op in ('$gt', '$like', '$in', '$between'):
+            with self.subTest(op=op), self.assertRaises(ValueError):
+                where_shape({'a': {op: None}})
+
+
+class TestSQLiteTableWhere(unittest.TestCase):
+    """Operator and OR-group where expressions in fetch/count/update/delete."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_where", self.db_path)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'abc'[i % 3] + str(i % 2), 'score': i % 7} for i in range(1, 41)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def assertWhere(self, where, pred):
+        expected = [r for r in self.rows if pred(r)]
+        self.assertEqual(self.ft.fetch(where, order_by={'id': False}), expected)
+        self.assertEqual(self.ft.count(where), len(expected))
+
+    def test_operators(self):
+        cases = [
+            ({'score': {'$gte': 5}}, lambda r: r['score'] >= 5),
+            ({'score': {'$gt': 2, '$lte': 4}}, lambda r: 2 < r['score'] <= 4),
+            ({'score': {'$lt': 1}}, lambda r: r['score'] < 1),
+            ({'score': {'$ne': 3}}, lambda r: r['score'] != 3),
+            ({'score': {'$eq': 3}}, lambda r: r['score'] == 3),
+            ({'id': {'$in': [3, 5, 99]}}, lambda r: r['id'] in (3, 5, 99)),
+            ({'id': {'$in': []}}, lambda r: False),
+            ({'score': {'$nin': [0, 1, 2]}}, lambda r: r['score'] not in (0, 1, 2)),
+            ({'id': {'$between': [10, 14]}}, lambda r: 10 <= r['id'] <= 14),
+            ({'group': {'$like': 'a%'}}, lambda r: r['group'].startswith('a')),
+            ({'group': {'$ilike': 'B1'}}, lambda r: r['group'] == 'b1'),
+            ({'score': {'$ne': None}}, lambda r: True),
+            ({'score': {'$eq': None}}, lambda r: False),
+        ]
+        for where, pred in cases:
+            with self.subTest(where=where):
+                self.assertWhere(where, pred)
+
+    def test_or_groups(self):
+        self.assertWhere(
+            {'score': {'$gte': 1}, '$or': [{'group': 'a0'}, {'id': {'$lt': 4}}]},
+            lambda r: r['score'] >= 1 and (r['group'] == 'a0' or r['id'] < 4),
+        )
+        self.assertWhere(
+            {'$or': [{'$and': [{'score': 0}, {'group': {'$like': 'c%'}}]}, {'id': 40}]},
+            lambda r: (r['score'] == 0 and r['group'].startswith('c')) or r['id'] == 40,
+        )
+
+    def test_same_column_and_operator(self):
+        self.assertWhere(
+            {'score': {'$gt': 1}, '$and': [{'score': {'$gt': 3}}, {'$or': [{'score': {'$gt': 5}}, {'id': 4}]}]},
+            lambda r: r['score'] > 3 and (r['score'] > 5 or r['id'] == 4),
+        )
+
+    def test_empty_group(self):
+        with self.assertRaises(ValueError):
+            self.ft.fetch({'$or': [{}]})
+
+    def test_update_delete(self):
+        self.assertEqual(self.ft.update({'score': 100}, {'id': {'$between': [1, 5]}}), 5)
+        self.assertEqual(self.ft.count({'score': 100}), 5)
+        self.assertEqual(self.ft.delete({'$or': [{'score': 100}, {'id': {'$gt': 35}}]}), 10)
+        self.assertEqual(self.ft.count(), 30)
+
+    def test_shape_cached(self):
+        self.ft._stmt_cache.clear()
+        self.ft.fetch({'score': {'$gte': 1}, 'id': {'$in': [1, 2]}})
+        got = self.ft.fetch({'score': {'$gte': 3}, 'id': {'$in': [3, 4]}})
+        self.assertEqual([r['id'] for r in got], [3, 4])
+        self.assertEqual(len(self.ft._stmt_cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
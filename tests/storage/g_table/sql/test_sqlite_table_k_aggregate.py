@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from gatling.storage.g_table.sql.real_sqlite_table import SQLiteTable
+from storage.g_table.sql.a_const_test import ThreeColSchema
+
+
+class TestSQLiteTableAggregate(unittest.TestCase):
+    """Tests for aggregate(): server-side metrics per group."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self._tmpdir, "test.db")
+        self.ft = SQLiteTable("test_sqlite_aggregate", self.db_path)
+        self.ft.drop()
+        self.ft.create(ThreeColSchema)
+        self.rows = [{'id': i, 'group': 'abc'[i % 3], 'score': i % 7} for i in range(1, 41)]
+        self.ft.insert(*self.rows)
+
+    def tearDown(self):
+        self.ft.drop()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+        if os.path.exists(self._tmpdir):
+            os.rmdir(self._tmpdir)
+
+    def expected(self, group, rows=None):
+        scores = [r['score'] for r in (rows or self.rows) if r['group'] == group]
+        return {'group': group, 'n': len(scores), 'total': sum(scores), 'avg_score': sum(scores) / len(scores),
+                'lo': min(scores), 'hi': max(scores), 'distinct': len(set(scores))}
+
+    def test_group_by(self):
+        metrics = {'n': 'count', 'total': ('sum', 'score'), 'avg_score': ('avg', 'score'),
+                   'lo': ('min', 'score'), 'hi': ('max', 'score'), 'distinct': ('count_distinct', 'score')}
+        got = self.ft.aggregate(group_by=['group'], metrics=metrics, order_by={'group': False})
+        self.assertEqual(len(got), 3)
+        for row, group in zip(got, 'abc'):
+            exp = self.expected(group)
+            self.assertAlmostEqual(row.pop('avg_score'), exp.pop('avg_score'))
+            self.assertEqual(row, exp)
+
+    def test_no_group(self):
+        self.assertEqual(self.ft.aggregate(), [{'count': 40}])
+        got = self.ft.aggregate(metrics={'total': ('sum', 'score')}, where={'score': {'$gte': 5}})
+        self.assertEqual(got, [{'total': sum(r['score'] for r in self.rows if r['score'] >= 5)}])
+
+    def test_where_order_limit(self):
+        got = self.ft.aggregate(group_by=['score'], metrics={'n': 'count'}, where={'group': {'$ne': 'a'}},
+                                order_by={'n': True, 'score': False}, limit=2)
+        counts = {}
+        for r in self.rows:
+            if r['group'] != 'a':
+                counts[r['score']] = counts.get(r['score'], 0) + 1
+        expected = sorted(({'score': k, 'n': v} for k, v in counts.items()), key=lambda r: (-r['n'], r['score']))[:2]
+        self.assertEqual(got, expected)
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            self.ft.aggregate(metrics={'x': ('median', 'score')})
+
+    def test_metric_label_clash(self):
+        with self.assertRaises(ValueError):
+            self.ft.aggregate(['score'], {'score': ('max', 'score')})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)